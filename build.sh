@@ -4,5 +4,7 @@ set -o errexit
 pip install -r requirements.txt
 
 cd school_map_project/schoolmap
+# Hashed names plus gzip/brotli copies, served by WhiteNoise
 python manage.py collectstatic --no-input --clear
+python manage.py check_static_assets
 python manage.py migrate
\ No newline at end of file
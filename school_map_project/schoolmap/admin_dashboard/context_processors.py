@@ -1,8 +1,11 @@
-from mapapp.models import UserPreferences
+from mapapp.preferences import get_user_preferences
 
 def user_preferences(request):
     """Add user preferences to template context"""
     if request.user.is_authenticated:
-        preferences, created = UserPreferences.objects.get_or_create(user=request.user)
+        # Set lazily by UserPreferencesMiddleware and shared with the views
+        preferences = getattr(request, 'user_preferences', None)
+        if preferences is None:
+            preferences = get_user_preferences(request.user)
         return {'user_preferences': preferences}
-    return {}
\ No newline at end of file
+    return {}
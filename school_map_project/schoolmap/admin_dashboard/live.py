@@ -0,0 +1,261 @@
+"""Server-Sent Events feed for the live admin dashboard.
+
+Every worker process has one DashboardHub. While at least one dashboard
+is connected, the hub's producer thread looks for new ActivityLog rows
+every POLL_INTERVAL seconds and recounts the dashboard counters every
+COUNTER_INTERVAL seconds, or sooner when new activity arrives. It fans
+the results out to every subscriber's queue. Database load depends on
+the number of workers, not the number of open dashboards.
+
+Activity events carry the ActivityLog id as their SSE id. A browser that
+reconnects with Last-Event-ID is sent the events it missed from the
+hub's replay buffer, or from ActivityLog when they are older than the
+buffer holds (say, after reconnecting to another worker). A hub whose
+producer thread has stopped starts over from the current state when the
+next dashboard connects, rather than replaying what happened meanwhile. Streams end after MAX_DURATION seconds so they never
+hold a worker thread indefinitely; EventSource reconnects on its own.
+Each open stream holds a thread, so a process serves at most
+MAX_SUBSCRIBERS streams and answers the rest with 503 and Retry-After.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from mapapp.models import ActivityLog
+from .stats import get_dashboard_stats
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Without the producer thread, poll() must be called directly (tests)
+    'ENABLED': True,
+    'POLL_INTERVAL': 2.0,
+    'COUNTER_INTERVAL': 15.0,
+    'HEARTBEAT': 15.0,
+    'MAX_DURATION': 300.0,
+    # Activity events kept for Last-Event-ID replays
+    'REPLAY_SIZE': 200,
+    # A subscriber this far behind is dropped and has to reconnect
+    'QUEUE_SIZE': 500,
+    # Milliseconds the browser waits before reconnecting
+    'RETRY_MS': 3000,
+    # Open streams per process, each holding a worker thread. None: a quarter of WEB_THREADS
+    'MAX_SUBSCRIBERS': None,
+    # Seconds a dashboard turned away at the cap waits before trying again
+    'BUSY_RETRY': 30,
+}
+
+COUNTER_FIELDS = ('total_users', 'active_users', 'users_today', 'logins_today')
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'DASHBOARD_STREAM', {}))
+    if config['MAX_SUBSCRIBERS'] is None:
+        config['MAX_SUBSCRIBERS'] = max(1, getattr(settings, 'WEB_THREADS', 8) // 4)
+    return config
+
+
+def serialize_activity(activity):
+    return {
+        'id': activity.id,
+        'action': activity.get_action_display(),
+        'description': activity.description,
+        'timestamp': activity.timestamp.strftime('%H:%M:%S'),
+        'user': activity.user.username if activity.user else 'System'
+    }
+
+
+def current_counters():
+    stats = get_dashboard_stats(days=1)
+    return {field: stats[field] for field in COUNTER_FIELDS}
+
+
+def format_event(event):
+    """One SSE message; event is (name, data, id or None)"""
+    name, data, event_id = event
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {name}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class DashboardHub:
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        # A forked worker starts with no subscribers and no producer thread
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._subscribers = set()
+        self._recent = deque(maxlen=get_config()['REPLAY_SIZE'])
+        self.last_id = None
+        self.counters = None
+        self._counted_at = 0.0
+        self.poll_count = 0
+
+    def subscribe(self, last_event_id=None):
+        """
+        A queue that receives every event from now on, primed with the current
+        state, or None when this process already has MAX_SUBSCRIBERS streams
+        """
+        if self._pid != os.getpid():
+            self._reset()
+        config = get_config()
+        subscriber = queue.Queue(maxsize=config['QUEUE_SIZE'])
+        with self._lock:
+            if len(self._subscribers) >= config['MAX_SUBSCRIBERS']:
+                return None
+            # Whatever the hub knew when its last dashboard left is stale by now
+            if self.counters is None or self._thread is None or not self._thread.is_alive():
+                self._prime()
+            backlog = self._missed(last_event_id, config['QUEUE_SIZE'] - 1) if last_event_id is not None else []
+            subscriber.put_nowait(('counters', dict(self.counters, last_updated=now_label()), None))
+            for event in backlog:
+                subscriber.put_nowait(event)
+            self._subscribers.add(subscriber)
+        if config['ENABLED']:
+            self._ensure_thread()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _prime(self):
+        """Starting point for a hub with no state yet; the caller holds the lock"""
+        self.last_id = ActivityLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        self.counters = current_counters()
+        self._counted_at = time.monotonic()
+        # The buffer has a gap for the time nobody was connected
+        self._recent.clear()
+
+    def _missed(self, last_event_id, limit):
+        """The newest `limit` activity events after last_event_id; the caller holds the lock"""
+        if self._recent and last_event_id >= self._recent[0][2]:
+            return [event for event in self._recent if event[2] > last_event_id][-limit:]
+        activities = (
+            ActivityLog.objects.select_related('user')
+            .filter(id__gt=last_event_id, id__lte=self.last_id).order_by('-id')[:limit]
+        )
+        return [('activity', serialize_activity(activity), activity.id) for activity in reversed(activities)]
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='dashboard-stream', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                # Checked under the lock so a new subscriber either sees this
+                # thread still running or starts a fresh one
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('Failed to poll for dashboard updates')
+            finally:
+                # This thread is never inside a request, so nothing else
+                # closes its connection
+                connection.close()
+            time.sleep(get_config()['POLL_INTERVAL'])
+
+    def poll(self):
+        """Publish new activity and any changed counters; returns the events sent"""
+        with self._lock:
+            if self.counters is None:
+                self._prime()
+            last_id = self.last_id
+        activities = list(
+            ActivityLog.objects.select_related('user').filter(id__gt=last_id).order_by('id')[:100]
+        )
+        events = [('activity', serialize_activity(activity), activity.id) for activity in activities]
+
+        config = get_config()
+        if activities or time.monotonic() - self._counted_at >= config['COUNTER_INTERVAL']:
+            counters = current_counters()
+            self._counted_at = time.monotonic()
+            changed = {field: value for field, value in counters.items() if self.counters.get(field) != value}
+            self.counters = counters
+            if changed:
+                changed['last_updated'] = now_label()
+                events.append(('counters', changed, None))
+
+        with self._lock:
+            self.poll_count += 1
+            if activities:
+                self.last_id = activities[-1].id
+            self._recent.extend(event for event in events if event[2] is not None)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                for event in events:
+                    subscriber.put_nowait(event)
+            except queue.Full:
+                # Too far behind; closing the stream makes the browser reconnect
+                self.unsubscribe(subscriber)
+                drain(subscriber)
+                subscriber.put_nowait(None)
+        return events
+
+
+def now_label():
+    return timezone.now().strftime('%H:%M:%S')
+
+
+def drain(subscriber):
+    while True:
+        try:
+            subscriber.get_nowait()
+        except queue.Empty:
+            return
+
+
+def event_stream(hub, subscriber):
+    """The SSE body for one subscriber, with heartbeats, ending after MAX_DURATION"""
+    config = get_config()
+    deadline = time.monotonic() + config['MAX_DURATION']
+    try:
+        yield f"retry: {config['RETRY_MS']}\n\n"
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    event = subscriber.get(timeout=min(config['HEARTBEAT'], remaining))
+                else:
+                    # Out of time: send whatever is already queued, then stop
+                    event = subscriber.get_nowait()
+            except queue.Empty:
+                if remaining <= 0:
+                    break
+                # Comments keep proxies from closing an idle connection
+                yield ': keepalive\n\n'
+                continue
+            if event is None:
+                break
+            yield format_event(event)
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+dashboard_hub = DashboardHub()
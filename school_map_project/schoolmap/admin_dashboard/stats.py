@@ -0,0 +1,86 @@
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from mapapp.models import ActivityDailyStat
+
+
+def day_bounds(day):
+    """Return the aware [start, end) datetimes covering a local calendar day"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def last_n_days(days=7, today=None):
+    """Dates for the last `days` days, oldest first, ending with today"""
+    today = today or timezone.localdate()
+    return [today - timedelta(days=x) for x in range(days - 1, -1, -1)]
+
+
+def _daily_buckets(field, date_list):
+    """Build one filtered Count per day so a whole series is a single query.
+
+    Filtering on a datetime range (instead of `field__date=`) keeps the
+    column usable by an index.
+    """
+    buckets = {}
+    for index, day in enumerate(date_list):
+        start, end = day_bounds(day)
+        buckets[f'day_{index}'] = Count('id', filter=Q(**{
+            f'{field}__gte': start,
+            f'{field}__lt': end,
+        }))
+    return buckets
+
+
+def user_stats(date_list):
+    """User totals and the per-day registration series in one query"""
+    now = timezone.now()
+    today_start, _ = day_bounds(date_list[-1])
+    stats = User.objects.aggregate(
+        total_users=Count('id'),
+        active_users=Count('id', filter=Q(is_active=True)),
+        new_users_week=Count('id', filter=Q(date_joined__gte=now - timedelta(days=7))),
+        active_users_today=Count('id', filter=Q(last_login__gte=today_start)),
+        **_daily_buckets('date_joined', date_list)
+    )
+    growth = [stats.pop(f'day_{index}') for index in range(len(date_list))]
+    stats['user_growth'] = growth
+    stats['users_today'] = growth[-1]
+    return stats
+
+
+def action_series(action, date_list):
+    """Per-day counts for one ActivityLog action, read from the daily rollup"""
+    counts = dict(
+        ActivityDailyStat.objects.filter(
+            action=action,
+            date__gte=date_list[0],
+            date__lte=date_list[-1],
+        ).values_list('date', 'count')
+    )
+    return [counts.get(day, 0) for day in date_list]
+
+
+def login_stats(date_list):
+    """Per-day login series from the activity rollup in one query"""
+    series = action_series('user_login', date_list)
+    return {
+        'login_activity': series,
+        'logins_today': series[-1],
+    }
+
+
+def get_dashboard_stats(days=7, today=None):
+    """Collect every counter and chart series used by the admin dashboard.
+
+    Runs two aggregate queries no matter how many days are requested:
+    one over users and one over the daily activity rollup.
+    """
+    date_list = last_n_days(days, today)
+    stats = {'dates': date_list}
+    stats.update(user_stats(date_list))
+    stats.update(login_stats(date_list))
+    return stats
@@ -1,3 +1,323 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from mapapp.models import ActivityLog, ActivityDailyStat, BuildingInfo
+from mapapp.utils import log_activity
+from .live import DashboardHub, dashboard_hub
+from .stats import get_dashboard_stats
+from .users import decode_cursor, filter_users, user_page
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        # Start from an empty user table rather than the migration seed data
+        User.objects.all().delete()
+        self.admin = User.objects.create_user('admin', password='pass', is_staff=True)
+        self.student = User.objects.create_user('student', password='pass')
+        # Registered three days ago
+        User.objects.filter(pk=self.student.pk).update(
+            date_joined=timezone.now() - timedelta(days=3)
+        )
+        for _ in range(2):
+            log_activity(self.admin, 'user_login', 'login')
+        log_activity(self.admin, 'user_logout', 'logout')
+
+    def test_series_and_counters(self):
+        stats = get_dashboard_stats()
+        self.assertEqual(len(stats['dates']), 7)
+        self.assertEqual(stats['dates'][-1], timezone.localdate())
+        self.assertEqual(stats['total_users'], 2)
+        self.assertEqual(stats['active_users'], 2)
+        self.assertEqual(stats['user_growth'], [0, 0, 0, 1, 0, 0, 1])
+        self.assertEqual(stats['users_today'], 1)
+        self.assertEqual(stats['login_activity'][-1], 2)
+        self.assertEqual(stats['logins_today'], 2)
+
+    def test_stats_use_two_queries(self):
+        with self.assertNumQueries(2):
+            get_dashboard_stats()
+        with self.assertNumQueries(2):
+            get_dashboard_stats(days=30)
+
+    def test_dashboard_view_query_count(self):
+        self.client.force_login(self.admin)
+        # session, user, building count, user stats, login stats,
+        # recent users and recent activities; preferences are cached
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse('admin_dashboard:dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_dashboard_api_query_count(self):
+        self.client.force_login(self.admin)
+        # session, user, user stats, login stats and recent activities
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('admin_dashboard:dashboard_api'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['logins_today'], 2)
+
+
+class DashboardApiConditionalTests(TestCase):
+    def setUp(self):
+        User.objects.all().delete()
+        self.admin = User.objects.create_user('admin', password='pass', is_staff=True)
+        self.first = log_activity(self.admin, 'user_login', 'first')
+        self.client.force_login(self.admin)
+        self.url = reverse('admin_dashboard:dashboard_api')
+
+    def test_unchanged_dashboard_gets_304_without_counting(self):
+        etag = self.client.get(self.url)['ETag']
+        # Only the session and user lookups remain
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, headers={'if_none_match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_activity_and_user_saves_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            log_activity(self.admin, 'user_logout', 'second')
+        response = self.client.get(self.url, headers={'if_none_match': etag})
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user('visitor', password='pass')
+        self.assertEqual(self.client.get(self.url, headers={'if_none_match': etag}).status_code, 200)
+
+    def test_since_returns_only_new_activities(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['cursor'], self.first.id)
+        second = log_activity(self.admin, 'user_logout', 'second')
+        data = self.client.get(self.url, {'since': data['cursor']}).json()
+        self.assertEqual([activity['description'] for activity in data['recent_activities']], ['second'])
+        self.assertEqual(data['cursor'], second.id)
+        data = self.client.get(self.url, {'since': second.id}).json()
+        self.assertEqual((data['recent_activities'], data['cursor']), ([], second.id))
+
+
+class ActivityDailyStatTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('rollup_user', password='pass')
+
+    def test_log_activity_updates_rollup(self):
+        log_activity(self.user, 'user_login', 'login')
+        log_activity(self.user, 'user_login', 'login')
+        stat = ActivityDailyStat.objects.get(date=timezone.localdate(), action='user_login')
+        self.assertEqual(stat.count, 2)
+
+    def test_rebuild_command_matches_raw_log(self):
+        ActivityLog.objects.create(user=self.user, action='user_login', description='login')
+        old = ActivityLog.objects.create(user=self.user, action='user_login', description='login')
+        ActivityLog.objects.filter(pk=old.pk).update(timestamp=timezone.now() - timedelta(days=2))
+        ActivityDailyStat.objects.create(date=timezone.localdate(), action='user_login', count=99)
+
+        call_command('rebuild_activity_stats', stdout=StringIO())
+
+        counts = dict(
+            ActivityDailyStat.objects.filter(action='user_login').values_list('date', 'count')
+        )
+        today = timezone.localdate()
+        self.assertEqual(counts[today], 1)
+        self.assertEqual(counts[today - timedelta(days=2)], 1)
+
+    def test_rebuild_keeps_the_rollup_of_pruned_days(self):
+        ActivityLog.objects.create(user=self.user, action='user_login', description='login')
+        today = timezone.localdate()
+        pruned_day = today - timedelta(days=400)
+        ActivityDailyStat.objects.create(date=pruned_day, action='user_login', count=7)
+
+        call_command('rebuild_activity_stats', stdout=StringIO())
+        call_command('rebuild_activity_stats', days=1000, stdout=StringIO())
+        counts = dict(ActivityDailyStat.objects.values_list('date', 'count'))
+        self.assertEqual(counts, {pruned_day: 7, today: 1})
+
+    def test_rebuild_command_rejects_zero_days(self):
+        ActivityDailyStat.objects.create(date=timezone.localdate() - timedelta(days=5), action='user_login', count=3)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_activity_stats', '--days', '0', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('rebuild_activity_stats', days=0, stdout=StringIO())
+        self.assertTrue(ActivityDailyStat.objects.filter(count=3).exists())
+
+
+class DashboardStreamTests(TestCase):
+    def setUp(self):
+        User.objects.all().delete()
+        self.admin = User.objects.create_user('admin', password='pass', is_staff=True)
+        self.hub = DashboardHub()
+
+    def drain(self, subscriber):
+        events = []
+        while not subscriber.empty():
+            events.append(subscriber.get_nowait())
+        return events
+
+    @override_settings(DASHBOARD_STREAM={'ENABLED': False, 'MAX_SUBSCRIBERS': 5})
+    def test_one_poll_serves_every_subscriber(self):
+        subscribers = [self.hub.subscribe() for _ in range(5)]
+        for subscriber in subscribers:
+            name, counters, _ = self.drain(subscriber)[0]
+            self.assertEqual((name, counters['logins_today']), ('counters', 0))
+
+        log_activity(self.admin, 'user_login', 'login')
+        # New rows, then today's counters; the same for any number of dashboards
+        with self.assertNumQueries(3):
+            self.hub.poll()
+        for subscriber in subscribers:
+            events = self.drain(subscriber)
+            self.assertEqual([event[0] for event in events], ['activity', 'counters'])
+            self.assertEqual(events[0][1]['user'], 'admin')
+            self.assertEqual(events[1][1]['logins_today'], 1)
+            # Only counters that changed are sent
+            self.assertNotIn('total_users', events[1][1])
+
+    def test_quiet_polls_send_nothing(self):
+        subscriber = self.hub.subscribe()
+        self.drain(subscriber)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.hub.poll(), [])
+        self.assertTrue(subscriber.empty())
+
+    def test_reconnect_replays_missed_activity(self):
+        self.hub.subscribe()
+        first = log_activity(self.admin, 'user_login', 'first')
+        self.hub.poll()
+        log_activity(self.admin, 'user_logout', 'second')
+        self.hub.poll()
+        # The producer is still running, so the replay comes from its buffer
+        self.hub._thread = mock.Mock(is_alive=lambda: True)
+        with self.assertNumQueries(0):
+            events = self.drain(self.hub.subscribe(last_event_id=first.id))
+        self.assertEqual([event[1]['description'] for event in events[1:]], ['second'])
+
+        # Another worker's hub never saw these events and reads them from the log
+        other = DashboardHub()
+        events = self.drain(other.subscribe(last_event_id=first.id))
+        self.assertEqual([event[1]['description'] for event in events[1:]], ['second'])
+
+    def test_idle_hub_starts_over_from_the_current_state(self):
+        self.drain(self.hub.subscribe())
+        self.hub.poll()
+        # Nobody is connected, so no producer thread sees this
+        log_activity(self.admin, 'user_login', 'while idle')
+        events = self.drain(self.hub.subscribe())
+        self.assertEqual(events[0][1]['logins_today'], 1)
+        self.assertEqual(self.hub.poll(), [])
+
+    @override_settings(DASHBOARD_STREAM={'ENABLED': False, 'MAX_DURATION': 0})
+    def test_stream_view(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin_dashboard:dashboard_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('retry: 3000'))
+        self.assertIn('event: counters', body)
+        self.assertEqual(dashboard_hub.subscriber_count(), 0)
+
+    @override_settings(DASHBOARD_STREAM={'ENABLED': False}, WEB_THREADS=8)
+    def test_streams_are_capped_below_the_thread_count(self):
+        held = [dashboard_hub.subscribe(), dashboard_hub.subscribe()]
+        self.addCleanup(lambda: [dashboard_hub.unsubscribe(subscriber) for subscriber in held])
+        self.assertIsNone(dashboard_hub.subscribe())
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin_dashboard:dashboard_stream'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+
+
+class ImportDataViewTests(TestCase):
+    def setUp(self):
+        User.objects.all().delete()
+        self.admin = User.objects.create_user('admin', password='pass', is_staff=True)
+        self.url = reverse('admin_dashboard:import_data')
+
+    def upload(self, **data):
+        file = SimpleUploadedFile('buildings.csv', b'name,description\nClinic,First aid\n', content_type='text/csv')
+        return self.client.post(self.url, dict(kind='buildings', file=file, **data))
+
+    def test_staff_only(self):
+        self.client.force_login(User.objects.create_user('student', password='pass'))
+        self.assertRedirects(self.upload(), reverse('home'), fetch_redirect_response=False)
+
+    def test_dry_run_then_import(self):
+        self.client.force_login(self.admin)
+        response = self.upload(dry_run='1')
+        self.assertEqual(response.context['summary']['created'], 1)
+        self.assertFalse(BuildingInfo.objects.filter(name='Clinic').exists())
+        response = self.upload()
+        self.assertContains(response, '1 new')
+        self.assertTrue(BuildingInfo.objects.filter(name='Clinic').exists())
+
+    def test_unreadable_files_are_form_errors(self):
+        self.client.force_login(self.admin)
+        for content in [b'name\nCl\xe9nic\n', b'name\n"' + b'x' * 200000 + b'"\n']:
+            file = SimpleUploadedFile('buildings.csv', content)
+            response = self.client.post(self.url, {'kind': 'buildings', 'file': file})
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'could not be read')
+        self.assertFalse(BuildingInfo.objects.filter(name='Clinic').exists())
+
+    @override_settings(BULK_IMPORT={'UPLOAD_MAX_ROWS': 2, 'UPLOAD_MAX_SIZE': 64})
+    def test_large_files_are_sent_to_the_command(self):
+        self.client.force_login(self.admin)
+        file = SimpleUploadedFile('buildings.csv', b'name\nA\nB\nC\n')
+        response = self.client.post(self.url, {'kind': 'buildings', 'file': file})
+        self.assertContains(response, 'more than 2 rows; import it with the import_data management command')
+        file = SimpleUploadedFile('buildings.csv', b'name\n' + b'A' * 100 + b'\n')
+        response = self.client.post(self.url, {'kind': 'buildings', 'file': file})
+        self.assertContains(response, 'use the import_data management command')
+        self.assertFalse(BuildingInfo.objects.exists())
+
+
+class UserManagementPagingTests(TestCase):
+    def setUp(self):
+        User.objects.all().delete()
+        self.admin = User.objects.create_user('admin', password='pass', is_staff=True)
+        joined = timezone.now() - timedelta(days=1)
+        for number in range(5):
+            User.objects.create_user(
+                f'student{number}', email=f'student{number}@school.test', first_name='Maria' if number % 2 else 'Jose',
+                date_joined=joined, is_active=number != 4,
+            )
+        self.client.force_login(self.admin)
+
+    def test_pages_follow_date_joined_and_id_without_gaps(self):
+        users = filter_users()
+        first, cursor = user_page(users, size=3)
+        second, last = user_page(users, cursor, size=3)
+        self.assertIsNone(last)
+        names = [user.username for user in first + second]
+        # Ties on date_joined fall back to the id
+        self.assertEqual(names, ['admin', 'student4', 'student3', 'student2', 'student1', 'student0'])
+        self.assertEqual(decode_cursor(cursor)[1], first[-1].id)
+        with self.assertRaises(ValueError):
+            decode_cursor('not-a-cursor')
+
+    def test_search_and_filters_run_in_the_database(self):
+        self.assertEqual(
+            sorted(user.username for user in filter_users('maria school.test')), ['student1', 'student3'],
+        )
+        self.assertEqual([user.username for user in filter_users(status='inactive')], ['student4'])
+        self.assertEqual([user.username for user in filter_users(role='staff')], ['admin'])
+
+    def test_page_runs_a_fixed_number_of_queries(self):
+        url = reverse('admin_dashboard:user_management')
+        # Session, user and one page of users, however many rows it shows
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'size': 2})
+        self.assertEqual(len(response.context['users']), 2)
+        data = self.client.get(
+            reverse('admin_dashboard:user_management_api'), {'size': 2, 'cursor': response.context['next_cursor']},
+        ).json()
+        self.assertEqual([user['username'] for user in data['users']], ['student3', 'student2'])
+        self.assertIn('student3', data['html'])
+        self.assertEqual(
+            self.client.get(reverse('admin_dashboard:user_management_api'), {'cursor': 'bad'}).status_code, 400,
+        )
 
-# Create your tests here.
@@ -6,13 +6,18 @@ app_name = 'admin_dashboard'
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('api/dashboard/', views.dashboard_api, name='dashboard_api'),
+    path('api/dashboard/stream/', views.dashboard_stream, name='dashboard_stream'),
+    path('api/activity-buffer/', views.activity_buffer_status, name='activity_buffer_status'),
+    path('api/cache-stats/', views.cache_status, name='cache_status'),
     path('users/', views.user_management, name='user_management'),
+    path('api/users/', views.user_management_api, name='user_management_api'),
     path('users/toggle-status/<int:user_id>/', views.toggle_user_status, name='toggle_user_status'),
     path('users/delete/<int:user_id>/', views.delete_user, name='delete_user'),
     path('buildings/', views.building_management, name='building_management'),
     path('buildings/add/', views.add_building, name='add_building'),
     path('buildings/edit/<int:building_id>/', views.edit_building, name='edit_building'),
     path('buildings/delete/<int:building_id>/', views.delete_building, name='delete_building'),
+    path('import/', views.import_data, name='import_data'),
     path('analytics/', views.analytics, name='analytics'),
     path('settings/', views.admin_settings, name='settings'),
     path('profile/', views.admin_profile, name='profile'),
@@ -0,0 +1,102 @@
+"""Filtered, keyset-paginated user listings for user management.
+
+Users are listed newest first, ordered by (date_joined, id). Each page
+ends with a cursor: the last row's (date_joined, id). The next page
+starts strictly after it, so the database seeks straight to it along an
+index instead of counting past OFFSET rows. A page is one query however
+deep into the list it is, and rows added while someone scrolls don't
+shift the pages they have already seen.
+"""
+import base64
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.db.models import Q
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Only what the user table shows
+LIST_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'date_joined', 'is_active', 'is_staff', 'is_superuser',
+)
+SEARCH_FIELDS = ('username', 'email', 'first_name', 'last_name')
+STATUS_FILTERS = {
+    'active': Q(is_active=True),
+    'inactive': Q(is_active=False),
+}
+ROLE_FILTERS = {
+    'admin': Q(is_superuser=True),
+    'staff': Q(is_staff=True),
+    'student': Q(is_staff=False),
+}
+
+
+def encode_cursor(user):
+    raw = f'{user.date_joined.isoformat()}|{user.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(date_joined, id) from a cursor; ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        joined, user_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(joined), int(user_id)
+    except ValueError as exc:
+        raise ValueError('Invalid cursor') from exc
+
+
+def filter_users(query='', status='', role=''):
+    """Users matching every word of the query in some name field, plus the status and role filters"""
+    users = User.objects.only(*LIST_FIELDS)
+    for word in query.split():
+        match = Q()
+        for field in SEARCH_FIELDS:
+            match |= Q(**{f'{field}__icontains': word})
+        users = users.filter(match)
+    if status in STATUS_FILTERS:
+        users = users.filter(STATUS_FILTERS[status])
+    if role in ROLE_FILTERS:
+        users = users.filter(ROLE_FILTERS[role])
+    return users
+
+
+def user_page(users, cursor=None, size=PAGE_SIZE):
+    """(up to `size` users after the cursor, cursor for the next page or None)"""
+    users = users.order_by('-date_joined', '-id')
+    if cursor:
+        joined, user_id = decode_cursor(cursor)
+        users = users.filter(Q(date_joined__lt=joined) | Q(date_joined=joined, id__lt=user_id))
+    # One extra row tells whether there is a next page without a COUNT
+    rows = list(users[:size + 1])
+    if len(rows) > size:
+        return rows[:size], encode_cursor(rows[size - 1])
+    return rows, None
+
+
+def page_params(params):
+    """The filter values, cursor and page size from a request's GET parameters"""
+    try:
+        size = min(max(int(params.get('size', PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        size = PAGE_SIZE
+    return {
+        'query': params.get('q', '').strip(),
+        'status': params.get('status', ''),
+        'role': params.get('role', ''),
+        'cursor': params.get('cursor') or None,
+        'size': size,
+    }
+
+
+def serialize_user(user):
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'name': user.get_full_name(),
+        'date_joined': user.date_joined.isoformat(),
+        'is_active': user.is_active,
+        'is_staff': user.is_staff,
+        'is_superuser': user.is_superuser,
+    }
@@ -4,7 +4,9 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Count, Q
 from django.views.decorators.http import require_http_methods
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from urllib.parse import urlencode
 import json
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
@@ -16,6 +18,14 @@ import json
 from django.contrib.auth.models import User
 from mapapp.models import BuildingInfo, UserPreferences, ActivityLog  # Import models from mapapp
 from mapapp.utils import log_activity
+from mapapp.activity_buffer import activity_buffer, get_config as get_activity_buffer_config
+from mapapp.page_cache import cache_stats
+from mapapp.dashboard_version import get_version as get_dashboard_version
+from mapapp.catalogue import etag_matches
+from mapapp.imports import IMPORTERS, get_config as get_import_config
+from .stats import get_dashboard_stats
+from .users import filter_users, page_params, serialize_user, user_page
+from .live import dashboard_hub, event_stream, get_config as get_stream_config, serialize_activity
 from django.views.decorators.http import require_http_methods
 import json
 
@@ -43,40 +53,16 @@ def dashboard(request):
     # Get building statistics
     total_buildings = BuildingInfo.objects.count()
     
-    # Get user statistics
-    total_users = User.objects.count()
-    new_users_week = User.objects.filter(
-        date_joined__gte=timezone.now() - timedelta(days=7)
-    ).count()
-    active_users = User.objects.filter(is_active=True).count()
-    
-    # Get today's statistics
-    today = timezone.now().date()
-    users_today = User.objects.filter(date_joined__date=today).count()
-    logins_today = ActivityLog.objects.filter(
-        action='user_login',
-        timestamp__date=today
-    ).count()
-    
-    # Get user growth data for the last 7 days
-    date_list = [today - timedelta(days=x) for x in range(6, -1, -1)]
+    # Get user, login and growth statistics in two grouped queries
+    stats = get_dashboard_stats()
+    labels = [date.strftime('%a') for date in stats['dates']]
     user_growth_data = {
-        'labels': [date.strftime('%a') for date in date_list],
-        'data': [
-            User.objects.filter(date_joined__date=date).count() 
-            for date in date_list
-        ]
+        'labels': labels,
+        'data': stats['user_growth']
     }
-    
-    # Get login activity for the last 7 days
     login_activity_data = {
-        'labels': [date.strftime('%a') for date in date_list],
-        'data': [
-            ActivityLog.objects.filter(
-                action='user_login',
-                timestamp__date=date
-            ).count() for date in date_list
-        ]
+        'labels': labels,
+        'data': stats['login_activity']
     }
     
     context = {
@@ -84,11 +70,11 @@ def dashboard(request):
         'recent_users': recent_users,
         'recent_activities': recent_activities,
         'total_buildings': total_buildings,
-        'total_users': total_users,
-        'new_users_this_week': new_users_week,
-        'active_users': active_users,
-        'users_today': users_today,
-        'logins_today': logins_today,
+        'total_users': stats['total_users'],
+        'new_users_this_week': stats['new_users_week'],
+        'active_users': stats['active_users'],
+        'users_today': stats['users_today'],
+        'logins_today': stats['logins_today'],
         'user_growth_data': user_growth_data,
         'login_activity_data': login_activity_data,
     }
@@ -130,10 +116,41 @@ def user_management(request):
     if not request.user.is_staff:
         return redirect('home')
     
-    users = User.objects.all().order_by('-date_joined')
+    params = page_params(request.GET)
+    try:
+        users, next_cursor = user_page(
+            filter_users(params['query'], params['status'], params['role']), params['cursor'], params['size'],
+        )
+    except ValueError:
+        return redirect('admin_dashboard:user_management')
+    filters = {key: params[key] for key in ('query', 'status', 'role')}
     return render(request, 'admin_dashboard/user_management.html', {
         'active_page': 'users',
-        'users': users
+        'users': users,
+        'next_cursor': next_cursor,
+        'filters': filters,
+        'filter_query': urlencode({'q': filters['query'], 'status': filters['status'], 'role': filters['role']}),
+    })
+
+@login_required
+def user_management_api(request):
+    """One page of the filtered user list, for infinite scroll"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+
+    params = page_params(request.GET)
+    try:
+        users, next_cursor = user_page(
+            filter_users(params['query'], params['status'], params['role']), params['cursor'], params['size'],
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+    return JsonResponse({
+        'success': True,
+        'users': [serialize_user(user) for user in users],
+        'next_cursor': next_cursor,
+        # The same rows the page renders, so scrolled-in rows get the action buttons too
+        'html': render_to_string('admin_dashboard/_user_rows.html', {'users': users}, request=request),
     })
 
 @login_required
@@ -265,24 +282,52 @@ def delete_building(request, building_id):
         print(f"Error deleting building: {str(e)}")
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+@login_required
+def import_data(request):
+    if not request.user.is_staff:
+        return redirect('home')
+
+    summary = None
+    kind = request.POST.get('kind', 'buildings')
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        config = get_import_config()
+        if kind not in IMPORTERS:
+            messages.error(request, 'Choose what to import')
+        elif upload is None:
+            messages.error(request, 'Choose a .csv or .xlsx file')
+        elif upload.size > config['UPLOAD_MAX_SIZE']:
+            messages.error(request, (
+                f"Files over {config['UPLOAD_MAX_SIZE'] // (1024 * 1024)} MB can't be imported here; "
+                'use the import_data management command'
+            ))
+        else:
+            importer = IMPORTERS[kind](
+                dry_run=bool(request.POST.get('dry_run')), MAX_ROWS=config['UPLOAD_MAX_ROWS'],
+            )
+            try:
+                summary = importer.run(upload, upload.name)
+            except ValueError as exc:
+                messages.error(request, str(exc))
+
+    return render(request, 'admin_dashboard/import_data.html', {
+        'active_page': 'import',
+        'kinds': sorted(IMPORTERS),
+        'kind': kind,
+        'summary': summary,
+    })
+
 @login_required
 def analytics(request):
     if not request.user.is_staff:
         return redirect('home')
     
-    # Calculate date ranges
-    today = timezone.now().date()
-    week_ago = today - timedelta(days=7)
+    stats = get_dashboard_stats()
     
     # Get user registration data for the last 7 days
-    date_list = [today - timedelta(days=x) for x in range(6, -1, -1)]
     user_registrations = {
-        'labels': [date.strftime('%a, %b %d') for date in date_list],
-        'data': [
-            User.objects.filter(
-                date_joined__date=date
-            ).count() for date in date_list
-        ]
+        'labels': [date.strftime('%a, %b %d') for date in stats['dates']],
+        'data': stats['user_growth']
     }
     
     # Get building statistics
@@ -292,25 +337,15 @@ def analytics(request):
         'data': [1] * len(buildings)  # Placeholder for room counts
     }
     
-    # Get user statistics
-    total_users = User.objects.count()
-    new_users_week = User.objects.filter(
-        date_joined__gte=week_ago
-    ).count()
-    
-    active_users_today = User.objects.filter(
-        last_login__date=today
-    ).count()
-    
-    total_buildings = buildings.count()
+    total_buildings = len(buildings)
     
     return render(request, 'admin_dashboard/analytics.html', {
         'active_page': 'analytics',
         'user_registrations': user_registrations,
         'building_stats': building_stats,
-        'total_users': total_users,
-        'new_users_this_week': new_users_week,
-        'active_users_today': active_users_today,
+        'total_users': stats['total_users'],
+        'new_users_this_week': stats['new_users_week'],
+        'active_users_today': stats['active_users_today'],
         'total_buildings': total_buildings
     })
 
@@ -332,7 +367,7 @@ def admin_settings(request):
 @user_passes_test(lambda u: u.is_staff, login_url='home')
 def admin_profile(request):
     user = request.user
-    preferences, created = UserPreferences.objects.get_or_create(user=user)
+    preferences = request.user_preferences
     
     if request.method == 'POST':
         # Handle profile picture upload
@@ -384,36 +419,81 @@ def admin_profile(request):
 @login_required
 @user_passes_test(lambda u: u.is_staff, login_url='home')
 def dashboard_api(request):
-    """API endpoint for live dashboard updates"""
-    today = timezone.now().date()
+    """API endpoint for live dashboard updates.
+
+    The ETag comes from the dashboard version counter, so an unchanged
+    dashboard gets a 304 without any counting. With ?since=<activity id>
+    only activities newer than that id are returned.
+    """
+    etag = f'"dashboard-{get_dashboard_version()}-{timezone.localdate().isoformat()}"'
+    if etag_matches(request.headers.get('If-None-Match'), {etag}):
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
     
-    # Get real-time statistics
-    total_users = User.objects.count()
-    active_users = User.objects.filter(is_active=True).count()
-    users_today = User.objects.filter(date_joined__date=today).count()
-    logins_today = ActivityLog.objects.filter(
-        action='user_login',
-        timestamp__date=today
-    ).count()
+    # Get real-time statistics; only today's bucket is needed here
+    stats = get_dashboard_stats(days=1)
     
-    # Get recent activities
-    recent_activities = ActivityLog.objects.select_related('user').order_by('-timestamp')[:5]
-    activities_data = []
-    for activity in recent_activities:
-        activities_data.append({
-            'action': activity.get_action_display(),
-            'description': activity.description,
-            'timestamp': activity.timestamp.strftime('%H:%M:%S'),
-            'user': activity.user.username if activity.user else 'System'
-        })
+    # Get recent activities, or only the new ones after the client's cursor
+    activities = ActivityLog.objects.select_related('user').order_by('-id')
+    try:
+        since = int(request.GET['since'])
+    except (KeyError, ValueError):
+        since = None
+    if since is None:
+        recent_activities = list(activities[:5])
+    else:
+        recent_activities = list(activities.filter(id__gt=since)[:50])
+    activities_data = [serialize_activity(activity) for activity in recent_activities]
     
     data = {
-        'total_users': total_users,
-        'active_users': active_users,
-        'users_today': users_today,
-        'logins_today': logins_today,
+        'total_users': stats['total_users'],
+        'active_users': stats['active_users'],
+        'users_today': stats['users_today'],
+        'logins_today': stats['logins_today'],
         'recent_activities': activities_data,
+        'since': since,
+        'cursor': recent_activities[0].id if recent_activities else since,
         'last_updated': timezone.now().strftime('%H:%M:%S')
     }
     
+    response = JsonResponse(data)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@login_required
+@user_passes_test(lambda u: u.is_staff, login_url='home')
+def dashboard_stream(request):
+    """Server-Sent Events with new activity and changed counters for the live dashboard"""
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+    
+    subscriber = dashboard_hub.subscribe(last_event_id)
+    if subscriber is None:
+        # Every stream slot in this worker is taken; keep threads free for normal requests
+        response = HttpResponse('Too many live dashboards are open; try again shortly.', status=503)
+        response['Retry-After'] = get_stream_config()['BUSY_RETRY']
+        return response
+    response = StreamingHttpResponse(event_stream(dashboard_hub, subscriber), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required
+@user_passes_test(lambda u: u.is_staff, login_url='home')
+def activity_buffer_status(request):
+    """Queue depth and flush latency of this worker's activity log buffer"""
+    data = activity_buffer.stats()
+    data['enabled'] = get_activity_buffer_config()['ENABLED']
     return JsonResponse(data)
+
+@login_required
+@user_passes_test(lambda u: u.is_staff, login_url='home')
+def cache_status(request):
+    """Page and fragment cache hit/miss counters for this worker"""
+    return JsonResponse(cache_stats.snapshot())
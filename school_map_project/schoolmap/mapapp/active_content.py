@@ -0,0 +1,81 @@
+"""Cached lookups for the active HomePageContent and FindUsPoster.
+
+Entries are stored under a shared version number. Invalidation only bumps
+the version, so a reader that loaded old rows just before an admin edit
+writes them under a version nobody reads any more. The read path never
+writes to the database.
+"""
+from django.core.cache import cache
+from django.db import models
+
+from .models import FindUsPoster, HomePageContent
+
+VERSION_KEY = 'active_content:version'
+CACHE_TIMEOUT = 60 * 60
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidate_active_content():
+    """Bump the version so every cached active-content entry is ignored"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, get_version() + 1, None)
+
+
+def _cached(name, loader):
+    key = f'active_content:{name}:v{get_version()}'
+    # Wrapped in a tuple so that "nothing active" is cached too
+    entry = cache.get(key)
+    if entry is None:
+        entry = (loader(),)
+        cache.set(key, entry, CACHE_TIMEOUT)
+    return entry[0]
+
+
+def default_home_content():
+    """Unsaved content shown until an admin creates a HomePageContent"""
+    return HomePageContent(
+        site_title="FINDIT - School Map",
+        welcome_title="School Campus Map",
+        welcome_subtitle="Welcome back, {username}!",
+        welcome_description="Navigate your campus with ease - Find buildings, rooms, and more. Use the interactive map to explore facilities and get directions.",
+        is_active=True
+    )
+
+
+def _load_home_content():
+    return HomePageContent.objects.filter(is_active=True).first()
+
+
+def _load_poster():
+    poster = FindUsPoster.objects.filter(is_active=True).first()
+    if poster:
+        return poster
+    # Fall back to the most recent poster that has any content
+    return FindUsPoster.objects.filter(
+        models.Q(poster_image__isnull=False) |
+        models.Q(video_file__isnull=False) |
+        models.Q(youtube_url__isnull=False)
+    ).exclude(
+        models.Q(poster_image='') &
+        models.Q(video_file='') &
+        models.Q(youtube_url='')
+    ).order_by('-created_at').first()
+
+
+def get_active_home_content():
+    """The active HomePageContent, or unsaved defaults if there is none"""
+    return _cached('home', _load_home_content) or default_home_content()
+
+
+def get_active_poster():
+    """The active FindUsPoster, or the newest one with content"""
+    return _cached('poster', _load_poster)
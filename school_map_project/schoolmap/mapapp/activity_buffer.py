@@ -0,0 +1,188 @@
+"""In-process buffer that moves ActivityLog INSERTs off the request path.
+
+log_activity() hands entries to the buffer, and a background thread writes
+them with a single bulk_create once MAX_SIZE entries are waiting or every
+FLUSH_INTERVAL seconds. Each gunicorn worker gets its own buffer and
+flusher thread, and whatever is still pending is written when the worker
+exits. If the database can't be reached the batch waits for the next
+flush; if it rejects the batch, the entries are written one by one and
+the ones it still rejects (say, for a user deleted meanwhile) are dropped. With ENABLED set to False, entries are written synchronously,
+which is what the test runner uses.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, connection, transaction
+from django.utils import timezone
+
+from .dashboard_version import bump_version
+from .models import ActivityLog, ActivityDailyStat
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Flush as soon as this many entries are waiting
+    'MAX_SIZE': 100,
+    # Seconds between time-based flushes
+    'FLUSH_INTERVAL': 2.0,
+    # Oldest entries are dropped beyond this if the database is unreachable
+    'MAX_PENDING': 10000,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'ACTIVITY_LOG_BUFFER', {}))
+    return config
+
+
+def write_activities(entries):
+    """Insert ActivityLog entries and bump the daily rollup in one transaction"""
+    totals = Counter(
+        (timezone.localdate(entry.timestamp), entry.action) for entry in entries
+    )
+    with transaction.atomic():
+        ActivityLog.objects.bulk_create(entries)
+        for (date, action), amount in totals.items():
+            ActivityDailyStat.increment(date, action, amount)
+        bump_version()
+
+
+class ActivityBuffer:
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        # Also called in a forked worker, where the parent's lock, thread and
+        # pending entries must not be reused
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pending = []
+        self.flushed_total = 0
+        self.dropped_total = 0
+        self.flush_count = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def add(self, entry):
+        if self._pid != os.getpid():
+            self._reset()
+        config = get_config()
+        with self._lock:
+            self._pending.append(entry)
+            overflow = len(self._pending) - config['MAX_PENDING']
+            if overflow > 0:
+                del self._pending[:overflow]
+                self.dropped_total += overflow
+            depth = len(self._pending)
+        self._ensure_thread()
+        if depth >= config['MAX_SIZE']:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='activity-log-flusher', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(get_config()['FLUSH_INTERVAL'])
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush the activity log buffer')
+            finally:
+                # This thread is never inside a request, so nothing else
+                # closes its connection
+                connection.close()
+
+    def flush(self):
+        """Write every pending entry and return how many were written"""
+        if self._pid != os.getpid():
+            return 0
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+
+        started = time.perf_counter()
+        try:
+            write_activities(batch)
+            written = batch
+        except (OperationalError, InterfaceError):
+            # The database is unreachable; put the batch back so the next flush can retry it
+            with self._lock:
+                self._pending[:0] = batch
+            raise
+        except Exception:
+            logger.exception('Activity log batch rejected; writing its entries one by one')
+            written = self._write_each(batch)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            self.flushed_total += len(written)
+            self.flush_count += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+        return len(written)
+
+    def _write_each(self, batch):
+        """Write entries one at a time, dropping those the database rejects; returns those written"""
+        written = []
+        for index, entry in enumerate(batch):
+            # The failed bulk insert may have assigned ids that were rolled back
+            entry.pk = None
+            try:
+                write_activities([entry])
+            except (OperationalError, InterfaceError):
+                with self._lock:
+                    self._pending[:0] = batch[index:]
+                raise
+            except Exception:
+                logger.exception('Dropped an activity log entry the database rejected: %s', entry.action)
+                with self._lock:
+                    self.dropped_total += 1
+            else:
+                written.append(entry)
+        return written
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pid': self._pid,
+                'queue_depth': len(self._pending) if self._pid == os.getpid() else 0,
+                'flushed_total': self.flushed_total,
+                'dropped_total': self.dropped_total,
+                'flush_count': self.flush_count,
+                'last_flush_ms': round(self.last_flush_ms, 3),
+                'max_flush_ms': round(self.max_flush_ms, 3),
+                'avg_flush_ms': round(self.total_flush_ms / self.flush_count, 3) if self.flush_count else 0.0,
+            }
+
+
+activity_buffer = ActivityBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    # gunicorn workers leave through sys.exit(), so this runs on shutdown
+    try:
+        activity_buffer.flush()
+    except Exception:
+        logger.exception('Failed to flush the activity log buffer on exit')
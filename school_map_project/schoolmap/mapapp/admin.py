@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import BuildingInfo, FindUsPoster, HomePageContent, HomePageContent
+from .models import (
+    BuildingInfo, FindUsPoster, HomePageContent, HomePageContent, Room, Schedule, Section, StudentEnrollment, Subject,
+    WalkwayEdge, WalkwayNode,
+)
+from .active_content import invalidate_active_content
+from .page_cache import purge_page_cache
+from .videos import queue_transcode
 
 @admin.register(BuildingInfo)
 class BuildingInfoAdmin(admin.ModelAdmin):
@@ -9,10 +15,11 @@ class BuildingInfoAdmin(admin.ModelAdmin):
 
 @admin.register(FindUsPoster)
 class FindUsPosterAdmin(admin.ModelAdmin):
-    list_display = ['title', 'is_active', 'created_at']
-    list_filter = ['is_active', 'created_at']
+    list_display = ['title', 'is_active', 'video_status', 'created_at']
+    list_filter = ['is_active', 'video_status', 'created_at']
     search_fields = ['title']
-    actions = ['make_active', 'make_inactive']
+    actions = ['make_active', 'make_inactive', 'transcode_videos']
+    readonly_fields = ['video_status', 'video_error', 'video_processed_at', 'original_video', 'video_poster']
     
     fieldsets = (
         ('Basic Information', {
@@ -21,6 +28,10 @@ class FindUsPosterAdmin(admin.ModelAdmin):
         ('Media Content', {
             'fields': ('poster_image', 'video_file', 'youtube_url'),
             'description': 'Upload a poster image and optionally add a video (either upload a file OR provide a YouTube URL)'
+        }),
+        ('Video Processing', {
+            'fields': ('video_status', 'video_error', 'video_processed_at', 'original_video', 'video_poster'),
+            'description': 'Uploaded videos are transcoded in the background; the optimized version replaces the upload when done'
         })
     )
     
@@ -29,13 +40,27 @@ class FindUsPosterAdmin(admin.ModelAdmin):
         FindUsPoster.objects.update(is_active=False)
         # Then activate selected ones
         queryset.update(is_active=True)
+        # update() sends no signals, so refresh the cached poster here
+        invalidate_active_content()
+        purge_page_cache()
         self.message_user(request, f'{queryset.count()} poster(s) activated.')
     make_active.short_description = "Activate selected posters"
     
     def make_inactive(self, request, queryset):
         queryset.update(is_active=False)
+        invalidate_active_content()
+        purge_page_cache()
         self.message_user(request, f'{queryset.count()} poster(s) deactivated.')
     make_inactive.short_description = "Deactivate selected posters"
+    
+    def transcode_videos(self, request, queryset):
+        posters = queryset.exclude(video_file='').exclude(video_file__isnull=True)
+        ids = list(posters.values_list('pk', flat=True))
+        posters.update(video_status='pending', video_error='')
+        for poster_id in ids:
+            queue_transcode(poster_id)
+        self.message_user(request, f'{len(ids)} video(s) queued for transcoding.')
+    transcode_videos.short_description = "Transcode videos of selected posters"
 
 @admin.register(HomePageContent)
 class HomePageContentAdmin(admin.ModelAdmin):
@@ -62,4 +87,50 @@ class HomePageContentAdmin(admin.ModelAdmin):
         if obj.is_active:
             # Deactivate other home page contents
             HomePageContent.objects.exclude(pk=obj.pk).update(is_active=False)
-        super().save_model(request, obj, form, change)
\ No newline at end of file
+        super().save_model(request, obj, form, change)
+
+@admin.register(WalkwayNode)
+class WalkwayNodeAdmin(admin.ModelAdmin):
+    list_display = ['id', 'label', 'building', 'x', 'y']
+    search_fields = ['label', 'building']
+    list_filter = ['building']
+
+@admin.register(WalkwayEdge)
+class WalkwayEdgeAdmin(admin.ModelAdmin):
+    list_display = ['id', 'start', 'end', 'length']
+    list_select_related = ['start', 'end']
+    raw_id_fields = ['start', 'end']
+
+@admin.register(Room)
+class RoomAdmin(admin.ModelAdmin):
+    list_display = ['room_number', 'building', 'floor', 'room_type', 'capacity']
+    search_fields = ['room_number', 'building']
+    list_filter = ['building', 'room_type']
+
+@admin.register(Subject)
+class SubjectAdmin(admin.ModelAdmin):
+    list_display = ['code', 'name', 'units', 'is_active']
+    search_fields = ['code', 'name']
+    list_filter = ['is_active']
+
+@admin.register(Section)
+class SectionAdmin(admin.ModelAdmin):
+    list_display = ['name', 'grade_level', 'academic_year', 'adviser', 'is_active']
+    search_fields = ['name']
+    list_filter = ['academic_year', 'grade_level', 'is_active']
+    raw_id_fields = ['adviser']
+
+@admin.register(StudentEnrollment)
+class StudentEnrollmentAdmin(admin.ModelAdmin):
+    list_display = ['student', 'section', 'academic_year', 'is_active']
+    list_select_related = ['student', 'section']
+    list_filter = ['academic_year', 'is_active']
+    raw_id_fields = ['student', 'section']
+
+@admin.register(Schedule)
+class ScheduleAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'section', 'teacher', 'room', 'day', 'time_slot', 'academic_year', 'is_active']
+    list_select_related = ['subject', 'section', 'teacher', 'room']
+    list_filter = ['academic_year', 'day', 'is_active']
+    search_fields = ['subject__name', 'section__name', 'room__room_number']
+    raw_id_fields = ['teacher', 'section', 'room']
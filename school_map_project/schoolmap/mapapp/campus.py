@@ -0,0 +1,115 @@
+"""Campus map data shared by the server-side search and map features.
+
+This replaces the old static/js/buildings.js. Browsers get it, merged
+with BuildingInfo, from /api/buildings.js (see catalogue.py). Boxes are
+in the 1440x1106 coordinate space of the campus SVG, and coordinates
+are (lat, lng).
+"""
+
+SVG_WIDTH = 1440
+SVG_HEIGHT = 1106
+
+
+def svg_to_percent(x, y, width, height):
+    """Box position and size as percentages of the campus SVG"""
+    return {
+        'x': x / SVG_WIDTH * 100,
+        'y': y / SVG_HEIGHT * 100,
+        'width': width / SVG_WIDTH * 100,
+        'height': height / SVG_HEIGHT * 100,
+    }
+
+
+CAMPUS_BUILDINGS = [
+    {
+        'name': 'Library',
+        'category': 'Facilities',
+        'icon': 'book',
+        'description': 'School library with study areas and reading materials.',
+        'coordinates': (11.551417, 124.416917),
+        'details': {
+            'grade_levels': ['All Grade Levels'],
+            'sections': ['Research Nook', 'Quiet Study'],
+            'extra_info': 'Multi-level stacks and collaborative study pods.',
+        },
+        'svg_box': (722, 577, 86, 34),
+    },
+    {
+        'name': 'Admin Office',
+        'category': 'Administrative',
+        'icon': 'university',
+        'description': 'Administrative offices and staff rooms.',
+        'coordinates': (11.552500, 124.417194),
+        'details': {
+            'grade_levels': ['All Grades'],
+            'sections': ["Principal's Office", 'Registrar'],
+            'extra_info': 'Handles enrollment, records management, and overall campus coordination.',
+        },
+        'svg_box': (1046, 139, 106, 71),
+    },
+    {
+        'name': 'Caregiving',
+        'category': 'Academic',
+        'icon': 'user-nurse',
+        'description': 'Caregiving classrooms for students.',
+        'coordinates': (11.551083, 124.417),
+        'details': {
+            'grade_levels': ['Grades 11-12'],
+            'sections': ['Caregiving Sections'],
+            'extra_info': 'Practical caregiving competency training.',
+        },
+        'svg_box': (912, 159, 80, 67),
+    },
+    {
+        'name': 'Junior High / Canteen / Clinic',
+        'category': 'Academic',
+        'icon': 'school',
+        'description': 'Junior High classrooms, canteen, and clinic.',
+        'coordinates': (11.551917, 124.416778),
+        'details': {
+            'grade_levels': ['Grades 7-10'],
+            'sections': ['Classrooms & Services'],
+            'extra_info': 'Multiple sections and student support services.',
+        },
+        'svg_box': (870, 161, 70, 40),
+    },
+    {
+        'name': 'Food Processing 1',
+        'category': 'Academic',
+        'icon': 'utensils',
+        'description': 'Food Processing lab 1.',
+        'coordinates': (11.551528, 124.416556),
+        'details': {
+            'grade_levels': ['Grade 10'],
+            'sections': ['Lab 1'],
+            'extra_info': 'Hands-on culinary and food processing skills.',
+        },
+        'svg_box': (645, 138, 22, 71),
+    },
+    {
+        'name': 'Food Processing 2',
+        'category': 'Academic',
+        'icon': 'utensils',
+        'description': 'Food Processing lab 2.',
+        'coordinates': (11.551528, 124.416444),
+        'details': {
+            'grade_levels': ['Grade 10'],
+            'sections': ['Lab 2'],
+            'extra_info': 'Hands-on culinary and food processing skills.',
+        },
+        'svg_box': (587, 138, 23, 71),
+    },
+    {
+        'name': 'Canteen 2',
+        'category': 'Facilities',
+        'icon': 'utensils',
+        'description': 'Secondary canteen for students.',
+        'coordinates': (11.551417, 124.416361),
+        'details': {
+            'grade_levels': ['All Grades'],
+            'sections': ['Cafeteria'],
+            'extra_info': 'Secondary cafeteria near exit.',
+        },
+        'svg_box': (645, 117, 35, 30),
+    },
+]
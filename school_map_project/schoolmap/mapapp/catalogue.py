@@ -0,0 +1,185 @@
+"""The building catalogue served at /api/buildings/ and /api/buildings.js.
+
+Map geometry, categories and details come from campus.py. Descriptions,
+hours and images come from BuildingInfo. The catalogue is built once per
+building version (the shared version the search index bumps on every
+BuildingInfo change) and compressed up front. Most requests then only
+compare an ETag.
+"""
+import gzip
+import hashlib
+import json
+import threading
+
+from django.core.cache import cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from .campus import CAMPUS_BUILDINGS, svg_to_percent
+from .models import BuildingInfo
+from .search import shared_version
+
+CACHE_TIMEOUT = 60 * 60 * 24
+# Clients keep their copy but check the ETag before every use
+CACHE_CONTROL = 'public, no-cache'
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'js': 'application/javascript; charset=utf-8',
+}
+
+
+def campus_entry(building):
+    details = building['details']
+    return {
+        'name': building['name'],
+        'category': building['category'],
+        'icon': building['icon'],
+        'description': building['description'],
+        'coordinates': list(building['coordinates']),
+        'details': {
+            'gradeLevels': details['grade_levels'],
+            'sections': details['sections'],
+            'extraInfo': details['extra_info'],
+        },
+        **svg_to_percent(*building['svg_box']),
+        'mapped': True,
+    }
+
+
+def unmapped_entry(name):
+    """Buildings added by an admin that have no place on the map yet"""
+    return {
+        'name': name,
+        'category': 'Other',
+        'icon': 'building',
+        'description': '',
+        'coordinates': None,
+        'details': {'gradeLevels': [], 'sections': [], 'extraInfo': ''},
+        'mapped': False,
+    }
+
+
+def merge_building_info(entry, info):
+    entry['id'] = info.id if info else None
+    entry['operatingHours'] = info.operating_hours if info else ''
+    entry['image'] = info.image.url if info and info.image else None
+    if info and info.description:
+        entry['description'] = info.description
+    return entry
+
+
+def build_catalogue(buildings=None):
+    """Campus buildings in map order, then the remaining BuildingInfo rows by name"""
+    if buildings is None:
+        buildings = BuildingInfo.objects.order_by('name')
+    by_name = {building.name.lower(): building for building in buildings}
+    entries = []
+    for building in CAMPUS_BUILDINGS:
+        info = by_name.pop(building['name'].lower(), None)
+        entries.append(merge_building_info(campus_entry(building), info))
+    for info in by_name.values():
+        entries.append(merge_building_info(unmapped_entry(info.name), info))
+    return entries
+
+
+def encode(body):
+    """The body in every encoding we can serve, keyed by Content-Encoding"""
+    encodings = {
+        'identity': body,
+        # mtime=0 keeps the bytes, and so the ETag, identical across workers
+        'gzip': gzip.compress(body, compresslevel=9, mtime=0),
+    }
+    if brotli is not None:
+        encodings['br'] = brotli.compress(body)
+    return encodings
+
+
+def render(entries):
+    data = json.dumps(entries, separators=(',', ':'))
+    bodies = {
+        'json': data.encode(),
+        'js': f'window.buildings = window.buildingsData = {data};\n'.encode(),
+    }
+    catalogue = {}
+    for fmt, body in bodies.items():
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        catalogue[fmt] = {
+            'etag': f'"{digest}"',
+            'encodings': encode(body),
+        }
+    return catalogue
+
+
+class BuildingCatalogue:
+    """Rendered catalogue for the current version, kept per process and in the cache"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._rendered = None
+
+    def invalidate(self):
+        self._version = None
+
+    def get(self, fmt='json'):
+        version = shared_version()
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    key = f'building_catalogue:v{version}'
+                    rendered = cache.get(key)
+                    if rendered is None:
+                        rendered = render(build_catalogue())
+                        cache.set(key, rendered, CACHE_TIMEOUT)
+                    self._rendered = rendered
+                    self._version = version
+        return self._rendered[fmt]
+
+
+building_catalogue = BuildingCatalogue()
+
+
+def accepted_encodings(header):
+    """Codings listed in Accept-Encoding, leaving out any given q=0"""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    return accepted
+
+
+def choose_encoding(header, available):
+    accepted = accepted_encodings(header)
+    for coding in ('br', 'gzip'):
+        if coding in available and (coding in accepted or '*' in accepted):
+            return coding
+    return 'identity'
+
+
+def representation_etag(etag, coding):
+    # Each encoding is its own representation and gets its own strong ETag
+    return etag if coding == 'identity' else f'{etag[:-1]}-{coding}"'
+
+
+def etag_matches(header, etags):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    tags = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return not tags.isdisjoint(etags)
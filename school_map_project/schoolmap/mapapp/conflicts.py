@@ -0,0 +1,110 @@
+"""Double-booking checks for timetable edits and uploads.
+
+A single edit is checked against the day's room and teacher timelines in
+the timetable index (see timetable.py). That is a binary search, not a
+query over the year's schedules. A whole term's timetable, whether
+uploaded or already stored, is checked in one pass. Bookings are grouped
+by room, teacher and section for each day, each group is sorted by start
+time and swept once, and every overlapping pair is reported.
+"""
+import heapq
+
+from .timetable import DAYS, clock, parse_clock, schedule_entry, timetable
+
+RESOURCES = ('room', 'teacher', 'section')
+
+
+def resource_label(kind, entry):
+    if kind == 'room':
+        return f"{entry['building']} {entry['room']}"
+    return entry[kind]
+
+
+def conflict(kind, day, start, end, bookings):
+    return {
+        'kind': kind,
+        'day': day,
+        'resource': resource_label(kind, bookings[0]),
+        'start': clock(start),
+        'end': clock(end),
+        'bookings': bookings,
+    }
+
+
+def conflict_message(found):
+    booking = found['bookings'][0]
+    return (
+        f"{found['kind'].title()} {found['resource']} is already booked on {found['day'].title()} "
+        f"{found['start']}-{found['end']} ({booking['subject']}, {booking['section']})"
+    )
+
+
+def schedule_conflicts(schedule):
+    """Stored bookings that clash with a new or edited schedule's room or teacher"""
+    index = timetable.ensure_current(schedule.academic_year)
+    start, end = schedule.minutes
+    found = []
+    for kind, key in (('room', schedule.room_id), ('teacher', schedule.teacher_id)):
+        timeline = index.timeline(kind, schedule.day, key) if key is not None else None
+        if timeline is None:
+            continue
+        for entry in timeline.overlapping(start, end):
+            if entry['id'] != schedule.id:
+                overlap_start = max(start, parse_clock(entry['start']))
+                overlap_end = min(end, parse_clock(entry['end']))
+                found.append(conflict(kind, schedule.day, overlap_start, overlap_end, [entry]))
+    return found
+
+
+def find_conflicts(intervals):
+    """Every pair of overlapping bookings of one room, teacher or section, by day and time"""
+    groups = {}
+    for interval in intervals:
+        entry = interval[2]
+        for kind in RESOURCES:
+            key = entry[f'{kind}_id']
+            if key is not None:
+                groups.setdefault((kind, entry['day'], key), []).append(interval)
+
+    found = []
+    for (kind, day, _), group in groups.items():
+        if len(group) < 2:
+            continue
+        group.sort(key=lambda interval: interval[:2])
+        # Bookings still running, keyed by end time
+        running = []
+        for order, (start, end, entry) in enumerate(group):
+            while running and running[0][0] <= start:
+                heapq.heappop(running)
+            for other_end, _, other in running:
+                found.append(conflict(kind, day, start, min(end, other_end), [other, entry]))
+            heapq.heappush(running, (end, order, entry))
+    found.sort(key=lambda item: (DAYS.index(item['day']), item['start'], RESOURCES.index(item['kind'])))
+    return found
+
+
+def validate_timetable(schedules, academic_year, replace=False):
+    """Conflicts within a batch of unsaved schedules and between the batch and what is stored.
+
+    Each schedule needs its subject, section, teacher and room loaded.
+    Uploaded bookings carry their 1-based position in the batch as 'row'.
+    With replace=True the batch stands in for the whole stored timetable.
+    """
+    intervals = []
+    replaced = set()
+    for row, schedule in enumerate(schedules, start=1):
+        if not schedule.is_active:
+            continue
+        start, end = schedule.minutes
+        intervals.append((start, end, dict(schedule_entry(schedule), row=row)))
+        if schedule.id is not None:
+            replaced.add(schedule.id)
+    if not replace:
+        stored = timetable.ensure_current(academic_year).intervals
+        intervals.extend(interval for interval in stored if interval[2]['id'] not in replaced)
+    return find_conflicts(intervals)
+
+
+def timetable_conflicts(academic_year=None):
+    """Every conflict in the stored timetable for an academic year"""
+    return find_conflicts(list(timetable.ensure_current(academic_year).intervals))
@@ -0,0 +1,30 @@
+"""Version counter for the data behind the admin dashboard's live numbers.
+
+write_activities() bumps it for every batch of ActivityLog rows and the
+User signals bump it on every save or delete, so dashboard_api can answer
+If-None-Match with a single cache read instead of recounting.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'dashboard:version'
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def _bump():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, get_version() + 1, None)
+
+
+def bump_version():
+    """Bump once the current transaction commits, so readers see the new rows"""
+    transaction.on_commit(_bump)
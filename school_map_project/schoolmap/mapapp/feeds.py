@@ -0,0 +1,162 @@
+"""Cursor-based change feeds for notifications and section schedule updates.
+
+Every feed (one per user, one per section) has a cursor: the id of its
+newest row, kept in the shared cache and moved forward after each write
+commits. A client without a cursor gets the newest rows; one with a
+cursor gets the rows after it, oldest first, a page at a time, with
+has_more set while it has pages left to catch up on. A client that is up to date either gets a 304 straight away or,
+with ?wait=<seconds>, is held until the cursor moves or the wait runs
+out. While held it only reads the cache, and writes in the same process
+wake it at once. Concurrent long-polls per process are capped, so idle
+tabs cannot use up the worker's threads.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Notification, ScheduleChange
+
+DEFAULTS = {
+    # Longest a client may be held, in seconds
+    'MAX_WAIT': 25.0,
+    # How often a held request re-reads the shared cursor
+    'CHECK_INTERVAL': 1.0,
+    # Held requests per process; beyond this they are answered at once.
+    # None: a quarter of WEB_THREADS, so normal requests always have threads
+    'MAX_WAITERS': None,
+}
+
+# Rows returned when a client has no cursor yet, and per page after it
+PAGE_SIZE = 20
+
+_changed = threading.Condition()
+_waiters_lock = threading.Lock()
+_waiters = 0
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CHANGE_FEEDS', {}))
+    if config['MAX_WAITERS'] is None:
+        config['MAX_WAITERS'] = max(1, getattr(settings, 'WEB_THREADS', 8) // 4)
+    return config
+
+
+def clamp_wait(value):
+    """Seconds to hold a request, from a ?wait= value: within [0, MAX_WAIT], and 0 if not a number"""
+    try:
+        wait = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    # float() accepts "nan", which compares false with everything and never times out
+    if not math.isfinite(wait):
+        return 0.0
+    return max(0.0, min(wait, get_config()['MAX_WAIT']))
+
+
+def _reserve_waiter():
+    global _waiters
+    with _waiters_lock:
+        if _waiters >= get_config()['MAX_WAITERS']:
+            return False
+        _waiters += 1
+        return True
+
+
+def _release_waiter():
+    global _waiters
+    with _waiters_lock:
+        _waiters -= 1
+
+
+class Feed:
+    def __init__(self, name, model, field):
+        self.name = name
+        self.model = model
+        self.field = field
+
+    def key(self, owner_id):
+        return f'feed:{self.name}:{owner_id}'
+
+    def cursor(self, owner_id):
+        """Id of the newest row in this feed, or 0"""
+        key = self.key(owner_id)
+        cursor = cache.get(key)
+        if cursor is None:
+            cursor = (
+                self.model.objects.filter(**{self.field: owner_id})
+                .order_by('-id').values_list('id', flat=True).first()
+            ) or 0
+            # add() so a concurrent advance() is never overwritten by an older value
+            cache.add(key, cursor, None)
+            cursor = cache.get(key, cursor)
+        return cursor
+
+    def advance(self, owner_id, row_id):
+        def publish():
+            key = self.key(owner_id)
+            current = cache.get(key)
+            if current is None or current < row_id:
+                cache.set(key, row_id, None)
+            with _changed:
+                _changed.notify_all()
+        transaction.on_commit(publish)
+
+    def rows(self, owner_id, since=None):
+        """(rows, whether more rows follow them): the newest rows, or the oldest ones after `since`"""
+        queryset = self.model.objects.filter(**{self.field: owner_id})
+        if since is None:
+            return list(queryset.order_by('-id')[:PAGE_SIZE]), False
+        rows = list(queryset.filter(id__gt=since).order_by('id')[:PAGE_SIZE + 1])
+        return rows[:PAGE_SIZE], len(rows) > PAGE_SIZE
+
+    def wait(self, owner_id, seen, timeout):
+        """The cursor once it moves past `seen`, or the unchanged cursor after `timeout`"""
+        cursor = self.cursor(owner_id)
+        timeout = clamp_wait(timeout)
+        if cursor > seen or timeout <= 0:
+            return cursor
+        if not _reserve_waiter():
+            return cursor
+        try:
+            config = get_config()
+            deadline = time.monotonic() + timeout
+            while cursor <= seen:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                with _changed:
+                    _changed.wait(min(config['CHECK_INTERVAL'], remaining))
+                cursor = self.cursor(owner_id)
+            return cursor
+        finally:
+            _release_waiter()
+
+
+notification_feed = Feed('notifications', Notification, 'recipient_id')
+schedule_feed = Feed('schedule_changes', ScheduleChange, 'section_id')
+
+
+def notify(recipient, title, body='', kind='generic', metadata=None):
+    notification = Notification.objects.create(
+        recipient=recipient, title=title, body=body, kind=kind, metadata=metadata or {},
+    )
+    notification_feed.advance(recipient.id, notification.id)
+    return notification
+
+
+def notify_section(section_id, title, body='', kind='generic', metadata=None):
+    """notify() every student actively enrolled in the section"""
+    students = User.objects.filter(enrollments__section_id=section_id, enrollments__is_active=True).distinct()
+    return [notify(student, title, body, kind, metadata) for student in students]
+
+
+def record_schedule_change(section_id, kind='updated', description=''):
+    change = ScheduleChange.objects.create(section_id=section_id, kind=kind, description=description)
+    schedule_feed.advance(section_id, change.id)
+    return change
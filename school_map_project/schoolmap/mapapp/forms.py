@@ -3,7 +3,8 @@ from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.forms import ModelForm
-from .models import UserPreferences, FindUsPoster
+from .models import UserPreferences, FindUsPoster, Schedule, Section, StudentEnrollment
+from .timetable import is_academic_year
 
 class UserPreferencesForm(forms.ModelForm):
     class Meta:
@@ -225,3 +226,62 @@ class FindUsPosterForm(forms.ModelForm):
                 raise ValidationError('Please enter a valid YouTube URL (e.g., https://www.youtube.com/watch?v=VIDEO_ID)')
         
         return youtube_url
+
+
+class AcademicYearMixin:
+    """Only accept years the timetable index and conflict checks can match."""
+
+    def clean_academic_year(self):
+        academic_year = self.cleaned_data['academic_year'].strip()
+        if not is_academic_year(academic_year):
+            raise ValidationError('Enter the academic year as YYYY-YYYY, e.g. 2024-2025.')
+        return academic_year
+
+
+class SectionForm(AcademicYearMixin, forms.ModelForm):
+    class Meta:
+        model = Section
+        fields = ['name', 'grade_level', 'academic_year', 'is_active']
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 10-Newton'}),
+            'grade_level': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+            # The schedule form on the same page also has an academic_year field
+            'academic_year': forms.TextInput(attrs={
+                'class': 'form-control',
+                'id': 'id_academic_year_section',
+                'placeholder': 'e.g., 2024-2025'
+            }),
+        }
+
+
+class ScheduleForm(AcademicYearMixin, forms.ModelForm):
+    class Meta:
+        model = Schedule
+        fields = ['subject', 'section', 'room', 'day', 'time_slot', 'academic_year']
+        widgets = {
+            'subject': forms.Select(attrs={'class': 'form-control'}),
+            'section': forms.Select(attrs={'class': 'form-control'}),
+            'room': forms.Select(attrs={'class': 'form-control'}),
+            'day': forms.Select(attrs={'class': 'form-control'}),
+            'time_slot': forms.Select(attrs={'class': 'form-control'}),
+            'academic_year': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 2024-2025'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['subject'].queryset = self.fields['subject'].queryset.filter(is_active=True)
+        self.fields['section'].queryset = Section.objects.filter(is_active=True)
+
+
+class EnrollmentForm(AcademicYearMixin, forms.ModelForm):
+    class Meta:
+        model = StudentEnrollment
+        fields = ['section', 'academic_year']
+        widgets = {
+            'section': forms.Select(attrs={'class': 'form-control'}),
+            'academic_year': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 2024-2025'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['section'].queryset = Section.objects.filter(is_active=True)
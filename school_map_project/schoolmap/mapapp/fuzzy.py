@@ -0,0 +1,189 @@
+"""Typo-tolerant search over buildings, sections and grade levels.
+
+Candidates come from a character-trigram index. Only the
+MAX_CANDIDATES entries sharing the most trigrams with the query are
+scored with edit distance, so the cost of scoring does not grow with
+the catalogue. The index is rebuilt whenever the shared building
+version from mapapp.search changes.
+"""
+import heapq
+import threading
+from operator import itemgetter
+
+from .campus import CAMPUS_BUILDINGS
+from .models import BuildingInfo
+from .search import shared_version, tokenize
+
+# Entries scored with edit distance per query
+MAX_CANDIDATES = 64
+# Trigrams shared by more entries than this don't help narrow the
+# candidates, so they are skipped once rarer ones have matched
+MAX_POSTING = 2000
+MIN_SCORE = 0.5
+
+# Common shorthand expanded before matching
+ABBREVIATIONS = {
+    'bldg': 'building',
+    'bldng': 'building',
+    'blg': 'building',
+    'lib': 'library',
+    'rm': 'room',
+    'gr': 'grade',
+    'jhs': 'junior high',
+    'caf': 'cafeteria',
+    'sci': 'science',
+}
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance, or limit + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (
+                previous2 is not None and i > 1 and j > 1
+                and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]
+            ):
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def word_similarity(query_word, entry_word):
+    if len(query_word) >= 2 and entry_word.startswith(query_word):
+        return 1.0
+    longest = max(len(query_word), len(entry_word))
+    limit = max(1, longest // 3)
+    distance = edit_distance(query_word, entry_word, limit)
+    if distance > limit:
+        return 0.0
+    return 1.0 - distance / longest
+
+
+def normalize_query(query):
+    words = []
+    for word in tokenize(query):
+        words.extend(ABBREVIATIONS.get(word, word).split())
+    return words
+
+
+class TrigramIndex:
+    def __init__(self):
+        self.entries = []
+        # trigram -> indexes into self.entries
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, label, payload):
+        words = tokenize(label)
+        if not words:
+            return
+        grams = set()
+        for word in words:
+            grams |= trigrams(word)
+        index = len(self.entries)
+        self.entries.append({
+            'words': words,
+            'gram_count': len(grams),
+            'payload': payload,
+        })
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(index)
+
+    def _candidates(self, grams):
+        counts = {}
+        postings = [self.postings[gram] for gram in grams if gram in self.postings]
+        postings.sort(key=len)
+        for posting in postings:
+            if len(posting) > MAX_POSTING and counts:
+                break
+            for index in posting:
+                counts[index] = counts.get(index, 0) + 1
+        return heapq.nlargest(MAX_CANDIDATES, counts.items(), key=itemgetter(1))
+
+    def search(self, query, limit=10):
+        words = normalize_query(query)
+        if not words:
+            return []
+        grams = set()
+        for word in words:
+            grams |= trigrams(word)
+
+        scored = []
+        for index, shared in self._candidates(grams):
+            entry = self.entries[index]
+            word_score = sum(
+                max(word_similarity(word, entry_word) for entry_word in entry['words'])
+                for word in words
+            ) / len(words)
+            gram_score = shared / (len(grams) + entry['gram_count'] - shared)
+            score = 0.7 * word_score + 0.3 * gram_score
+            if score >= MIN_SCORE:
+                # Ties go to the entry indexed first
+                scored.append((score, -index))
+
+        best = heapq.nlargest(limit, scored)
+        return [
+            dict(self.entries[-index]['payload'], score=round(score, 3))
+            for score, index in best
+        ]
+
+
+def build_index(buildings=None, campus=CAMPUS_BUILDINGS):
+    """Index building names plus the sections and grade levels in each building"""
+    if buildings is None:
+        buildings = BuildingInfo.objects.only('name')
+    index = TrigramIndex()
+    seen = set()
+    for building in buildings:
+        seen.add(building.name.lower())
+        index.add(building.name, {'kind': 'building', 'label': building.name, 'building': building.name})
+    for building in campus:
+        name = building['name']
+        if name.lower() not in seen:
+            index.add(name, {'kind': 'building', 'label': name, 'building': name})
+        for section in building['details']['sections']:
+            index.add(section, {'kind': 'section', 'label': section, 'building': name})
+        for grade_level in building['details']['grade_levels']:
+            index.add(grade_level, {'kind': 'grade_level', 'label': grade_level, 'building': name})
+    return index
+
+
+class FuzzySearch:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.index = TrigramIndex()
+        self._version = None
+
+    def invalidate(self):
+        self._version = None
+
+    def search(self, query, limit=10):
+        version = shared_version()
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self.index = build_index()
+                    self._version = version
+        return self.index.search(query, limit)
+
+
+fuzzy_search = FuzzySearch()
@@ -0,0 +1,257 @@
+"""Resized WebP and JPEG copies of uploaded images, for srcset.
+
+Once a profile picture, building image, poster or home page image is
+saved, its derivatives are queued on a small per-process thread pool, so
+the upload request doesn't wait for them. Each derivative is stored next
+to the original, e.g. building_images/gym.jpg gets
+building_images/gym__w320.webp and building_images/gym__w320.jpg, and is
+recorded as an ImageDerivative row. Images are never upscaled. A source
+narrower than a width gets one copy at its own width instead.
+
+Templates ask for the derivatives with {% responsive_image %} or
+{% srcset %} (templatetags/images.py). A lookup is cached, so a page
+doesn't query per image. Until the derivatives exist, the tags fall back
+to the original file.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+
+from .models import ImageDerivative
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Without the pool, derivatives are made inline when the save commits (tests)
+    'ASYNC': True,
+    'WORKERS': 2,
+    'QUALITY': 80,
+    # Seconds an image with no derivatives yet is remembered as such
+    'MISSING_TIMEOUT': 60,
+    # Seconds an image that failed to process is left alone by later saves of its model
+    'FAILURE_TIMEOUT': 24 * 60 * 60,
+}
+
+# Widths per kind of image: avatars are shown at 40-200 CSS px, the rest up to full width
+WIDTHS = {
+    'avatar': (48, 96, 192, 384),
+    'content': (320, 640, 960, 1280, 1920),
+}
+
+# (app_label.Model, field) -> kind of image
+IMAGE_FIELDS = {
+    ('mapapp.UserPreferences', 'profile_picture'): 'avatar',
+    ('mapapp.BuildingInfo', 'image'): 'content',
+    ('mapapp.FindUsPoster', 'poster_image'): 'content',
+    ('mapapp.HomePageContent', 'logo_image'): 'avatar',
+    ('mapapp.HomePageContent', 'background_image'): 'content',
+}
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+# Sources queued in this process and not yet done
+_pending = set()
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'IMAGE_DERIVATIVES', {}))
+    return config
+
+
+def image_fields(instance):
+    """(field name, kind) for each image field of the instance's model that gets derivatives"""
+    label = instance._meta.label
+    return [(field, kind) for (model, field), kind in IMAGE_FIELDS.items() if model == label]
+
+
+def cache_key(source):
+    return f"images:variants:{hashlib.md5(source.encode()).hexdigest()}"
+
+
+def failure_key(source):
+    return f"images:failed:{hashlib.md5(source.encode()).hexdigest()}"
+
+
+def derivative_name(source, width, image_format):
+    root, _ = os.path.splitext(source)
+    return f'{root}__w{width}.{EXTENSIONS[image_format]}'
+
+
+def variants_for(source):
+    """{format: [(width, name)] by width} for a stored image, or {} if it has none yet"""
+    if not source:
+        return {}
+    key = cache_key(source)
+    variants = cache.get(key)
+    if variants is None:
+        variants = {}
+        for width, image_format, name in (
+            ImageDerivative.objects.filter(source=source).order_by('width').values_list('width', 'format', 'name')
+        ):
+            variants.setdefault(image_format, []).append((width, name))
+        cache.set(key, variants, None if variants else get_config()['MISSING_TIMEOUT'])
+    return variants
+
+
+def encode(image, image_format, quality):
+    buffer = io.BytesIO()
+    if image_format == 'jpeg':
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() or image.mode == 'P' else 'RGB')
+        image.save(buffer, 'WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def generate_derivatives(source, kind, storage=None):
+    """Make and record every derivative of one stored image; returns the ImageDerivative rows"""
+    if Image is None:
+        raise RuntimeError('Pillow is required to make image derivatives')
+    storage = storage or default_storage
+    quality = get_config()['QUALITY']
+    with storage.open(source) as file:
+        original = Image.open(file)
+        original.load()
+    # Phones store rotation in EXIF; bake it in, since derivatives drop the EXIF data
+    original = ImageOps.exif_transpose(original)
+
+    derivatives = []
+    for width in sorted({min(width, original.width) for width in WIDTHS[kind]}):
+        height = max(1, round(original.height * width / original.width))
+        resized = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+        for image_format in EXTENSIONS:
+            name = derivative_name(source, width, image_format)
+            if storage.exists(name):
+                storage.delete(name)
+            name = storage.save(name, ContentFile(encode(resized, image_format, quality)))
+            derivatives.append(ImageDerivative(source=source, width=width, format=image_format, name=name))
+
+    with transaction.atomic():
+        ImageDerivative.objects.filter(source=source).delete()
+        ImageDerivative.objects.bulk_create(derivatives)
+    cache.delete_many([cache_key(source), failure_key(source)])
+    return derivatives
+
+
+def delete_derivatives(source, storage=None):
+    storage = storage or default_storage
+    for name in ImageDerivative.objects.filter(source=source).values_list('name', flat=True):
+        storage.delete(name)
+    ImageDerivative.objects.filter(source=source).delete()
+    cache.delete(cache_key(source))
+
+
+def _executor():
+    global _pool, _pool_pid
+    with _lock:
+        # A forked worker can't use its parent's threads
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(max_workers=get_config()['WORKERS'], thread_name_prefix='image-derivatives')
+            _pool_pid = os.getpid()
+            _pending.clear()
+        return _pool
+
+
+def _generate(source, kind):
+    try:
+        generate_derivatives(source, kind)
+    except Exception:
+        logger.exception('Failed to make derivatives of %s', source)
+        # Saving the model again won't retry it; a new upload or make_image_derivatives will
+        cache.set(failure_key(source), True, get_config()['FAILURE_TIMEOUT'])
+
+
+def _run(source, kind):
+    try:
+        _generate(source, kind)
+    finally:
+        with _lock:
+            _pending.discard(source)
+        # This thread is never inside a request, so nothing else closes its connection
+        connection.close()
+
+
+def queue_derivatives(source, kind):
+    """Make the derivatives once the current transaction commits, in the background unless ASYNC is off"""
+    def submit():
+        if not get_config()['ASYNC']:
+            _generate(source, kind)
+            return
+        pool = _executor()
+        with _lock:
+            if source in _pending:
+                return
+            _pending.add(source)
+        pool.submit(_run, source, kind)
+    transaction.on_commit(submit)
+
+
+def remember_images(instance):
+    """After loading: the stored image names, to tell later which files a save replaced"""
+    deferred = instance.get_deferred_fields()
+    instance._stored_images = {
+        field: getattr(instance, field).name or ''
+        for field, _ in image_fields(instance) if field not in deferred
+    }
+
+
+def note_uploads(instance):
+    """Before a save: remember which image fields hold a new, not yet stored upload"""
+    instance._image_uploads = {
+        field for field, _ in image_fields(instance)
+        if getattr(instance, field) and not getattr(instance, field)._committed
+    }
+
+
+def queue_for_instance(instance):
+    """
+    After a save: drop the derivatives of replaced or cleared images, and queue
+    derivatives for new uploads and for images that have none yet
+    """
+    uploads = instance.__dict__.pop('_image_uploads', set())
+    stored = instance.__dict__.get('_stored_images', {})
+    for field, kind in image_fields(instance):
+        source = getattr(instance, field).name or ''
+        previous = stored.get(field, '')
+        if previous and previous != source:
+            transaction.on_commit(lambda previous=previous: delete_derivatives(previous))
+        stored[field] = source
+        # A new upload may reuse an old file's name, so its derivatives are always remade
+        if source and (field in uploads or not (variants_for(source) or cache.get(failure_key(source)))):
+            queue_derivatives(source, kind)
+    instance._stored_images = stored
+
+
+def delete_for_instance(instance):
+    """After a delete: drop the derivatives of the instance's images"""
+    for field, _ in image_fields(instance):
+        source = getattr(instance, field).name
+        if source:
+            transaction.on_commit(lambda source=source: delete_derivatives(source))
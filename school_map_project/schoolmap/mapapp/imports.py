@@ -0,0 +1,473 @@
+"""Bulk imports of buildings, users and schedules from CSV or XLSX files.
+
+The file is read as a stream of rows and validated a chunk at a time.
+Each lookup costs one query per chunk (every name, username or section in
+it at once) rather than an exists() per row. New rows are written with
+bulk_create and changed rows with bulk_update, one transaction per batch.
+Rows that fail validation are skipped and reported by line number. A dry
+run validates everything and writes nothing.
+
+Bulk writes send no model signals. Each importer therefore refreshes what
+the signals would have (search index, timetable, dashboard) once at the end.
+"""
+import codecs
+import csv
+import io
+import zipfile
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+
+try:
+    import openpyxl
+    from openpyxl.utils.exceptions import InvalidFileException
+except ImportError:
+    openpyxl = InvalidFileException = None
+
+from .conflicts import validate_timetable
+from .dashboard_version import bump_version as bump_dashboard_version
+from .feeds import notify_section, record_schedule_change
+from .models import (
+    DAY_CHOICES, TIME_SLOT_CHOICES, BuildingInfo, Room, Schedule, Section, StudentEnrollment, Subject,
+)
+from .page_cache import purge_page_cache
+from .provisioning import create_users, hash_passwords
+from .search import bump_shared_version
+from .timetable import current_academic_year, invalidate_timetable
+
+DEFAULTS = {
+    # Rows validated together, with one query per lookup
+    'CHUNK_SIZE': 1000,
+    # Rows written per transaction
+    'BATCH_SIZE': 500,
+    # Rows a file may have, checked before anything is written; None for no limit
+    'MAX_ROWS': None,
+    # Limits on files uploaded through the admin dashboard; larger imports
+    # go through the import_data management command
+    'UPLOAD_MAX_ROWS': 5000,
+    'UPLOAD_MAX_SIZE': 5 * 1024 * 1024,
+}
+
+# Raised while reading a malformed or mislabelled file
+READ_ERRORS = (csv.Error, zipfile.BadZipFile, UnicodeDecodeError) + (
+    (InvalidFileException,) if InvalidFileException else ()
+)
+
+DAYS = {day for day, _ in DAY_CHOICES}
+TIME_SLOTS = {slot for slot, _ in TIME_SLOT_CHOICES}
+
+
+def get_config(**overrides):
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'BULK_IMPORT', {}))
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    return config
+
+
+def chunked(items, size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def cell(value):
+    if value is None:
+        return ''
+    # Spreadsheets hand back whole numbers as floats
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def open_rows(file, filename):
+    """The file's column names and an iterator of (line number, row dict) pairs"""
+    extension = filename.lower().rsplit('.', 1)[-1]
+    if extension == 'csv':
+        lines = file if isinstance(file, io.TextIOBase) else codecs.iterdecode(file, 'utf-8-sig')
+        rows = csv.reader(lines)
+    elif extension == 'xlsx':
+        if openpyxl is None:
+            raise ValueError('Install openpyxl to import .xlsx files')
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+    else:
+        raise ValueError('Only .csv and .xlsx files can be imported')
+
+    header = next(rows, None)
+    if header is None:
+        raise ValueError('The file is empty')
+    columns = [cell(name).lower().replace(' ', '_') for name in header]
+
+    def records():
+        for line, values in enumerate(rows, start=2):
+            values = [cell(value) for value in values]
+            if any(values):
+                yield line, dict(zip(columns, values))
+
+    return columns, records()
+
+
+def normalize_slot(value):
+    """'7:30 - 8:30' -> '07:30-08:30'"""
+    parts = [part.strip() for part in value.split('-')]
+    if len(parts) != 2:
+        return value
+    return '-'.join(part.zfill(5) for part in parts)
+
+
+class Importer:
+    required = ()
+    optional = ()
+    model = None
+    update_fields = ()
+
+    def __init__(self, dry_run=False, academic_year=None, **overrides):
+        self.config = get_config(**overrides)
+        self.dry_run = dry_run
+        # Default for rows without an academic_year column
+        self.academic_year = academic_year or current_academic_year()
+        self.summary = {'rows': 0, 'created': 0, 'updated': 0, 'errors': [], 'dry_run': dry_run}
+        # Keys already seen in this file, to catch duplicate rows
+        self.seen = set()
+
+    def error(self, line, message):
+        self.summary['errors'].append((line, message))
+
+    def run(self, file, filename, progress=None):
+        """Import every row; progress(summary) is called after each chunk"""
+        try:
+            columns, rows = open_rows(file, filename)
+            missing = [column for column in self.required if column not in columns]
+            if missing:
+                raise ValueError(f"Missing columns: {', '.join(missing)}")
+            max_rows = self.config['MAX_ROWS']
+            if max_rows:
+                rows = list(islice(rows, max_rows + 1))
+                if len(rows) > max_rows:
+                    raise ValueError(
+                        f'The file has more than {max_rows} rows; import it with the import_data management command'
+                    )
+            for chunk in chunked(rows, self.config['CHUNK_SIZE']):
+                self.summary['rows'] += len(chunk)
+                self.process(chunk)
+                if progress:
+                    progress(self.summary)
+        except READ_ERRORS as exc:
+            raise ValueError(f'The file could not be read as {filename.rsplit(".", 1)[-1]}: {exc}') from exc
+        self.complete()
+        if not self.dry_run and (self.summary['created'] or self.summary['updated']):
+            self.finish()
+        return self.summary
+
+    def process(self, chunk):
+        creates, updates = self.prepare(chunk)
+        self.write(creates, updates)
+
+    def complete(self):
+        """Called once every chunk is processed"""
+
+    def write(self, creates, updates):
+        self.summary['created'] += len(creates)
+        self.summary['updated'] += len(updates)
+        if self.dry_run:
+            return
+        for batch in chunked(creates, self.config['BATCH_SIZE']):
+            with transaction.atomic():
+                self.create(batch)
+        for batch in chunked(updates, self.config['BATCH_SIZE']):
+            with transaction.atomic():
+                self.model.objects.bulk_update(batch, self.update_fields)
+
+    def create(self, batch):
+        self.model.objects.bulk_create(batch)
+
+    def prepare(self, chunk):
+        """(objects to create, objects to update) for the valid rows of a chunk"""
+        raise NotImplementedError
+
+    def finish(self):
+        """Refresh whatever the skipped model signals would have"""
+
+
+class BuildingImporter(Importer):
+    required = ('name',)
+    optional = ('description', 'operating_hours')
+    model = BuildingInfo
+    update_fields = ('description', 'operating_hours', 'updated_at')
+
+    def prepare(self, chunk):
+        names = {row.get('name', '') for _, row in chunk}
+        existing = {building.name: building for building in BuildingInfo.objects.filter(name__in=names)}
+        now = timezone.now()
+        creates, updates = [], []
+        for line, row in chunk:
+            name = row.get('name', '')
+            if not name:
+                self.error(line, 'name is required')
+                continue
+            if name in self.seen:
+                self.error(line, f'{name} appears more than once')
+                continue
+            self.seen.add(name)
+
+            building = existing.get(name)
+            if building is None:
+                building = BuildingInfo(name=name, description=row.get('description', ''), created_at=now,
+                                        updated_at=now)
+                if row.get('operating_hours'):
+                    building.operating_hours = row['operating_hours']
+                creates.append(building)
+                continue
+            changed = False
+            for field in ('description', 'operating_hours'):
+                if row.get(field) and row[field] != getattr(building, field):
+                    setattr(building, field, row[field])
+                    changed = True
+            if changed:
+                building.updated_at = now
+                updates.append(building)
+        return creates, updates
+
+    def finish(self):
+        # The search index, catalogue and spatial index all follow this version
+        bump_shared_version()
+        purge_page_cache()
+
+
+class UserImporter(Importer):
+    """Users by username, optionally enrolled in a section (by name) for an academic year"""
+    required = ('username',)
+    optional = ('email', 'first_name', 'last_name', 'password', 'section', 'academic_year')
+    model = User
+    update_fields = ('email', 'first_name', 'last_name')
+
+    def __init__(self, dry_run=False, academic_year=None, **overrides):
+        super().__init__(dry_run=dry_run, academic_year=academic_year, **overrides)
+        self.summary['enrolled'] = 0
+        self.validate_username = UnicodeUsernameValidator()
+
+    def prepare(self, chunk):
+        usernames = {row.get('username', '') for _, row in chunk}
+        existing = {user.username: user for user in User.objects.filter(username__in=usernames)}
+        wanted = {
+            (row['section'], row.get('academic_year') or self.academic_year)
+            for _, row in chunk if row.get('section')
+        }
+        sections = {
+            (section.name, section.academic_year): section
+            for section in Section.objects.filter(
+                name__in={name for name, _ in wanted}, academic_year__in={year for _, year in wanted},
+            )
+        }
+
+        creates, updates = [], []
+        # (user, plain password) for new users, hashed together below
+        passwords = []
+        # (username, section) for rows that ask for an enrollment
+        self.enrollments = []
+        for line, row in chunk:
+            username = row.get('username', '')
+            try:
+                self.validate_username(username)
+                if row.get('email'):
+                    validate_email(row['email'])
+            except ValidationError as exc:
+                self.error(line, f'{username or "username"}: {exc.messages[0]}')
+                continue
+            section = None
+            if row.get('section'):
+                section = sections.get((row['section'], row.get('academic_year') or self.academic_year))
+                if section is None:
+                    self.error(line, f"Unknown section {row['section']}")
+                    continue
+            if username in self.seen:
+                self.error(line, f'{username} appears more than once')
+                continue
+            self.seen.add(username)
+
+            user = existing.get(username)
+            if user is None:
+                user = User(
+                    username=username, email=row.get('email', ''),
+                    first_name=row.get('first_name', ''), last_name=row.get('last_name', ''),
+                )
+                if row.get('password'):
+                    passwords.append((user, row['password']))
+                else:
+                    user.set_unusable_password()
+                creates.append(user)
+            else:
+                changed = False
+                for field in self.update_fields:
+                    if row.get(field) and row[field] != getattr(user, field):
+                        setattr(user, field, row[field])
+                        changed = True
+                if changed:
+                    updates.append(user)
+            if section is not None:
+                self.enrollments.append((username, section))
+        if passwords and not self.dry_run:
+            hashed = hash_passwords([password for _, password in passwords])
+            for (user, _), password in zip(passwords, hashed):
+                user.password = password
+        return creates, updates
+
+    def process(self, chunk):
+        super().process(chunk)
+        self.summary['enrolled'] += len(self.enrollments)
+        if not self.dry_run and self.enrollments:
+            with transaction.atomic():
+                self.enroll(self.enrollments)
+
+    def create(self, batch):
+        create_users(batch, BATCH_SIZE=self.config['BATCH_SIZE'])
+
+    def enroll(self, enrollments):
+        ids = dict(User.objects.filter(username__in=[username for username, _ in enrollments])
+                   .values_list('username', 'id'))
+        current = {
+            (enrollment.student_id, enrollment.academic_year): enrollment
+            for enrollment in StudentEnrollment.objects.filter(
+                student_id__in=ids.values(), academic_year__in={section.academic_year for _, section in enrollments},
+            )
+        }
+        creates, updates = [], []
+        for username, section in enrollments:
+            enrollment = current.get((ids[username], section.academic_year))
+            if enrollment is None:
+                creates.append(StudentEnrollment(student_id=ids[username], section=section,
+                                                 academic_year=section.academic_year))
+            elif enrollment.section_id != section.id or not enrollment.is_active:
+                enrollment.section, enrollment.is_active = section, True
+                updates.append(enrollment)
+        StudentEnrollment.objects.bulk_create(creates, batch_size=self.config['BATCH_SIZE'])
+        StudentEnrollment.objects.bulk_update(updates, ['section', 'is_active'], batch_size=self.config['BATCH_SIZE'])
+
+    def finish(self):
+        bump_dashboard_version()
+
+
+class ScheduleImporter(Importer):
+    """A term's timetable: one class meeting per row, checked for double bookings before anything is written.
+
+    Rows are resolved chunk by chunk, but the whole file is checked for
+    conflicts in one pass at the end, so every parsed row is held in memory.
+    """
+    required = ('subject', 'section', 'teacher', 'day', 'time_slot')
+    optional = ('building', 'room', 'academic_year')
+    model = Schedule
+    update_fields = ('subject', 'teacher', 'room', 'is_active', 'updated_at')
+
+    def __init__(self, dry_run=False, academic_year=None, **overrides):
+        super().__init__(dry_run=dry_run, academic_year=academic_year, **overrides)
+        # (line, schedule, is new) for every valid row
+        self.parsed = []
+
+    def prepare(self, chunk):
+        years = {row.get('academic_year') or self.academic_year for _, row in chunk}
+        subjects = {subject.code: subject for subject in Subject.objects.filter(
+            code__in={row.get('subject', '') for _, row in chunk})}
+        teachers = {user.username: user for user in User.objects.filter(
+            username__in={row.get('teacher', '') for _, row in chunk})}
+        sections = {(section.name, section.academic_year): section for section in Section.objects.filter(
+            name__in={row.get('section', '') for _, row in chunk}, academic_year__in=years)}
+        rooms = {(room.building.lower(), room.room_number): room for room in Room.objects.filter(
+            room_number__in={row.get('room', '') for _, row in chunk if row.get('room')})}
+        existing = {
+            (schedule.section_id, schedule.day, schedule.time_slot, schedule.academic_year): schedule
+            for schedule in Schedule.objects.filter(section__in=list(sections.values()), academic_year__in=years)
+        }
+
+        for line, row in chunk:
+            year = row.get('academic_year') or self.academic_year
+            day = row.get('day', '').lower()
+            time_slot = normalize_slot(row.get('time_slot', ''))
+            subject = subjects.get(row.get('subject', ''))
+            teacher = teachers.get(row.get('teacher', ''))
+            section = sections.get((row.get('section', ''), year))
+            room = None
+            if row.get('room'):
+                room = rooms.get((row.get('building', '').lower(), row['room']))
+            problems = [
+                message for missing, message in (
+                    (day not in DAYS, f"Unknown day {row.get('day', '')}"),
+                    (time_slot not in TIME_SLOTS, f"Unknown time slot {row.get('time_slot', '')}"),
+                    (subject is None, f"Unknown subject {row.get('subject', '')}"),
+                    (teacher is None, f"Unknown teacher {row.get('teacher', '')}"),
+                    (section is None, f"Unknown section {row.get('section', '')} for {year}"),
+                    (row.get('room') and room is None, f"Unknown room {row.get('building', '')} {row.get('room')}"),
+                ) if missing
+            ]
+            if problems:
+                self.error(line, '; '.join(problems))
+                continue
+            key = (section.id, day, time_slot, year)
+            if key in self.seen:
+                self.error(line, f'{section.name} has two classes on {day} {time_slot}')
+                continue
+            self.seen.add(key)
+
+            schedule = existing.get(key)
+            if schedule is None:
+                schedule = Schedule(section=section, day=day, time_slot=time_slot, academic_year=year)
+            # Loaded objects keep the conflict check from querying per row
+            schedule.section, schedule.subject, schedule.teacher, schedule.room = section, subject, teacher, room
+            schedule.is_active = True
+            self.parsed.append((line, schedule, schedule.id is None))
+        return [], []
+
+    def complete(self):
+        rejected = set()
+        by_year = {}
+        for parsed in self.parsed:
+            by_year.setdefault(parsed[1].academic_year, []).append(parsed)
+        for year, parsed in by_year.items():
+            for found in validate_timetable([schedule for _, schedule, _ in parsed], year):
+                lines = [parsed[booking['row'] - 1][0] for booking in found['bookings'] if booking.get('row')]
+                others = [booking for booking in found['bookings'] if not booking.get('row')]
+                clash = (
+                    f"{found['kind']} {found['resource']} is double-booked on {found['day']} "
+                    f"{found['start']}-{found['end']}"
+                )
+                if others:
+                    clash += f" with {others[0]['subject']} ({others[0]['section']})"
+                for line in lines:
+                    if line not in rejected:
+                        self.error(line, clash)
+                    rejected.add(line)
+
+        now = timezone.now()
+        creates, updates = [], []
+        for line, schedule, is_new in self.parsed:
+            if line in rejected:
+                continue
+            schedule.updated_at = now
+            if is_new:
+                schedule.created_at = now
+            (creates if is_new else updates).append(schedule)
+        self.sections = {schedule.section_id for schedule in creates + updates}
+        self.summary['errors'].sort()
+        self.write(creates, updates)
+
+    def finish(self):
+        invalidate_timetable()
+        Section.objects.filter(pk__in=self.sections).update(schedules_last_updated=timezone.now())
+        for section_id in self.sections:
+            record_schedule_change(section_id, 'updated', 'Timetable imported')
+            notify_section(section_id, 'Timetable updated', 'Timetable imported', kind='schedule_updated')
+
+
+IMPORTERS = {
+    'buildings': BuildingImporter,
+    'users': UserImporter,
+    'schedules': ScheduleImporter,
+}
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from mapapp.models import Building, Room, Subject, Section, Schedule, StudentEnrollment
+from mapapp.models import Room, Subject, Section, Schedule
+from mapapp.timetable import current_academic_year
 
 class Command(BaseCommand):
     help = 'Adds sample schedules to the database'
@@ -8,19 +9,21 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         User = get_user_model()
         
-        # Get existing objects
-        main_building = Building.objects.get(name='Main Building')
+        academic_year = current_academic_year()
+        
+        # Get existing objects (see setup_initial_data)
+        main_building = 'Junior High / Canteen / Clinic'
         room101 = Room.objects.get(building=main_building, room_number='101')
         room201 = Room.objects.get(building=main_building, room_number='201')
         
-        science_building = Building.objects.get(name='Science Building')
+        science_building = 'Food Processing 1'
         lab101 = Room.objects.get(building=science_building, room_number='101')
         
         math = Subject.objects.get(code='MATH101')
         science = Subject.objects.get(code='SCI101')
         
-        section_a = Section.objects.get(name='10-Newton')
-        section_b = Section.objects.get(name='11-Einstein')
+        section_a = Section.objects.get(name='10-Newton', academic_year=academic_year)
+        section_b = Section.objects.get(name='11-Einstein', academic_year=academic_year)
         
         teacher = User.objects.get(username='teacher')
         
@@ -34,7 +37,7 @@ class Command(BaseCommand):
                 'room': room101,
                 'day': 'monday',
                 'time_slot': '07:30-08:30',
-                'academic_year': '2024-2025',
+                'academic_year': academic_year,
                 'is_active': True
             },
             {
@@ -44,7 +47,7 @@ class Command(BaseCommand):
                 'room': lab101,
                 'day': 'monday',
                 'time_slot': '08:30-09:30',
-                'academic_year': '2024-2025',
+                'academic_year': academic_year,
                 'is_active': True
             },
             # Tuesday
@@ -55,7 +58,7 @@ class Command(BaseCommand):
                 'room': room201,
                 'day': 'tuesday',
                 'time_slot': '09:30-10:30',
-                'academic_year': '2024-2025',
+                'academic_year': academic_year,
                 'is_active': True
             },
             # Wednesday
@@ -66,7 +69,7 @@ class Command(BaseCommand):
                 'room': lab101,
                 'day': 'wednesday',
                 'time_slot': '10:30-11:30',
-                'academic_year': '2024-2025',
+                'academic_year': academic_year,
                 'is_active': True
             },
         ]
@@ -79,9 +82,9 @@ class Command(BaseCommand):
                 section=schedule_data['section'],
                 day=schedule_data['day'],
                 time_slot=schedule_data['time_slot'],
+                academic_year=schedule_data['academic_year'],
                 defaults={
                     'room': schedule_data['room'],
-                    'academic_year': schedule_data['academic_year'],
                     'is_active': schedule_data['is_active']
                 }
             )
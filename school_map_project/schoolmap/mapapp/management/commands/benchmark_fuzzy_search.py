@@ -0,0 +1,56 @@
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from mapapp.campus import CAMPUS_BUILDINGS
+from mapapp.fuzzy import build_index
+
+WORDS = [
+    'library', 'science', 'building', 'canteen', 'clinic', 'laboratory', 'gym',
+    'admin', 'office', 'registrar', 'junior', 'senior', 'high', 'hall', 'annex',
+    'computer', 'food', 'processing', 'caregiving', 'chapel', 'music', 'art',
+]
+
+# Typos students actually make, checked against the generated catalogue
+QUERIES = ['libary', 'scince bldg', 'cantene', 'clinc', 'laboratroy', 'registar', 'food procesing', 'gym']
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Report fuzzy search p50/p99 latency at several catalogue sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+        parser.add_argument('--rounds', type=int, default=200, help='Queries timed per size')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(f"{'entries':>8} {'p50 ms':>8} {'p99 ms':>8} {'build ms':>9}")
+        for size in options['sizes']:
+            buildings = [
+                SimpleNamespace(name=f"{' '.join(rng.sample(WORDS, 2)).title()} {number}")
+                for number in range(size)
+            ]
+            started = time.perf_counter()
+            index = build_index(buildings, CAMPUS_BUILDINGS)
+            build_ms = (time.perf_counter() - started) * 1000
+
+            samples = []
+            for _ in range(options['rounds']):
+                query = rng.choice(QUERIES)
+                started = time.perf_counter()
+                index.search(query)
+                samples.append((time.perf_counter() - started) * 1000)
+
+            self.stdout.write(
+                f'{len(index):>8} {statistics.median(samples):>8.3f} '
+                f'{percentile(samples, 0.99):>8.3f} {build_ms:>9.1f}'
+            )
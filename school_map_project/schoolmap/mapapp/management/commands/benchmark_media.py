@@ -0,0 +1,87 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from mapapp.models import MediaBlob
+from mapapp.storage import CachedMediaStorage, LocalRemoteStorage
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def timed(samples, call, *args):
+    started = time.perf_counter()
+    result = call(*args)
+    samples.append((time.perf_counter() - started) * 1000)
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Compare saves and URL lookups on the remote store alone and behind the local media cache, with no network'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=200)
+        parser.add_argument('--size', type=int, default=64 * 1024, help='Bytes per file')
+        parser.add_argument('--duplicates', type=float, default=0.3, help='Share of files repeating earlier content')
+        parser.add_argument('--latency', type=float, default=20.0, help='Milliseconds per remote store call')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        contents = []
+        for _ in range(options['files']):
+            if contents and rng.random() < options['duplicates']:
+                contents.append(rng.choice(contents))
+            else:
+                contents.append(rng.randbytes(options['size']))
+
+        latency = options['latency'] / 1000
+        with tempfile.TemporaryDirectory() as root:
+            direct = LocalRemoteStorage(location=os.path.join(root, 'direct'), base_url='/media/direct/', latency=latency)
+            cached = CachedMediaStorage(
+                remote=LocalRemoteStorage(location=os.path.join(root, 'remote'), base_url='/media/remote/',
+                                          latency=latency),
+                local=LocalRemoteStorage(location=os.path.join(root, 'blobs'), base_url='/media/blobs/', latency=0),
+            )
+            # Nothing the benchmark writes is kept
+            with transaction.atomic():
+                results = [
+                    ('remote only', *self.run(direct, contents, lambda: None)),
+                    ('local cache', *self.run(cached, contents, lambda: self.drain(cached))),
+                ]
+                transaction.set_rollback(True)
+
+        self.stdout.write(f"{'storage':<12} {'save p50':>9} {'save p99':>9} {'url p50':>8} {'upload s':>9}")
+        for label, saves, urls, upload in results:
+            self.stdout.write(
+                f'{label:<12} {statistics.median(saves):>9.2f} {percentile(saves, 0.99):>9.2f} '
+                f'{statistics.median(urls):>8.3f} {upload:>9.2f}'
+            )
+
+    def run(self, storage, contents, drain):
+        """Save every file, then look up every URL twice; times in ms, background upload time in s"""
+        saves, urls = [], []
+        names = [
+            timed(saves, storage.save, f'bench/file{number}.bin', ContentFile(content))
+            for number, content in enumerate(contents)
+        ]
+        started = time.perf_counter()
+        drain()
+        upload = time.perf_counter() - started
+        for _ in range(2):
+            for name in names:
+                timed(urls, storage.url, name)
+        return saves, urls, upload
+
+    def drain(self, storage):
+        # What the upload pool would do after each commit
+        for digest in MediaBlob.objects.filter(remote_name='').values_list('digest', flat=True).distinct():
+            storage.upload(digest)
@@ -0,0 +1,64 @@
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.template import engines
+
+STATIC_TAG_RE = re.compile(r"""{%\s*static\s+(['"])(?P<path>[^'"]+)\1""")
+
+
+class Command(BaseCommand):
+    help = (
+        'Fail if a template links a static file by a path that is not hashed: a hard-coded '
+        'STATIC_URL path, or a {% static %} file missing from the manifest (run after collectstatic)'
+    )
+
+    def handle(self, *args, **options):
+        manifest = isinstance(staticfiles_storage, ManifestFilesMixin)
+        if manifest and not staticfiles_storage.hashed_files:
+            raise CommandError('The staticfiles manifest is empty; run collectstatic first')
+        hardcoded = re.compile(
+            rf"""["'(]\s*(?P<path>{re.escape(settings.STATIC_URL)}[^"')\s]+)|{{{{\s*STATIC_URL\s*}}}}"""
+        )
+        ignored = set(getattr(settings, 'STATIC_ASSET_CHECK', {}).get('IGNORE_TEMPLATES', ()))
+
+        problems = []
+        checked = 0
+        for name, path in self.templates():
+            if name in ignored:
+                continue
+            checked += 1
+            with open(path, encoding='utf-8', errors='replace') as file:
+                for line_number, line in enumerate(file, 1):
+                    for match in hardcoded.finditer(line):
+                        problems.append(f"{name}:{line_number}: hard-coded {match.group('path') or 'STATIC_URL'}")
+                    for match in STATIC_TAG_RE.finditer(line):
+                        if not self.is_served(match.group('path'), manifest):
+                            problems.append(f"{name}:{line_number}: {match.group('path')} is not a collected static file")
+
+        for problem in problems:
+            self.stdout.write(problem)
+        if problems:
+            raise CommandError(f'{len(problems)} unhashed static references in templates')
+        self.stdout.write(self.style.SUCCESS(f'Static references in {checked} templates all resolve to hashed files'))
+
+    def templates(self):
+        """(name relative to its template directory, absolute path) of every template file"""
+        for engine in engines.all():
+            for directory in engine.template_dirs:
+                for root, _, files in os.walk(directory):
+                    for filename in files:
+                        path = os.path.join(root, filename)
+                        yield os.path.relpath(path, directory).replace(os.sep, '/'), path
+
+    def is_served(self, path, manifest):
+        if not manifest:
+            # Nothing is hashed until collectstatic; at least the file must exist
+            return finders.find(path) is not None
+        try:
+            return staticfiles_storage.stored_name(path) != path
+        except ValueError:
+            return False
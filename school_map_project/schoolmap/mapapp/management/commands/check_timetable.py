@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from mapapp.conflicts import timetable_conflicts
+from mapapp.timetable import current_academic_year
+
+class Command(BaseCommand):
+    help = 'Report every double-booked room, teacher and section in a timetable'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--academic-year', help='e.g. 2025-2026 (default: the current academic year)')
+
+    def handle(self, *args, **options):
+        academic_year = options['academic_year'] or current_academic_year()
+        conflicts = timetable_conflicts(academic_year)
+
+        for found in conflicts:
+            first, second = found['bookings']
+            self.stdout.write(
+                f"{found['day'].title()} {found['start']}-{found['end']}: {found['kind']} {found['resource']} "
+                f"has {first['subject']} ({first['section']}) and {second['subject']} ({second['section']})"
+            )
+        if conflicts:
+            self.stdout.write(self.style.WARNING(f'{len(conflicts)} conflicts in the {academic_year} timetable'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'No conflicts in the {academic_year} timetable'))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mapapp.imports import IMPORTERS
+
+class Command(BaseCommand):
+    help = 'Import buildings, users or schedules from a .csv or .xlsx file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path', help='A .csv or .xlsx file with a header row')
+        parser.add_argument('--dry-run', action='store_true', help='Validate every row without saving anything')
+        parser.add_argument('--chunk-size', type=int, help='Rows validated together')
+        parser.add_argument('--batch-size', type=int, help='Rows saved per transaction')
+        parser.add_argument('--academic-year', help='For rows without one (default: the current academic year)')
+
+    def handle(self, *args, **options):
+        importer = IMPORTERS[options['kind']](
+            dry_run=options['dry_run'],
+            academic_year=options['academic_year'],
+            CHUNK_SIZE=options['chunk_size'],
+            BATCH_SIZE=options['batch_size'],
+        )
+
+        def progress(summary):
+            self.stdout.write(
+                f"{summary['rows']} rows read: {summary['created']} new, {summary['updated']} updated, "
+                f"{len(summary['errors'])} rejected"
+            )
+
+        try:
+            with open(options['path'], 'rb') as file:
+                summary = importer.run(file, options['path'], progress=progress)
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for line, message in summary['errors']:
+            self.stdout.write(self.style.WARNING(f'Line {line}: {message}'))
+        verb = 'Would import' if summary['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {summary['created']} new and {summary['updated']} updated {options['kind']}; "
+            f"{len(summary['errors'])} rows rejected"
+        ))
@@ -0,0 +1,30 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from mapapp.images import IMAGE_FIELDS, generate_derivatives, variants_for
+
+class Command(BaseCommand):
+    help = 'Make resized WebP/JPEG derivatives for uploaded images that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Remake derivatives that already exist')
+
+    def handle(self, *args, **options):
+        made = failed = 0
+        for (label, field), kind in IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            sources = (
+                model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                .values_list(field, flat=True).distinct()
+            )
+            for source in sources:
+                if not options['force'] and variants_for(source):
+                    continue
+                try:
+                    generate_derivatives(source, kind)
+                except Exception as exc:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'{source}: {exc}'))
+                    continue
+                made += 1
+        self.stdout.write(self.style.SUCCESS(f'Made derivatives for {made} images; {failed} failed'))
@@ -0,0 +1,45 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mapapp.imports import open_rows
+from mapapp.provisioning import provision_users
+
+class Command(BaseCommand):
+    help = 'Create many user accounts at once, hashing passwords in parallel or sending invite links instead'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='A .csv or .xlsx file with a username column and optional email, first_name, '
+                         'last_name, password and is_staff columns',
+        )
+        parser.add_argument('--invite', action='store_true',
+                            help='Write an invite link for every account created without a password')
+        parser.add_argument('--base-url', default='', help='Prefix for invite links, e.g. https://findit.example.com')
+        parser.add_argument('--workers', type=int, help='Password hashing processes (default: one per CPU)')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as file:
+                columns, rows = open_rows(file, options['path'])
+                if 'username' not in columns:
+                    raise CommandError('Missing columns: username')
+                rows = [
+                    dict(row, is_staff=row.get('is_staff', '').lower() in ('1', 'true', 'yes'))
+                    for _, row in rows if row.get('username')
+                ]
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        result = provision_users(rows, invite=options['invite'], WORKERS=options['workers'])
+
+        for username in result['skipped']:
+            self.stdout.write(self.style.WARNING(f'{username} already exists; skipped'))
+        if result['invites']:
+            writer = csv.writer(self.stdout, lineterminator='\n')
+            writer.writerow(['username', 'invite_url'])
+            for username, path in result['invites'].items():
+                writer.writerow([username, options['base_url'].rstrip('/') + path])
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(result['created'])} users; skipped {len(result['skipped'])}"
+        ))
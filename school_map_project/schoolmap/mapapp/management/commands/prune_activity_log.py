@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mapapp.retention import get_policy, prune_activity_log
+
+class Command(BaseCommand):
+    help = 'Archive ActivityLog rows older than the retention window and delete them in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Retention window in days (default: ACTIVITY_LOG_RETENTION["DAYS"])')
+        parser.add_argument('--batch-size', type=int, help='Rows archived and deleted per transaction')
+        parser.add_argument('--no-archive', action='store_true', help='Delete expired rows without archiving them')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would be pruned')
+
+    def handle(self, *args, **options):
+        overrides = {
+            'DAYS': options['days'],
+            'BATCH_SIZE': options['batch_size'],
+            'ARCHIVE': False if options['no_archive'] else None,
+        }
+        policy = get_policy(**overrides)
+        # A window of 0 days or less would prune the whole log
+        if policy['DAYS'] < 1:
+            raise CommandError('--days must be at least 1')
+        if policy['BATCH_SIZE'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        summary = prune_activity_log(dry_run=options['dry_run'], **overrides)
+
+        cutoff = summary['cutoff'].strftime('%Y-%m-%d %H:%M')
+        if options['dry_run']:
+            self.stdout.write(f"{summary['pruned']} rows older than {cutoff} would be pruned")
+            return
+
+        for path in sorted(summary['archives']):
+            self.stdout.write(f'Archived to {path}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Pruned {summary['pruned']} rows older than {cutoff} "
+            f"in {summary['batches']} batches of up to {policy['BATCH_SIZE']}"
+        ))
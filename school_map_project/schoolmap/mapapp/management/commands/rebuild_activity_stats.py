@@ -0,0 +1,66 @@
+from argparse import ArgumentTypeError
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from mapapp.models import ActivityLog, ActivityDailyStat
+from mapapp.retention import get_policy
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise ArgumentTypeError('must be at least 1')
+    return number
+
+class Command(BaseCommand):
+    help = (
+        'Backfill or rebuild the ActivityDailyStat rollup from ActivityLog. Days whose raw '
+        'activity has been pruned keep their rollup rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=positive_int,
+            help='Only rebuild the last N days (default: every day still in ActivityLog)',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['days'] < 1:
+            # call_command() keyword arguments skip the argparse type check
+            raise CommandError('--days must be at least 1')
+
+        oldest = ActivityLog.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+        if oldest is None:
+            self.stdout.write('No raw activity to rebuild from; the rollup is left as it is')
+            return
+        # The rollup is all that is left of pruned days, so they are never rebuilt.
+        # The oldest day left may have lost its earlier rows to pruning as well.
+        since = timezone.localdate(oldest)
+        if since <= timezone.localdate(timezone.now() - timedelta(days=get_policy()['DAYS'])):
+            since += timedelta(days=1)
+        if options['days'] is not None:
+            since = max(since, timezone.localdate() - timedelta(days=options['days'] - 1))
+        logs = ActivityLog.objects.filter(timestamp__date__gte=since)
+        stats = ActivityDailyStat.objects.filter(date__gte=since)
+
+        rows = (
+            logs.annotate(day=TruncDate('timestamp'))
+            .values('day', 'action')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+
+        with transaction.atomic():
+            deleted, _ = stats.delete()
+            created = ActivityDailyStat.objects.bulk_create([
+                ActivityDailyStat(date=row['day'], action=row['action'], count=row['total'])
+                for row in rows
+            ])
+
+        self.stdout.write(f'Removed {deleted} existing rollup rows from {since} on')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(created)} daily activity rows'))
@@ -0,0 +1,45 @@
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from mapapp.campus import CAMPUS_BUILDINGS
+from mapapp.models import WalkwayEdge, WalkwayNode
+from mapapp.routing import invalidate_routes
+
+class Command(BaseCommand):
+    help = ('Create a starting walkway graph: one entrance per campus building, '
+            'linked to its nearest neighbours. Refine it afterwards in the admin.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbours', type=int, default=3, help='Links from each entrance to its nearest entrances')
+        parser.add_argument('--replace', action='store_true', help='Delete the existing walkway graph first')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        if WalkwayNode.objects.exists():
+            if not options['replace']:
+                raise CommandError('A walkway graph already exists; use --replace to start over')
+            WalkwayNode.objects.all().delete()
+
+        nodes = []
+        for building in CAMPUS_BUILDINGS:
+            x, y, width, height = building['svg_box']
+            # Entrance at the middle of the building's bottom edge
+            nodes.append(WalkwayNode.objects.create(
+                x=x + width / 2, y=y + height, building=building['name'], label=f"{building['name']} entrance",
+            ))
+
+        pairs = set()
+        for node in nodes:
+            others = sorted(
+                (other for other in nodes if other is not node),
+                key=lambda other: math.hypot(other.x - node.x, other.y - node.y),
+            )
+            for other in others[:options['neighbours']]:
+                pairs.add(tuple(sorted((node.id, other.id))))
+        WalkwayEdge.objects.bulk_create(WalkwayEdge(start_id=start, end_id=end) for start, end in sorted(pairs))
+        # bulk_create sends no signals
+        transaction.on_commit(invalidate_routes)
+
+        self.stdout.write(self.style.SUCCESS(f'Created {len(nodes)} entrances and {len(pairs)} walkways'))
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from mapapp.models import UserProfile, Building, Room, Subject, Section, Schedule, StudentEnrollment
+from mapapp.models import Room, Subject, Section, Schedule, StudentEnrollment
+from mapapp.timetable import current_academic_year
 
 class Command(BaseCommand):
     help = 'Sets up initial data for the application'
@@ -8,26 +9,10 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         User = get_user_model()
         
-        # Create buildings
-        main_building, _ = Building.objects.get_or_create(
-            name='Main Building',
-            code='MB',
-            defaults={
-                'latitude': 14.5995,
-                'longitude': 120.9842,
-                'description': 'Main academic building with classrooms and offices.'
-            }
-        )
-        
-        science_building, _ = Building.objects.get_or_create(
-            name='Science Building',
-            code='SB',
-            defaults={
-                'latitude': 14.5985,
-                'longitude': 120.9852,
-                'description': 'Building for science laboratories and classrooms.'
-            }
-        )
+        academic_year = current_academic_year()
+        # Rooms live in the buildings named on the campus map
+        main_building = 'Junior High / Canteen / Clinic'
+        science_building = 'Food Processing 1'
         
         # Create rooms
         room101, _ = Room.objects.get_or_create(
@@ -83,17 +68,17 @@ class Command(BaseCommand):
         # Create sections
         section_a, _ = Section.objects.get_or_create(
             name='10-Newton',
+            academic_year=academic_year,
             defaults={
                 'grade_level': 10,
-                'academic_year': '2024-2025'
             }
         )
         
         section_b, _ = Section.objects.get_or_create(
             name='11-Einstein',
+            academic_year=academic_year,
             defaults={
                 'grade_level': 11,
-                'academic_year': '2024-2025'
             }
         )
         
@@ -116,20 +101,14 @@ class Command(BaseCommand):
         else:
             self.stdout.write(self.style.SUCCESS('Teacher user already exists'))
         
-        # Create or update teacher profile
-        teacher_profile, profile_created = UserProfile.objects.get_or_create(
-            user=teacher,
-            defaults={'role': 'teacher'}
-        )
+        # Teachers are staff accounts; the schedule page checks is_staff
+        if not teacher.is_staff:
+            teacher.is_staff = True
+            teacher.save(update_fields=['is_staff'])
+            self.stdout.write(self.style.SUCCESS('Marked teacher as staff'))
         
-        if teacher_profile.role != 'teacher':
-            teacher_profile.role = 'teacher'
-            teacher_profile.save()
-            self.stdout.write(self.style.SUCCESS('Updated teacher profile'))
-        elif profile_created:
-            self.stdout.write(self.style.SUCCESS('Created teacher profile'))
-        else:
-            self.stdout.write(self.style.SUCCESS('Teacher profile already exists'))
+        # Teachers advise their sections
+        Section.objects.filter(pk__in=[section_a.pk, section_b.pk], adviser__isnull=True).update(adviser=teacher)
         
         # Create schedules
         schedule1, created = Schedule.objects.get_or_create(
@@ -138,9 +117,9 @@ class Command(BaseCommand):
             section=section_a,
             day='monday',
             time_slot='07:30-08:30',
+            academic_year=academic_year,
             defaults={
                 'room': room101,
-                'academic_year': '2024-2025',
                 'is_active': True
             }
         )
@@ -153,9 +132,9 @@ class Command(BaseCommand):
             section=section_b,
             day='tuesday',
             time_slot='10:30-11:30',
+            academic_year=academic_year,
             defaults={
                 'room': lab101,
-                'academic_year': '2024-2025',
                 'is_active': True
             }
         )
@@ -180,27 +159,11 @@ class Command(BaseCommand):
         else:
             self.stdout.write(self.style.SUCCESS('Student user already exists'))
         
-        # Create or update student profile
-        student_profile, profile_created = UserProfile.objects.get_or_create(
-            user=student,
-            defaults={'role': 'student'}
-        )
-        
-        if student_profile.role != 'student':
-            student_profile.role = 'student'
-            student_profile.save()
-            self.stdout.write(self.style.SUCCESS('Updated student profile'))
-        elif profile_created:
-            self.stdout.write(self.style.SUCCESS('Created student profile'))
-        else:
-            self.stdout.write(self.style.SUCCESS('Student profile already exists'))
-        
-        # Enroll student in section_a if not already enrolled
+        # Enroll student in section_a unless already enrolled this year
         enrollment, enrollment_created = StudentEnrollment.objects.get_or_create(
             student=student,
-            section=section_a,
-            academic_year='2024-2025',
-            defaults={'is_active': True}
+            academic_year=academic_year,
+            defaults={'section': section_a, 'is_active': True}
         )
         
         if enrollment_created:
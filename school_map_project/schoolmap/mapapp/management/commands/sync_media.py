@@ -0,0 +1,24 @@
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand, CommandError
+
+from mapapp.models import MediaBlob
+from mapapp.storage import CachedMediaStorage
+
+class Command(BaseCommand):
+    help = 'Upload media blobs that never reached the remote store, e.g. after a worker restarted mid-upload'
+
+    def handle(self, *args, **options):
+        storage = storages['default']
+        if not isinstance(storage, CachedMediaStorage):
+            raise CommandError('The default storage is not mapapp.storage.CachedMediaStorage')
+        digests = MediaBlob.objects.filter(remote_name='').values_list('digest', flat=True).distinct()
+        uploaded = failed = 0
+        for digest in digests:
+            try:
+                storage.upload(digest)
+            except Exception as exc:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'{digest}: {exc}'))
+                continue
+            uploaded += 1
+        self.stdout.write(self.style.SUCCESS(f'Uploaded {uploaded} blobs; {failed} failed'))
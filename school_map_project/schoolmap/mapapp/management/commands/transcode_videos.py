@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from mapapp.models import FindUsPoster
+from mapapp.videos import transcode_poster
+
+class Command(BaseCommand):
+    help = 'Transcode uploaded poster videos that have no web renditions yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Transcode videos that are already done again')
+
+    def handle(self, *args, **options):
+        posters = FindUsPoster.objects.exclude(video_file='').exclude(video_file__isnull=True)
+        if not options['force']:
+            posters = posters.exclude(video_status='ready')
+        made = failed = 0
+        for poster_id in posters.values_list('pk', flat=True):
+            try:
+                transcode_poster(poster_id)
+            except Exception as exc:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'Poster {poster_id}: {exc}'))
+                continue
+            made += 1
+        self.stdout.write(self.style.SUCCESS(f'Transcoded {made} videos; {failed} failed'))
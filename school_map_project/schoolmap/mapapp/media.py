@@ -0,0 +1,181 @@
+"""Serving uploaded files from MEDIA_ROOT, with byte ranges.
+
+Browsers play <video> by asking for byte ranges, so they can start before
+the whole file arrives and can seek. The serve_media view (views.py)
+answers those with 206 Partial Content, honours If-Range, and answers
+conditional requests with 304. An open-ended range ("bytes=N-", which is
+what a browser sends first) is capped at MAX_RANGE bytes, so one request
+never streams a whole video; the browser asks for the next range as it
+plays.
+
+Behind nginx or Apache, SENDFILE hands the file to the front end once
+the path has been checked, and no Python worker streams it:
+  'x-accel-redirect': nginx, with an internal location at ACCEL_PREFIX
+                      aliased to MEDIA_ROOT
+  'x-sendfile':       Apache with mod_xsendfile
+Both do ranges and conditional requests themselves.
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+from . import retention, storage
+
+DEFAULTS = {
+    # None, 'x-accel-redirect' or 'x-sendfile'
+    'SENDFILE': None,
+    # nginx internal location aliased to MEDIA_ROOT
+    'ACCEL_PREFIX': '/protected-media/',
+    # Seconds browsers may reuse a file without asking again
+    'MAX_AGE': 3600,
+    # Bytes sent for an open-ended range; None sends the rest of the file
+    'MAX_RANGE': 8 * 1024 * 1024,
+    # Bytes read per chunk when streaming
+    'BLOCK_SIZE': 64 * 1024,
+    # Top-level directories under MEDIA_ROOT never served, besides the activity archives
+    'PRIVATE_DIRS': (),
+}
+
+# Content-addressed names never change content
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'MEDIA_SERVING', {}))
+    return config
+
+
+def private_dirs(config):
+    return {retention.get_policy()['ARCHIVE_DIR'], *config['PRIVATE_DIRS']}
+
+
+def resolve(path, config):
+    """(absolute path, os.stat_result) of a servable file under MEDIA_ROOT, or None"""
+    parts = [part for part in path.split('/') if part]
+    if not parts or parts[0] in private_dirs(config) or any(part.startswith('.') for part in parts):
+        return None
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, *parts)
+        stat_result = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        return None
+    if not stat.S_ISREG(stat_result.st_mode):
+        return None
+    return full_path, stat_result
+
+
+def make_etag(stat_result):
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+def cache_control(path, config):
+    if path.split('/', 1)[0] == storage.get_config()['CACHE_DIR']:
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f"public, max-age={config['MAX_AGE']}"
+
+
+def content_type(path):
+    content_type, encoding = mimetypes.guess_type(path)
+    # A .gz file is sent as is, not marked for the browser to decompress
+    return 'application/octet-stream' if encoding or not content_type else content_type
+
+
+def if_range_matches(header, etag, last_modified):
+    """Whether an If-Range validator still describes the file, so the range may be sent"""
+    header = header.strip()
+    if header.startswith(('"', 'W/')):
+        # Strong comparison: a weak tag never matches
+        return header == etag
+    return parse_http_date_safe(header) == last_modified
+
+
+def parse_range(header, size, max_range=None):
+    """
+    (start, end) inclusive for a single "bytes=" range, None to send the whole
+    file, or 'unsatisfiable'. Several ranges in one header are answered with
+    the whole file, which the spec allows.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return 'unsatisfiable'
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return 'unsatisfiable'
+    if last:
+        end = min(int(last), size - 1)
+    else:
+        end = size - 1
+        if max_range:
+            end = min(end, start + max_range - 1)
+    return start, end
+
+
+class RangeFile:
+    """
+    Reads at most `length` bytes of an open file from its current position.
+
+    fileno() and tell() let gunicorn's sendfile() send the range straight from
+    the file, limited by Content-Length; anything else streams through read().
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def sendfile_headers(full_path, config):
+    """Headers that hand the file to the front-end server, or {} to stream it here"""
+    mode = config['SENDFILE']
+    if not mode:
+        return {}
+    if mode == 'x-sendfile':
+        return {'X-Sendfile': full_path}
+    if mode == 'x-accel-redirect':
+        relative = os.path.relpath(full_path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        return {'X-Accel-Redirect': quote(config['ACCEL_PREFIX'].rstrip('/') + '/' + relative)}
+    raise ValueError(f'Unknown MEDIA_SERVING SENDFILE mode: {mode!r}')
+
+
+def validators(stat_result):
+    """(ETag, Last-Modified as a timestamp, Last-Modified header)"""
+    last_modified = int(stat_result.st_mtime)
+    return make_etag(stat_result), last_modified, http_date(last_modified)
@@ -9,6 +9,7 @@ def create_initial_data(apps, schema_editor):
     Section = apps.get_model('mapapp', 'Section')
     Schedule = apps.get_model('mapapp', 'Schedule')
     StudentEnrollment = apps.get_model('mapapp', 'StudentEnrollment')
+    UserProfile = apps.get_model('mapapp', 'UserProfile')
     
     # Create buildings
     main_building = Building.objects.create(
@@ -92,7 +93,6 @@ def create_initial_data(apps, schema_editor):
             email='teacher@example.com'
         )
         # Create profile if it doesn't exist
-        from mapapp.models import UserProfile
         UserProfile.objects.get_or_create(user=teacher)
         teacher.refresh_from_db()
         teacher.profile.role = 'teacher'
@@ -130,7 +130,6 @@ def create_initial_data(apps, schema_editor):
             email='student@example.com'
         )
         # Create profile if it doesn't exist
-        from mapapp.models import UserProfile
         UserProfile.objects.get_or_create(user=student)
         student.refresh_from_db()
         student.profile.role = 'student'
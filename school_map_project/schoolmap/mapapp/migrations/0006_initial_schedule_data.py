@@ -1,11 +1,10 @@
 # Generated by Django 4.2 on 2025-11-01 19:28
 
 from django.db import migrations
-from django.contrib.auth import get_user_model
 
 def create_initial_data(apps, schema_editor):
     # Get models
-    User = get_user_model()
+    User = apps.get_model('auth', 'User')
     UserProfile = apps.get_model('mapapp', 'UserProfile')
     Building = apps.get_model('mapapp', 'Building')
     Room = apps.get_model('mapapp', 'Room')
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:42
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_stats(apps, schema_editor):
+    ActivityLog = apps.get_model('mapapp', 'ActivityLog')
+    ActivityDailyStat = apps.get_model('mapapp', 'ActivityDailyStat')
+    rows = (
+        ActivityLog.objects
+        .annotate(day=TruncDate('timestamp'))
+        .values('day', 'action')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    ActivityDailyStat.objects.bulk_create([
+        ActivityDailyStat(date=row['day'], action=row['action'], count=row['total'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapapp', '0020_auto_20251123_0125'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('action', models.CharField(choices=[('user_registered', 'User Registered'), ('user_login', 'User Login'), ('user_logout', 'User Logout'), ('profile_updated', 'Profile Updated'), ('building_added', 'Building Added'), ('building_updated', 'Building Updated'), ('building_deleted', 'Building Deleted'), ('user_activated', 'User Activated'), ('user_deactivated', 'User Deactivated')], max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-date', 'action'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'action'), name='unique_activity_daily_stat')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapapp', '0023_activitylog_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalkwayNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('x', models.FloatField()),
+                ('y', models.FloatField()),
+                ('building', models.CharField(blank=True, db_index=True, help_text='Building this node is an entrance of, as named on the map', max_length=100)),
+                ('label', models.CharField(blank=True, max_length=100)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WalkwayEdge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('length', models.FloatField(blank=True, help_text='Walking cost in SVG units; leave blank for the straight-line distance', null=True)),
+                ('end', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='mapapp.walkwaynode')),
+                ('start', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='mapapp.walkwaynode')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('start', 'end'), name='unique_walkway_edge'), models.CheckConstraint(condition=models.Q(('start', models.F('end')), _negated=True), name='walkway_edge_not_loop')],
+            },
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapapp', '0025_notification_schedulechange'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Subject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('units', models.DecimalField(decimal_places=1, default=3.0, max_digits=3)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['code'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Room',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('building', models.CharField(db_index=True, help_text='Building the room is in, as named on the map', max_length=100)),
+                ('room_number', models.CharField(max_length=20)),
+                ('floor', models.IntegerField(default=1)),
+                ('capacity', models.PositiveIntegerField(blank=True, null=True)),
+                ('room_type', models.CharField(blank=True, choices=[('classroom', 'Classroom'), ('lab', 'Laboratory'), ('office', 'Office'), ('other', 'Other')], max_length=50)),
+                ('description', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['building', 'room_number'],
+                'constraints': [models.UniqueConstraint(fields=('building', 'room_number'), name='unique_room_number')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Section',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='e.g., 10-Newton, 11-Einstein', max_length=50)),
+                ('grade_level', models.PositiveIntegerField(help_text='Grade level (e.g., 10, 11, 12)')),
+                ('academic_year', models.CharField(help_text='e.g., 2024-2025', max_length=20)),
+                ('is_active', models.BooleanField(default=True)),
+                ('schedules_last_updated', models.DateTimeField(blank=True, editable=False, help_text='Last time schedules were modified for this section', null=True)),
+                ('adviser', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='advisory_sections', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['grade_level', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentEnrollment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('academic_year', models.CharField(max_length=20)),
+                ('date_enrolled', models.DateField(auto_now_add=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='mapapp.section')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Schedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.CharField(choices=[('monday', 'Monday'), ('tuesday', 'Tuesday'), ('wednesday', 'Wednesday'), ('thursday', 'Thursday'), ('friday', 'Friday'), ('saturday', 'Saturday'), ('sunday', 'Sunday')], max_length=10)),
+                ('time_slot', models.CharField(choices=[('07:30-08:30', '7:30 AM - 8:30 AM'), ('08:30-09:30', '8:30 AM - 9:30 AM'), ('09:30-10:30', '9:30 AM - 10:30 AM'), ('10:30-11:30', '10:30 AM - 11:30 AM'), ('11:30-12:30', '11:30 AM - 12:30 PM'), ('12:30-13:30', '12:30 PM - 1:30 PM'), ('13:30-14:30', '1:30 PM - 2:30 PM'), ('14:30-15:30', '2:30 PM - 3:30 PM'), ('15:30-16:30', '3:30 PM - 4:30 PM'), ('16:30-17:30', '4:30 PM - 5:30 PM')], max_length=20)),
+                ('academic_year', models.CharField(help_text='e.g., 2024-2025', max_length=20)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('room', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='schedules', to='mapapp.room')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='teaching_schedules', to=settings.AUTH_USER_MODEL)),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='mapapp.section')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='mapapp.subject')),
+            ],
+            options={
+                'ordering': ['day', 'time_slot'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='section',
+            constraint=models.UniqueConstraint(fields=('name', 'academic_year'), name='unique_section_per_year'),
+        ),
+        migrations.AddConstraint(
+            model_name='studentenrollment',
+            constraint=models.UniqueConstraint(fields=('student', 'academic_year'), name='unique_enrollment_per_year'),
+        ),
+        migrations.AddConstraint(
+            model_name='schedule',
+            constraint=models.UniqueConstraint(fields=('section', 'day', 'time_slot', 'academic_year'), name='unique_section_time_slot'),
+        ),
+    ]
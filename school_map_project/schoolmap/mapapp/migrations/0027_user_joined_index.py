@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Index for paging through users by (date_joined, id) in user management"""
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('mapapp', '0026_timetable'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX auth_user_joined_id_idx ON auth_user (date_joined, id)',
+            'DROP INDEX auth_user_joined_id_idx',
+        ),
+    ]
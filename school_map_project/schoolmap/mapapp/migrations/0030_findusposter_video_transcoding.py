@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapapp', '0029_mediablob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='findusposter',
+            name='original_video',
+            field=models.FileField(blank=True, editable=False, null=True, upload_to='find_us_videos/'),
+        ),
+        migrations.AddField(
+            model_name='findusposter',
+            name='video_error',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='findusposter',
+            name='video_poster',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='find_us_videos/'),
+        ),
+        migrations.AddField(
+            model_name='findusposter',
+            name='video_processed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='findusposter',
+            name='video_renditions',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='findusposter',
+            name='video_status',
+            field=models.CharField(blank=True, choices=[('', 'No video'), ('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='', editable=False, max_length=20),
+        ),
+    ]
@@ -0,0 +1,51 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_sections(apps, schema_editor):
+    ScheduleChange = apps.get_model('mapapp', 'ScheduleChange')
+    Section = apps.get_model('mapapp', 'Section')
+    # Changes for sections deleted since they were recorded have nothing left to point at
+    ScheduleChange.objects.exclude(section_ref__in=Section.objects.values('pk')).delete()
+    ScheduleChange.objects.update(section_id=F('section_ref'))
+
+
+def copy_sections_back(apps, schema_editor):
+    ScheduleChange = apps.get_model('mapapp', 'ScheduleChange')
+    ScheduleChange.objects.update(section_ref=F('section_id'))
+
+
+class Migration(migrations.Migration):
+    """
+    ScheduleChange.section_id was a bare integer; it becomes a foreign key to
+    Section. The column is renamed out of the way, copied into the new one,
+    and dropped in 0032, so the copy commits before the column is altered.
+    """
+
+    dependencies = [
+        ('mapapp', '0030_findusposter_video_transcoding'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='schedulechange',
+            name='schedulechange_section_idx',
+        ),
+        migrations.RenameField(
+            model_name='schedulechange',
+            old_name='section_id',
+            new_name='section_ref',
+        ),
+        migrations.AlterField(
+            model_name='schedulechange',
+            name='section_ref',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='schedulechange',
+            name='section',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='schedule_changes', to='mapapp.section'),
+        ),
+        migrations.RunPython(copy_sections, copy_sections_back),
+    ]
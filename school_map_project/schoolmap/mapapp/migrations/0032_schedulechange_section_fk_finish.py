@@ -0,0 +1,25 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapapp', '0031_schedulechange_section_fk'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='schedulechange',
+            name='section_ref',
+        ),
+        migrations.AlterField(
+            model_name='schedulechange',
+            name='section',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_changes', to='mapapp.section'),
+        ),
+        migrations.AddIndex(
+            model_name='schedulechange',
+            index=models.Index(fields=['section', '-id'], name='schedulechange_section_idx'),
+        ),
+    ]
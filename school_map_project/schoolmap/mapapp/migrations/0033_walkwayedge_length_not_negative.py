@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:10
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def clear_negative_lengths(apps, schema_editor):
+    # A negative length can't be walked; fall back to the straight-line distance
+    WalkwayEdge = apps.get_model('mapapp', 'WalkwayEdge')
+    WalkwayEdge.objects.filter(length__lt=0).update(length=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapapp', '0032_schedulechange_section_fk_finish'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_negative_lengths, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='walkwayedge',
+            name='length',
+            field=models.FloatField(blank=True, help_text='Walking cost in SVG units; leave blank for the straight-line distance', null=True, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AddConstraint(
+            model_name='walkwayedge',
+            constraint=models.CheckConstraint(condition=models.Q(('length__gte', 0), ('length__isnull', True), _connector='OR'), name='walkway_edge_length_not_negative'),
+        ),
+    ]
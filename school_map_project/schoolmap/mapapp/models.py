@@ -1,7 +1,10 @@
 import os
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
+from django.utils import timezone
 
 def user_profile_picture_path(instance, filename):
     # File will be uploaded to MEDIA_ROOT/profile_pics/user_<id>/<filename>
@@ -49,12 +52,28 @@ class BuildingInfo(models.Model):
         return self.name
 
 class FindUsPoster(models.Model):
+    VIDEO_STATUS_CHOICES = [
+        ('', 'No video'),
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
     title = models.CharField(max_length=100, default="Find Us")
     poster_image = models.ImageField(upload_to='find_us_posters/', blank=True, null=True)
     
     # Video fields
     video_file = models.FileField(upload_to='find_us_videos/', blank=True, null=True, help_text="Upload a video file (MP4, WebM, etc.)")
     youtube_url = models.URLField(blank=True, null=True, help_text="YouTube video URL (e.g., https://www.youtube.com/watch?v=VIDEO_ID)")
+
+    # Transcoding (see videos.py): once done, video_file points at the largest rendition
+    original_video = models.FileField(upload_to='find_us_videos/', blank=True, null=True, editable=False)
+    video_poster = models.ImageField(upload_to='find_us_videos/', blank=True, null=True, editable=False)
+    video_renditions = models.JSONField(blank=True, default=list, editable=False)
+    video_status = models.CharField(max_length=20, choices=VIDEO_STATUS_CHOICES, blank=True, default='', editable=False)
+    video_error = models.TextField(blank=True, editable=False)
+    video_processed_at = models.DateTimeField(blank=True, null=True, editable=False)
     
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -84,6 +103,15 @@ class FindUsPoster(models.Model):
             FindUsPoster.objects.exclude(pk=self.pk).update(is_active=False)
         super().save(*args, **kwargs)
     
+    def video_sources(self):
+        """(url, media query) per transcoded rendition, smallest first; the largest has no query"""
+        renditions = sorted(self.video_renditions or [], key=lambda rendition: rendition['height'])
+        storage = self.video_file.storage
+        return [
+            (storage.url(rendition['name']), '' if index == len(renditions) - 1 else f"(max-width: {rendition['width']}px)")
+            for index, rendition in enumerate(renditions)
+        ]
+
     def get_youtube_embed_id(self):
         """Extract YouTube video ID from URL for embedding"""
         if not self.youtube_url:
@@ -117,11 +145,18 @@ class ActivityLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     action = models.CharField(max_length=50, choices=ACTION_CHOICES)
     description = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when a buffered batch is written
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Recent activity feeds and retention cutoffs
+            models.Index(fields=['-timestamp'], name='activitylog_timestamp_idx'),
+            # Per-action counts over a time range
+            models.Index(fields=['action', '-timestamp'], name='activitylog_action_ts_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_action_display()} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
@@ -160,4 +195,300 @@ class HomePageContent(models.Model):
         # Ensure only one active home page content
         if self.is_active:
             HomePageContent.objects.filter(is_active=True).update(is_active=False)
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class ActivityDailyStat(models.Model):
+    """Per-day count of ActivityLog entries for each action.
+
+    Kept up to date by mapapp.utils.log_activity and rebuilt from the raw
+    log with the rebuild_activity_stats management command.
+    """
+    date = models.DateField()
+    action = models.CharField(max_length=50, choices=ActivityLog.ACTION_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date', 'action']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'action'], name='unique_activity_daily_stat'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.action}: {self.count}"
+
+    @classmethod
+    def increment(cls, date, action, amount=1):
+        """Add `amount` to the counter for (date, action), creating it if needed"""
+        updated = cls.objects.filter(date=date, action=action).update(count=F('count') + amount)
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(date=date, action=action, count=amount)
+        except IntegrityError:
+            # Another writer created the row first
+            cls.objects.filter(date=date, action=action).update(count=F('count') + amount)
+
+class WalkwayNode(models.Model):
+    """A point on the campus walkway graph, in the 1440x1106 campus SVG space.
+
+    Nodes with a building name are entrances to that building; the rest are
+    junctions along the walkways.
+    """
+    x = models.FloatField()
+    y = models.FloatField()
+    building = models.CharField(max_length=100, blank=True, db_index=True,
+                                help_text="Building this node is an entrance of, as named on the map")
+    label = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        name = self.label or self.building or 'Junction'
+        return f"{name} ({self.x:.0f}, {self.y:.0f})"
+
+class WalkwayEdge(models.Model):
+    """A walkable segment between two nodes, usable in both directions"""
+    start = models.ForeignKey(WalkwayNode, on_delete=models.CASCADE, related_name='+')
+    end = models.ForeignKey(WalkwayNode, on_delete=models.CASCADE, related_name='+')
+    length = models.FloatField(blank=True, null=True, validators=[MinValueValidator(0)],
+                               help_text="Walking cost in SVG units; leave blank for the straight-line distance")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['start', 'end'], name='unique_walkway_edge'),
+            models.CheckConstraint(condition=~models.Q(start=models.F('end')), name='walkway_edge_not_loop'),
+            # Dijkstra and A* never finish with a negative cost
+            models.CheckConstraint(
+                condition=models.Q(length__gte=0) | models.Q(length__isnull=True), name='walkway_edge_length_not_negative',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.start} - {self.end}"
+
+class Notification(models.Model):
+    """A message for one user, read through /api/user/<id>/notifications/"""
+    KIND_CHOICES = [
+        ('schedule_added', 'Schedule Added'),
+        ('schedule_updated', 'Schedule Updated'),
+        ('schedule_deleted', 'Schedule Deleted'),
+        ('section_assigned', 'Section Assigned'),
+        ('section_unassigned', 'Section Unassigned'),
+        ('generic', 'Generic'),
+    ]
+
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES, default='generic')
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    metadata = models.JSONField(blank=True, default=dict)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['recipient', '-id'], name='notification_recipient_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient.username}: {self.title}"
+
+class ScheduleChange(models.Model):
+    """Append-only log of timetable edits per section, read as a change feed"""
+    KIND_CHOICES = [
+        ('added', 'Added'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+
+    section = models.ForeignKey('Section', on_delete=models.CASCADE, related_name='schedule_changes')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='updated')
+    description = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['section', '-id'], name='schedulechange_section_idx'),
+        ]
+
+    def __str__(self):
+        return f"Section {self.section_id} {self.kind} at {self.created_at:%Y-%m-%d %H:%M}"
+
+DAY_CHOICES = [
+    ('monday', 'Monday'),
+    ('tuesday', 'Tuesday'),
+    ('wednesday', 'Wednesday'),
+    ('thursday', 'Thursday'),
+    ('friday', 'Friday'),
+    ('saturday', 'Saturday'),
+    ('sunday', 'Sunday'),
+]
+
+TIME_SLOT_CHOICES = [
+    ('07:30-08:30', '7:30 AM - 8:30 AM'),
+    ('08:30-09:30', '8:30 AM - 9:30 AM'),
+    ('09:30-10:30', '9:30 AM - 10:30 AM'),
+    ('10:30-11:30', '10:30 AM - 11:30 AM'),
+    ('11:30-12:30', '11:30 AM - 12:30 PM'),
+    ('12:30-13:30', '12:30 PM - 1:30 PM'),
+    ('13:30-14:30', '1:30 PM - 2:30 PM'),
+    ('14:30-15:30', '2:30 PM - 3:30 PM'),
+    ('15:30-16:30', '3:30 PM - 4:30 PM'),
+    ('16:30-17:30', '4:30 PM - 5:30 PM'),
+]
+
+class Room(models.Model):
+    ROOM_TYPE_CHOICES = [
+        ('classroom', 'Classroom'),
+        ('lab', 'Laboratory'),
+        ('office', 'Office'),
+        ('other', 'Other'),
+    ]
+
+    building = models.CharField(max_length=100, db_index=True,
+                                help_text="Building the room is in, as named on the map")
+    room_number = models.CharField(max_length=20)
+    floor = models.IntegerField(default=1)
+    capacity = models.PositiveIntegerField(blank=True, null=True)
+    room_type = models.CharField(max_length=50, choices=ROOM_TYPE_CHOICES, blank=True)
+    description = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['building', 'room_number']
+        constraints = [
+            models.UniqueConstraint(fields=['building', 'room_number'], name='unique_room_number'),
+        ]
+
+    def __str__(self):
+        return f"{self.building} {self.room_number}"
+
+class Subject(models.Model):
+    code = models.CharField(max_length=20, unique=True)
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    units = models.DecimalField(max_digits=3, decimal_places=1, default=3.0)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['code']
+
+    def __str__(self):
+        return f"{self.code} - {self.name}"
+
+class Section(models.Model):
+    name = models.CharField(max_length=50, help_text="e.g., 10-Newton, 11-Einstein")
+    grade_level = models.PositiveIntegerField(help_text="Grade level (e.g., 10, 11, 12)")
+    academic_year = models.CharField(max_length=20, help_text="e.g., 2024-2025")
+    adviser = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True,
+                                related_name='advisory_sections')
+    is_active = models.BooleanField(default=True)
+    schedules_last_updated = models.DateTimeField(blank=True, null=True, editable=False,
+                                                  help_text="Last time schedules were modified for this section")
+
+    class Meta:
+        ordering = ['grade_level', 'name']
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'academic_year'], name='unique_section_per_year'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.academic_year})"
+
+class StudentEnrollment(models.Model):
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='enrollments')
+    section = models.ForeignKey(Section, on_delete=models.CASCADE, related_name='enrollments')
+    academic_year = models.CharField(max_length=20)
+    date_enrolled = models.DateField(auto_now_add=True)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        constraints = [
+            # One section per student per academic year
+            models.UniqueConstraint(fields=['student', 'academic_year'], name='unique_enrollment_per_year'),
+        ]
+
+    def __str__(self):
+        return f"{self.student.username} in {self.section.name}"
+
+class Schedule(models.Model):
+    """One weekly class meeting: a subject taught to a section in a room and time slot"""
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='schedules')
+    teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name='teaching_schedules')
+    section = models.ForeignKey(Section, on_delete=models.CASCADE, related_name='schedules')
+    room = models.ForeignKey(Room, on_delete=models.SET_NULL, blank=True, null=True, related_name='schedules')
+    day = models.CharField(max_length=10, choices=DAY_CHOICES)
+    time_slot = models.CharField(max_length=20, choices=TIME_SLOT_CHOICES)
+    academic_year = models.CharField(max_length=20, help_text="e.g., 2024-2025")
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['day', 'time_slot']
+        constraints = [
+            models.UniqueConstraint(fields=['section', 'day', 'time_slot', 'academic_year'],
+                                    name='unique_section_time_slot'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject.name} - {self.section.name} ({self.get_day_display()} {self.time_slot})"
+
+    def clean(self):
+        # Imported here because the timetable index imports this module
+        from .conflicts import conflict_message, schedule_conflicts
+
+        if self.is_active and self.day and self.time_slot and self.academic_year:
+            clashes = schedule_conflicts(self)
+            if clashes:
+                raise ValidationError([conflict_message(clash) for clash in clashes])
+
+    @property
+    def minutes(self):
+        """(start, end) of the time slot in minutes since midnight"""
+        start, end = self.time_slot.split('-')
+        return tuple(int(hours) * 60 + int(minutes) for hours, minutes in (start.split(':'), end.split(':')))
+
+class ImageDerivative(models.Model):
+    """A resized copy of an uploaded image, stored next to the original (see images.py)"""
+    FORMAT_CHOICES = [
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+    ]
+
+    source = models.CharField(max_length=255, db_index=True, help_text="Storage name of the original upload")
+    width = models.PositiveIntegerField()
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['source', 'format', 'width']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'width', 'format'], name='unique_image_derivative'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class MediaBlob(models.Model):
+    """Where a stored media file's content lives (see storage.py).
+
+    Files with the same content share one SHA-256 digest, one local copy
+    and one remote copy.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    digest = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField()
+    # Name in the remote store; blank until the background upload finishes
+    remote_name = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,145 @@
+"""Full-page caching for anonymous views and fragment caching for templates.
+
+Cached pages and fragments share one version number, and changing a
+BuildingInfo, HomePageContent or FindUsPoster bumps it (see signals.py).
+Keys also carry the static build, so a deploy never serves HTML that
+links to hashed static files from the previous build.
+Hit and miss counts are kept per process, like the activity buffer's.
+"""
+import hashlib
+import os
+import threading
+from collections import Counter
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+from django.core.cache import cache
+from django.http import HttpResponse
+
+VERSION_KEY = 'page_cache:version'
+
+
+def get_timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 600)
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, kind, outcome):
+        with self._lock:
+            self._counts[(kind, outcome)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        data = {'pid': os.getpid()}
+        for kind in ('page', 'fragment'):
+            hits = counts.get((kind, 'hit'), 0)
+            misses = counts.get((kind, 'miss'), 0)
+            data[kind] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            }
+        return data
+
+
+cache_stats = CacheStats()
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def purge_page_cache():
+    """Bump the version so every cached page and fragment is rebuilt"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, get_version() + 1, None)
+
+
+def _digest(*parts):
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def static_build():
+    """
+    Digest of the staticfiles manifest, or '' without one. Cached HTML names
+    hashed files like map.<hash>.js, which the next build's collectstatic
+    --clear deletes, so each build gets its own keys. Read once per process;
+    a deploy starts new ones.
+    """
+    if not isinstance(staticfiles_storage, ManifestFilesMixin):
+        return ''
+    manifest = staticfiles_storage.read_manifest()
+    return _digest(manifest)[:12] if manifest else ''
+
+
+def page_key(request):
+    return f'page_cache:page:v{get_version()}:{static_build()}:{_digest(request.get_full_path())}'
+
+
+def fragment_key(name, vary_on):
+    return f'page_cache:fragment:{name}:v{get_version()}:{static_build()}:{_digest(*vary_on)}'
+
+
+def preference_vary_on(preferences):
+    """Theme, accent and font size; the parts of a page that depend on the user"""
+    if not preferences:
+        return ['light', '#ff6b9e', 'medium']
+    return [preferences.theme, preferences.accent_color, preferences.font_size]
+
+
+def _is_cacheable(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not response.has_header('Cache-Control')
+    )
+
+
+def cache_anonymous_page(view_func):
+    """Serve a whole rendered page from the cache to anonymous GET requests.
+
+    Logged-in users, requests with pending flash messages and responses that
+    set cookies always bypass the cache.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or request.user.is_authenticated
+            or len(messages.get_messages(request))
+        ):
+            return view_func(request, *args, **kwargs)
+
+        key = page_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            cache_stats.record('page', 'hit')
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Page-Cache'] = 'hit'
+            return response
+
+        cache_stats.record('page', 'miss')
+        response = view_func(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+        if _is_cacheable(response):
+            cache.set(key, (response.content, response['Content-Type']), get_timeout())
+        response['X-Page-Cache'] = 'miss'
+        return response
+    return wrapper
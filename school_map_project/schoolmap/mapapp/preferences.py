@@ -0,0 +1,52 @@
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from .models import UserPreferences
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+# Concrete fields in a stable order; the cache stores their raw values so
+# cached entries never carry a stale copy of the related User
+FIELD_NAMES = [field.attname for field in UserPreferences._meta.concrete_fields]
+
+
+def cache_key(user_id):
+    return f'user_preferences:{user_id}'
+
+
+def cache_preferences(preferences):
+    values = tuple(getattr(preferences, name) for name in FIELD_NAMES)
+    # FieldFile values are stored by name
+    values = tuple(getattr(value, 'name', value) for value in values)
+    cache.set(cache_key(preferences.user_id), values, CACHE_TIMEOUT)
+
+
+def invalidate_preferences(user_id):
+    cache.delete(cache_key(user_id))
+
+
+def get_user_preferences(user):
+    """Return the user's preferences, creating them if needed.
+
+    Served from the cache once warm; only a miss touches the database.
+    """
+    values = cache.get(cache_key(user.pk))
+    if values is not None and len(values) == len(FIELD_NAMES):
+        preferences = UserPreferences.from_db('default', FIELD_NAMES, values)
+    else:
+        preferences, created = UserPreferences.objects.get_or_create(user=user)
+        cache_preferences(preferences)
+    # Reuse the request's user instead of loading it again
+    preferences.user = user
+    return preferences
+
+
+class UserPreferencesMiddleware:
+    """Attach a lazy `request.user_preferences` for authenticated users"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.user_preferences = SimpleLazyObject(lambda: get_user_preferences(request.user))
+        return self.get_response(request)
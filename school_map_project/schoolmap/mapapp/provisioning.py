@@ -0,0 +1,142 @@
+"""Creating many user accounts at once, e.g. a grade level at enrollment.
+
+Password hashing (PBKDF2 by default) dominates the cost of creating an
+account. A batch of passwords is therefore hashed in a process pool,
+one hash per worker at a time, and the users are then inserted with
+bulk_create. bulk_create sends no post_save, so the accounts'
+UserPreferences rows are bulk-inserted here too.
+
+Accounts can also skip hashing entirely. They are created with an
+unusable password and a one-time invite link (see accept_invite in
+views.py). The link stops working once a password is set, because the
+token is derived from the current password hash, the same way Django's
+password reset tokens are.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .dashboard_version import bump_version as bump_dashboard_version
+from .models import UserPreferences
+from .preferences import cache_key as preferences_cache_key
+
+DEFAULTS = {
+    # Hashing processes; None means one per CPU
+    'WORKERS': None,
+    # Fewer passwords than this are hashed inline, since starting a pool costs more
+    'MIN_POOL_SIZE': 50,
+    # Users inserted per transaction
+    'BATCH_SIZE': 500,
+}
+
+USER_FIELDS = ('email', 'first_name', 'last_name', 'is_staff')
+
+
+def get_config(**overrides):
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'USER_PROVISIONING', {}))
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    return config
+
+
+class InviteTokenGenerator(PasswordResetTokenGenerator):
+    """One-time tokens for setting the first password; they expire after PASSWORD_RESET_TIMEOUT"""
+    key_salt = 'mapapp.provisioning.InviteTokenGenerator'
+
+
+invite_tokens = InviteTokenGenerator()
+
+
+def invite_path(user):
+    return reverse('accept_invite', kwargs={
+        'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+        'token': invite_tokens.make_token(user),
+    })
+
+
+def hash_passwords(passwords, **overrides):
+    """make_password() for each password, in order, spread over a process pool"""
+    passwords = list(passwords)
+    config = get_config(**overrides)
+    workers = config['WORKERS'] or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < config['MIN_POOL_SIZE']:
+        return [make_password(password) for password in passwords]
+    workers = min(workers, len(passwords))
+    # Never fork: a web worker has its own threads running (activity flusher, dashboard hub,
+    # feed waiters), and a lock one of them holds at fork time would stay held in the child.
+    # Spawned workers start from a fresh interpreter, so Django is set up first; the
+    # initializer can't live in this module, which needs the app registry to import.
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup) as pool:
+        return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def create_users(users, **overrides):
+    """bulk_create the unsaved users, plus their UserPreferences; returns them with ids"""
+    config = get_config(**overrides)
+    created = []
+    for start in range(0, len(users), config['BATCH_SIZE']):
+        batch = users[start:start + config['BATCH_SIZE']]
+        with transaction.atomic():
+            User.objects.bulk_create(batch)
+            if any(user.pk is None for user in batch):
+                # Not every database returns the new ids from bulk_create
+                ids = dict(User.objects.filter(username__in=[user.username for user in batch])
+                           .values_list('username', 'id'))
+                for user in batch:
+                    user.pk = ids[user.username]
+            UserPreferences.objects.bulk_create(
+                [UserPreferences(user_id=user.pk) for user in batch], ignore_conflicts=True,
+            )
+        # Drop anything cached under a reused user id
+        cache.delete_many([preferences_cache_key(user.pk) for user in batch])
+        created.extend(batch)
+    if created:
+        transaction.on_commit(bump_dashboard_version)
+    return created
+
+
+def provision_users(rows, invite=False, **overrides):
+    """Create an account for each row dict (username plus optional email, names, is_staff, password).
+
+    Rows without a password get an unusable one; with invite=True each of
+    those users also gets an invite path. Usernames that are taken, or
+    repeated in the rows, are skipped.
+    Returns {'created': [User], 'skipped': [username], 'invites': {username: path}}.
+    """
+    rows = list(rows)
+    taken = set(User.objects.filter(username__in=[row['username'] for row in rows])
+                .values_list('username', flat=True))
+    users, passwords, skipped = [], [], []
+    for row in rows:
+        username = row['username']
+        if username in taken:
+            skipped.append(username)
+            continue
+        taken.add(username)
+        user = User(username=username, **{field: row[field] for field in USER_FIELDS if row.get(field)})
+        if row.get('password'):
+            passwords.append((user, row['password']))
+        else:
+            user.set_unusable_password()
+        users.append(user)
+
+    for (user, _), hashed in zip(passwords, hash_passwords([password for _, password in passwords], **overrides)):
+        user.password = hashed
+
+    created = create_users(users, **overrides)
+    invites = {}
+    if invite:
+        invites = {user.username: invite_path(user) for user in created if not user.has_usable_password()}
+    return {'created': created, 'skipped': skipped, 'invites': invites}
@@ -0,0 +1,121 @@
+"""Time-based retention for ActivityLog.
+
+Rows older than the retention window are archived to one gzip-compressed
+JSONL file per month under MEDIA_ROOT, then deleted in small batches so
+no single transaction holds the table for long. Each batch is written to
+a part file first and appended to the monthly archive only once its delete
+has committed, so a failed or retried batch never archives a row twice.
+The daily rollup in ActivityDailyStat is left alone, so dashboard history
+survives pruning.
+"""
+import gzip
+import json
+import os
+import shutil
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ActivityLog
+
+DEFAULTS = {
+    # Keep this many days of raw activity in the database
+    'DAYS': 180,
+    # Write pruned rows to monthly archives before deleting them
+    'ARCHIVE': True,
+    # Archive directory, relative to MEDIA_ROOT
+    'ARCHIVE_DIR': 'activity_archive',
+    # Rows archived and deleted per transaction
+    'BATCH_SIZE': 1000,
+}
+
+ARCHIVE_FIELDS = ['id', 'user_id', 'action', 'description', 'timestamp', 'ip_address']
+
+
+def get_policy(**overrides):
+    policy = dict(DEFAULTS)
+    policy.update(getattr(settings, 'ACTIVITY_LOG_RETENTION', {}))
+    policy.update({key: value for key, value in overrides.items() if value is not None})
+    return policy
+
+
+def archive_path(month, policy):
+    """Archive file for a (year, month) pair"""
+    year, month = month
+    return Path(settings.MEDIA_ROOT) / policy['ARCHIVE_DIR'] / f'activity-{year:04d}-{month:02d}.jsonl.gz'
+
+
+def archive_rows(rows, policy):
+    """Write rows to a part file beside each monthly archive; returns {archive: part file}"""
+    by_month = {}
+    for row in rows:
+        local = timezone.localtime(row['timestamp'])
+        by_month.setdefault((local.year, local.month), []).append(row)
+
+    parts = {}
+    for month, month_rows in by_month.items():
+        path = archive_path(month, policy)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        parts[path] = part = path.with_name(f'.{path.name}.{os.getpid()}.part')
+        with gzip.open(part, 'wt', encoding='utf-8') as archive:
+            for row in month_rows:
+                record = dict(row, timestamp=row['timestamp'].isoformat())
+                archive.write(json.dumps(record) + '\n')
+    return parts
+
+
+def finish_archives(parts):
+    """Append each part file to its archive once the batch is deleted; gzip members concatenate cleanly"""
+    for path, part in parts.items():
+        with open(part, 'rb') as source, open(path, 'ab') as archive:
+            shutil.copyfileobj(source, archive)
+        part.unlink()
+
+
+def discard_archives(parts):
+    for part in parts.values():
+        part.unlink(missing_ok=True)
+
+
+def prune_activity_log(dry_run=False, **overrides):
+    """Archive and delete ActivityLog rows older than the retention window.
+
+    Returns a summary dict with the cutoff, the number of rows pruned and
+    the archive files written.
+    """
+    policy = get_policy(**overrides)
+    cutoff = timezone.now() - timedelta(days=policy['DAYS'])
+    expired = ActivityLog.objects.filter(timestamp__lt=cutoff)
+    summary = {'cutoff': cutoff, 'pruned': 0, 'batches': 0, 'archives': set()}
+
+    if dry_run:
+        summary['pruned'] = expired.count()
+        return summary
+
+    while True:
+        parts = {}
+        try:
+            with transaction.atomic():
+                ids = list(
+                    expired.order_by('timestamp').values_list('id', flat=True)[:policy['BATCH_SIZE']]
+                )
+                if not ids:
+                    break
+                batch = ActivityLog.objects.filter(id__in=ids)
+                if policy['ARCHIVE']:
+                    rows = list(batch.order_by('timestamp').values(*ARCHIVE_FIELDS))
+                    parts = archive_rows(rows, policy)
+                batch.delete()
+        except BaseException:
+            # The rows are still in the table and will be archived by the next run
+            discard_archives(parts)
+            raise
+        finish_archives(parts)
+        summary['archives'].update(parts)
+        summary['pruned'] += len(ids)
+        summary['batches'] += 1
+
+    return summary
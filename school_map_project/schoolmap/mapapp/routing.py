@@ -0,0 +1,232 @@
+"""Walking directions over the campus walkway graph for /api/route/.
+
+The graph lives in WalkwayNode and WalkwayEdge. Each worker loads it
+once per graph version and runs Dijkstra from every building entrance.
+After that, a route between two buildings is a dictionary lookup. Routes
+from an arbitrary point use A* to the nearest entrance of the target.
+Any change to a node or edge bumps the shared version (see signals.py).
+"""
+import hashlib
+import heapq
+import json
+import math
+import threading
+
+from django.core.cache import cache
+
+from .models import WalkwayEdge, WalkwayNode
+
+VERSION_KEY = 'routing:version'
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidate_routes():
+    """Bump the version so every worker reloads the walkway graph"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, get_version() + 1, None)
+
+
+class WalkwayGraph:
+    def __init__(self):
+        # node id -> (x, y)
+        self.positions = {}
+        # node id -> [(neighbour id, cost)]
+        self.neighbours = {}
+        # lower-cased building name -> entrance node ids
+        self.entrances = {}
+        self.building_names = {}
+        # Smallest cost per unit of straight-line distance over all edges, at most 1;
+        # scaling the A* estimate by it keeps the estimate from overshooting
+        self.heuristic_scale = 1.0
+
+    def add_node(self, node_id, x, y, building=''):
+        self.positions[node_id] = (x, y)
+        self.neighbours.setdefault(node_id, [])
+        if building:
+            key = building.lower()
+            self.entrances.setdefault(key, []).append(node_id)
+            self.building_names.setdefault(key, building)
+
+    def add_edge(self, start, end, length=None):
+        if length is not None and length < 0:
+            raise ValueError(f'Walkway edge {start}-{end} has a negative length')
+        distance = self.distance(start, end)
+        if length is None:
+            length = distance
+        elif distance > 0:
+            # An edge may be cheaper than its straight line, e.g. a length measured on the ground
+            self.heuristic_scale = min(self.heuristic_scale, length / distance)
+        self.neighbours[start].append((end, length))
+        self.neighbours[end].append((start, length))
+
+    def distance(self, a, b):
+        (ax, ay), (bx, by) = self.positions[a], self.positions[b]
+        return math.hypot(ax - bx, ay - by)
+
+    def nearest_node(self, x, y):
+        if not self.positions:
+            return None
+        return min(
+            self.positions,
+            key=lambda node_id: (self.positions[node_id][0] - x) ** 2 + (self.positions[node_id][1] - y) ** 2,
+        )
+
+    def shortest_paths(self, source):
+        """Dijkstra from one node: (cost to each reachable node, predecessor map)"""
+        costs = {source: 0.0}
+        previous = {}
+        queue = [(0.0, source)]
+        while queue:
+            cost, node_id = heapq.heappop(queue)
+            if cost > costs[node_id]:
+                continue
+            for neighbour, length in self.neighbours[node_id]:
+                candidate = cost + length
+                if candidate < costs.get(neighbour, math.inf):
+                    costs[neighbour] = candidate
+                    previous[neighbour] = node_id
+                    heapq.heappush(queue, (candidate, neighbour))
+        return costs, previous
+
+    def astar(self, start, goals):
+        """Cheapest path from `start` to whichever of `goals` is closest, or None"""
+        goals = set(goals)
+        if not goals or start not in self.positions:
+            return None
+
+        def estimate(node_id):
+            # Scaled straight-line distance never overestimates a walk, even over shortcut edges
+            return self.heuristic_scale * min(self.distance(node_id, goal) for goal in goals)
+
+        costs = {start: 0.0}
+        previous = {}
+        queue = [(estimate(start), start)]
+        closed = set()
+        while queue:
+            _, node_id = heapq.heappop(queue)
+            if node_id in goals:
+                return costs[node_id], unwind(previous, node_id)
+            if node_id in closed:
+                continue
+            closed.add(node_id)
+            for neighbour, length in self.neighbours[node_id]:
+                candidate = costs[node_id] + length
+                if candidate < costs.get(neighbour, math.inf):
+                    costs[neighbour] = candidate
+                    previous[neighbour] = node_id
+                    heapq.heappush(queue, (candidate + estimate(neighbour), neighbour))
+        return None
+
+
+def unwind(previous, node_id):
+    path = [node_id]
+    while node_id in previous:
+        node_id = previous[node_id]
+        path.append(node_id)
+    path.reverse()
+    return path
+
+
+def precompute_routes(graph):
+    """Best route between every pair of buildings, keyed by lower-cased names"""
+    searches = {
+        entrance: graph.shortest_paths(entrance)
+        for entrances in graph.entrances.values()
+        for entrance in entrances
+    }
+    routes = {}
+    for origin, origin_entrances in graph.entrances.items():
+        for target, target_entrances in graph.entrances.items():
+            if origin == target:
+                continue
+            best = None
+            for entrance in origin_entrances:
+                costs, previous = searches[entrance]
+                for goal in target_entrances:
+                    cost = costs.get(goal)
+                    if cost is not None and (best is None or cost < best[0]):
+                        best = (cost, entrance, goal)
+            if best is not None:
+                cost, entrance, goal = best
+                routes[(origin, target)] = (cost, unwind(searches[entrance][1], goal))
+    return routes
+
+
+def load_graph():
+    graph = WalkwayGraph()
+    for node in WalkwayNode.objects.all():
+        graph.add_node(node.id, node.x, node.y, node.building)
+    for edge in WalkwayEdge.objects.all():
+        graph.add_edge(edge.start_id, edge.end_id, edge.length)
+    return graph
+
+
+class CampusRouter:
+    """The per-process walkway graph and its precomputed building-to-building routes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self.graph = WalkwayGraph()
+        self.routes = {}
+        self._rendered = {}
+
+    def invalidate(self):
+        self._version = None
+
+    def ensure_current(self):
+        version = get_version()
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    graph = load_graph()
+                    routes = precompute_routes(graph)
+                    self.graph, self.routes, self._rendered = graph, routes, {}
+                    self._version = version
+
+    def _render(self, origin, target, cost, path):
+        data = {
+            'from': origin,
+            'to': self.graph.building_names[target.lower()],
+            'distance': round(cost, 1),
+            'points': [[round(c, 1) for c in self.graph.positions[node_id]] for node_id in path],
+        }
+        body = json.dumps(data, separators=(',', ':')).encode()
+        return body, f'"{hashlib.md5(body).hexdigest()}"'
+
+    def between(self, origin, target):
+        """Rendered (body, etag) for a route between two buildings, or None"""
+        self.ensure_current()
+        key = (origin.lower(), target.lower())
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            route = self.routes.get(key)
+            if route is None:
+                return None
+            rendered = self._render(self.graph.building_names[key[0]], target, *route)
+            self._rendered[key] = rendered
+        return rendered
+
+    def from_point(self, x, y, target):
+        """Rendered (body, etag) for a route from an SVG point to a building, or None"""
+        self.ensure_current()
+        graph = self.graph
+        start = graph.nearest_node(x, y)
+        if start is None:
+            return None
+        found = graph.astar(start, graph.entrances.get(target.lower(), ()))
+        if found is None:
+            return None
+        return self._render(None, target, *found)
+
+
+campus_router = CampusRouter()
@@ -0,0 +1,239 @@
+"""In-memory inverted index over BuildingInfo for /api/search/.
+
+Each worker keeps its own index. Saving or deleting a BuildingInfo
+updates that document in the worker that made the change and bumps a
+shared version in the cache, so other workers rebuild on their next
+query.
+"""
+import heapq
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+from .models import BuildingInfo
+
+VERSION_KEY = 'search_index:version'
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Score for an exact token match in each field; prefix matches get half
+FIELD_WEIGHTS = {
+    'name': 10.0,
+    'description': 2.0,
+    'operating_hours': 1.0,
+}
+PREFIX_FACTOR = 0.5
+# Extra score when the whole name starts with the query
+NAME_PREFIX_BONUS = 5.0
+# Recent query results kept per index; any change to the index clears them
+RESULT_CACHE_SIZE = 256
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def shared_version():
+    """Version of the building data, shared by every worker through the cache"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_shared_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        version = shared_version() + 1
+        cache.set(VERSION_KEY, version, None)
+        return version
+
+
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.documents = {}
+            # token -> {doc_id: best field weight}
+            self.postings = {}
+            # Sorted distinct tokens, for prefix lookups with bisect
+            self.vocabulary = []
+            self._doc_tokens = {}
+            self._results = OrderedDict()
+
+    def add(self, doc_id, fields, payload):
+        """Index or re-index one document"""
+        with self._lock:
+            self.remove(doc_id)
+            self._results.clear()
+            weights = {}
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(fields.get(field)):
+                    weights[token] = max(weights.get(token, 0.0), weight)
+            for token, weight in weights.items():
+                posting = self.postings.get(token)
+                if posting is None:
+                    posting = self.postings[token] = {}
+                    insort(self.vocabulary, token)
+                posting[doc_id] = weight
+            self._doc_tokens[doc_id] = set(weights)
+            self.documents[doc_id] = {
+                'name_lower': (fields.get('name') or '').lower(),
+                'payload': payload,
+            }
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._results.clear()
+            for token in self._doc_tokens.pop(doc_id, ()):
+                posting = self.postings[token]
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[token]
+                    del self.vocabulary[bisect_left(self.vocabulary, token)]
+            self.documents.pop(doc_id, None)
+
+    def _expand(self, token):
+        """Vocabulary tokens that equal or start with `token`"""
+        start = bisect_left(self.vocabulary, token)
+        for index in range(start, len(self.vocabulary)):
+            candidate = self.vocabulary[index]
+            if not candidate.startswith(token):
+                break
+            yield candidate
+
+    def _token_scores(self, token):
+        scores = {}
+        for candidate in self._expand(token):
+            factor = 1.0 if candidate == token else PREFIX_FACTOR
+            for doc_id, weight in self.postings[candidate].items():
+                score = weight * factor
+                if score > scores.get(doc_id, 0.0):
+                    scores[doc_id] = score
+        return scores
+
+    def search(self, query, limit=10):
+        """Documents matching every query token, by exact or prefix match, best first"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        key = (' '.join(tokens), limit)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+                return [dict(result) for result in cached]
+            results = self._search(tokens, limit)
+            self._results[key] = results
+            if len(self._results) > RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+            return [dict(result) for result in results]
+
+    def _search(self, tokens, limit):
+        """Score and rank; the caller holds the lock"""
+        totals = None
+        # Rarest-looking tokens (longest) first keeps the candidate set small
+        for token in sorted(set(tokens), key=len, reverse=True):
+            scores = self._token_scores(token)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {
+                    doc_id: totals[doc_id] + score
+                    for doc_id, score in scores.items() if doc_id in totals
+                }
+            if not totals:
+                return []
+
+        query_lower = ' '.join(tokens)
+        documents = self.documents
+        ranked = (
+            (
+                -(score + NAME_PREFIX_BONUS if documents[doc_id]['name_lower'].startswith(query_lower) else score),
+                documents[doc_id]['name_lower'],
+                doc_id,
+            )
+            for doc_id, score in totals.items()
+        )
+        # Only the top `limit` are needed, even when every document matches
+        results = heapq.nsmallest(limit, ranked)
+        return [
+            dict(self.documents[doc_id]['payload'], score=round(-score, 2))
+            for score, _, doc_id in results
+        ]
+
+
+def building_fields(building):
+    return {
+        'name': building.name,
+        'description': building.description,
+        'operating_hours': building.operating_hours,
+    }
+
+
+def building_payload(building):
+    return {
+        'id': building.id,
+        'name': building.name,
+        'description': building.description,
+        'operating_hours': building.operating_hours,
+        'image': building.image.url if building.image else None,
+    }
+
+
+class BuildingSearch:
+    """The per-process BuildingInfo index plus its cross-worker version check"""
+
+    def __init__(self):
+        self.index = SearchIndex()
+        self._lock = threading.Lock()
+        self._version = None
+
+    def rebuild(self):
+        with self._lock:
+            version = shared_version()
+            index = SearchIndex()
+            for building in BuildingInfo.objects.all():
+                index.add(building.id, building_fields(building), building_payload(building))
+            # Swap in the finished index so queries never see a partial one
+            self.index = index
+            self._version = version
+
+    def invalidate(self):
+        """Force a full rebuild on the next query"""
+        self._version = None
+
+    def ensure_current(self):
+        if self._version != shared_version():
+            self.rebuild()
+
+    def search(self, query, limit=10):
+        self.ensure_current()
+        return self.index.search(query, limit)
+
+    def update(self, building):
+        """Re-index one building after it was saved"""
+        with self._lock:
+            in_step = self._version == shared_version()
+            self.index.add(building.id, building_fields(building), building_payload(building))
+            version = bump_shared_version()
+            # Only skip the next rebuild if nothing else changed meanwhile
+            self._version = version if in_step else None
+
+    def delete(self, building_id):
+        with self._lock:
+            in_step = self._version == shared_version()
+            self.index.remove(building_id)
+            version = bump_shared_version()
+            self._version = version if in_step else None
+
+
+building_search = BuildingSearch()
@@ -1,9 +1,147 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserPreferences
+from django.utils import timezone
+from .models import (
+    BuildingInfo, FindUsPoster, HomePageContent, Room, Schedule, Section, Subject, UserPreferences, WalkwayEdge,
+    WalkwayNode,
+)
+from .active_content import invalidate_active_content
+from .dashboard_version import bump_version as bump_dashboard_version
+from .feeds import notify_section, record_schedule_change
+from .images import delete_for_instance, note_uploads, queue_for_instance, remember_images
+from .page_cache import purge_page_cache
+from .routing import invalidate_routes
+from .search import building_search
+from .preferences import cache_preferences, invalidate_preferences
+from .timetable import invalidate_timetable
+from .videos import note_video_upload, queue_for_poster
 
 @receiver(post_save, sender=User)
 def create_user_preferences(sender, instance, created, **kwargs):
     if created:
-        UserPreferences.objects.get_or_create(user=instance)
+        preferences, _ = UserPreferences.objects.get_or_create(user=instance)
+        # Replace anything cached under a reused user id
+        cache_preferences(preferences)
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def refresh_dashboard_version(sender, **kwargs):
+    # Covers last_login, is_active and new registrations on the dashboard
+    bump_dashboard_version()
+
+@receiver(post_save, sender=UserPreferences)
+def refresh_cached_preferences(sender, instance, **kwargs):
+    cache_preferences(instance)
+
+@receiver(post_delete, sender=UserPreferences)
+def drop_cached_preferences(sender, instance, **kwargs):
+    invalidate_preferences(instance.user_id)
+
+@receiver(post_save, sender=HomePageContent)
+@receiver(post_delete, sender=HomePageContent)
+@receiver(post_save, sender=FindUsPoster)
+@receiver(post_delete, sender=FindUsPoster)
+def refresh_active_content(sender, **kwargs):
+    invalidate_active_content()
+    purge_page_cache()
+
+@receiver(post_save, sender=BuildingInfo)
+@receiver(post_delete, sender=BuildingInfo)
+def refresh_building_pages(sender, **kwargs):
+    purge_page_cache()
+
+@receiver(post_save, sender=BuildingInfo)
+def reindex_building(sender, instance, **kwargs):
+    # Rolled-back saves never reach the search index
+    transaction.on_commit(lambda: building_search.update(instance))
+
+@receiver(post_delete, sender=BuildingInfo)
+def unindex_building(sender, instance, **kwargs):
+    building_id = instance.id
+    transaction.on_commit(lambda: building_search.delete(building_id))
+
+@receiver(post_save, sender=WalkwayNode)
+@receiver(post_delete, sender=WalkwayNode)
+@receiver(post_save, sender=WalkwayEdge)
+@receiver(post_delete, sender=WalkwayEdge)
+def refresh_routes(sender, **kwargs):
+    invalidate_routes()
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+@receiver(post_save, sender=Subject)
+def refresh_timetable(sender, **kwargs):
+    transaction.on_commit(invalidate_timetable)
+
+# Teachers' names are part of every timetable entry
+TEACHER_NAME_FIELDS = {'username', 'first_name', 'last_name'}
+
+@receiver(post_save, sender=User)
+def refresh_teacher_timetable(sender, instance, created, update_fields=None, **kwargs):
+    # Logins save last_login alone, so they never get this far
+    if created or (update_fields is not None and not TEACHER_NAME_FIELDS & set(update_fields)):
+        return
+    if Schedule.objects.filter(teacher=instance).exists():
+        transaction.on_commit(invalidate_timetable)
+
+def publish_schedule_change(schedule, kind):
+    description = f"{schedule.subject.name} on {schedule.get_day_display()}, {schedule.get_time_slot_display()}"
+    record_schedule_change(schedule.section_id, kind, description)
+    notify_section(
+        schedule.section_id, f'Class {kind}: {schedule.subject.name}', description, kind=f'schedule_{kind}',
+        metadata={'schedule_id': schedule.id, 'section_id': schedule.section_id},
+    )
+    Section.objects.filter(pk=schedule.section_id).update(schedules_last_updated=timezone.now())
+    transaction.on_commit(invalidate_timetable)
+
+@receiver(post_save, sender=Schedule)
+def schedule_saved(sender, instance, created, **kwargs):
+    publish_schedule_change(instance, 'added' if created else 'updated')
+
+@receiver(post_delete, sender=Schedule)
+def schedule_deleted(sender, instance, origin=None, **kwargs):
+    # Deleting a section takes its schedules and its change feed with it
+    if isinstance(origin, Section) or getattr(origin, 'model', None) is Section:
+        return
+    publish_schedule_change(instance, 'deleted')
+
+@receiver(post_init, sender=UserPreferences)
+@receiver(post_init, sender=BuildingInfo)
+@receiver(post_init, sender=FindUsPoster)
+@receiver(post_init, sender=HomePageContent)
+def remember_stored_images(sender, instance, **kwargs):
+    remember_images(instance)
+
+@receiver(pre_save, sender=UserPreferences)
+@receiver(pre_save, sender=BuildingInfo)
+@receiver(pre_save, sender=FindUsPoster)
+@receiver(pre_save, sender=HomePageContent)
+def note_image_uploads(sender, instance, **kwargs):
+    note_uploads(instance)
+
+@receiver(post_save, sender=UserPreferences)
+@receiver(post_save, sender=BuildingInfo)
+@receiver(post_save, sender=FindUsPoster)
+@receiver(post_save, sender=HomePageContent)
+def make_image_derivatives(sender, instance, **kwargs):
+    queue_for_instance(instance)
+
+@receiver(post_delete, sender=UserPreferences)
+@receiver(post_delete, sender=BuildingInfo)
+@receiver(post_delete, sender=FindUsPoster)
+@receiver(post_delete, sender=HomePageContent)
+def drop_image_derivatives(sender, instance, **kwargs):
+    delete_for_instance(instance)
+
+
+@receiver(pre_save, sender=FindUsPoster)
+def note_poster_video(sender, instance, **kwargs):
+    note_video_upload(instance)
+
+@receiver(post_save, sender=FindUsPoster)
+def transcode_poster_video(sender, instance, **kwargs):
+    queue_for_poster(instance)
@@ -0,0 +1,211 @@
+"""Spatial lookups over the building catalogue for /api/nearby/ and /api/hit/.
+
+Map boxes, in campus SVG units, go into a uniform grid so a hit test only
+looks at the boxes overlapping one cell. GPS coordinates go into a second
+grid, in metres, that is searched ring by ring outwards until the k
+nearest buildings are known. Both are rebuilt together whenever the
+building catalogue's version changes.
+"""
+import heapq
+import math
+import threading
+
+from .campus import SVG_HEIGHT, SVG_WIDTH
+from .catalogue import build_catalogue
+from .search import shared_version
+
+# Grid cell sizes: campus SVG units for boxes, metres for coordinates
+BOX_CELL = 64
+POINT_CELL = 25.0
+EARTH_RADIUS = 6371000.0
+# Metres the nearby search reaches out, and how far outside the campus a position may be
+MAX_RADIUS = 2000.0
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+class BoxGrid:
+    def __init__(self, cell=BOX_CELL):
+        self.cell = cell
+        # (column, row) -> [(x, y, width, height, item)]
+        self.cells = {}
+
+    def add(self, x, y, width, height, item):
+        entry = (x, y, width, height, item)
+        for column in range(int(x // self.cell), int((x + width) // self.cell) + 1):
+            for row in range(int(y // self.cell), int((y + height) // self.cell) + 1):
+                self.cells.setdefault((column, row), []).append(entry)
+
+    def hit(self, x, y):
+        """Items whose box contains the point, smallest box first"""
+        cell = self.cells.get((int(x // self.cell), int(y // self.cell)), ())
+        hits = [
+            (width * height, item)
+            for left, top, width, height, item in cell
+            if left <= x <= left + width and top <= y <= top + height
+        ]
+        hits.sort(key=lambda hit: hit[0])
+        return [item for _, item in hits]
+
+
+class PointGrid:
+    """Lat/lng points bucketed on a local flat projection, which is exact enough for one campus"""
+
+    def __init__(self, cell=POINT_CELL):
+        self.cell = cell
+        self.cells = {}
+        self.origin = None
+        self.size = 0
+        # Smallest and largest occupied column and row
+        self.bounds = None
+
+    def _project(self, lat, lng):
+        origin_lat, origin_lng = self.origin
+        x = math.radians(lng - origin_lng) * EARTH_RADIUS * math.cos(math.radians(origin_lat))
+        y = math.radians(lat - origin_lat) * EARTH_RADIUS
+        return x, y
+
+    def _cell(self, lat, lng):
+        x, y = self._project(lat, lng)
+        return int(math.floor(x / self.cell)), int(math.floor(y / self.cell))
+
+    def add(self, lat, lng, item):
+        if self.origin is None:
+            self.origin = (lat, lng)
+        column, row = self._cell(lat, lng)
+        self.cells.setdefault((column, row), []).append((lat, lng, item))
+        self.size += 1
+        if self.bounds is None:
+            self.bounds = (column, row, column, row)
+        else:
+            low_column, low_row, high_column, high_row = self.bounds
+            self.bounds = (
+                min(low_column, column), min(low_row, row),
+                max(high_column, column), max(high_row, row),
+            )
+
+    def covers(self, lat, lng, padding=0.0):
+        """Whether a point lies within `padding` metres of the occupied cells' bounding box"""
+        if not self.size:
+            return False
+        column, row = self._cell(lat, lng)
+        pad = math.ceil(padding / self.cell)
+        low_column, low_row, high_column, high_row = self.bounds
+        return low_column - pad <= column <= high_column + pad and low_row - pad <= row <= high_row + pad
+
+    def nearest(self, lat, lng, k, radius=MAX_RADIUS):
+        """Up to k (distance in metres, item) pairs within about `radius` metres, nearest first"""
+        if not self.size or k < 1:
+            return []
+        column, row = self._cell(lat, lng)
+        low_column, low_row, high_column, high_row = self.bounds
+        # No occupied cell lies further out than this ring, and the walk never goes past the radius
+        last_ring = min(
+            max(abs(column - low_column), abs(column - high_column), abs(row - low_row), abs(row - high_row)),
+            math.ceil(radius / self.cell),
+        )
+
+        best = []
+        counter = 0
+        for ring in range(last_ring + 1):
+            if len(best) == k and -best[0][0] <= (ring - 1) * self.cell:
+                # Everything in this ring or beyond is further than the current k-th
+                break
+            for key in ring_cells(column, row, ring):
+                for point_lat, point_lng, item in self.cells.get(key, ()):
+                    distance = haversine(lat, lng, point_lat, point_lng)
+                    counter += 1
+                    entry = (-distance, counter, item)
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, entry)
+        return [(-distance, item) for distance, _, item in sorted(best, reverse=True)]
+
+
+def ring_cells(column, row, ring):
+    if ring == 0:
+        yield column, row
+        return
+    for offset in range(-ring, ring + 1):
+        yield column + offset, row - ring
+        yield column + offset, row + ring
+    for offset in range(-ring + 1, ring):
+        yield column - ring, row + offset
+        yield column + ring, row + offset
+
+
+def building_summary(entry):
+    return {
+        'id': entry['id'],
+        'name': entry['name'],
+        'category': entry['category'],
+        'coordinates': entry['coordinates'],
+    }
+
+
+class SpatialIndex:
+    """Per-process grids over the current building catalogue"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self.boxes = BoxGrid()
+        self.points = PointGrid()
+
+    def invalidate(self):
+        self._version = None
+
+    def ensure_current(self):
+        version = shared_version()
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self.rebuild()
+                    self._version = version
+
+    def rebuild(self, entries=None):
+        if entries is None:
+            entries = build_catalogue()
+        boxes, points = BoxGrid(), PointGrid()
+        for entry in entries:
+            if not entry['mapped']:
+                continue
+            summary = building_summary(entry)
+            # The catalogue stores boxes as percentages of the SVG
+            boxes.add(
+                entry['x'] * SVG_WIDTH / 100, entry['y'] * SVG_HEIGHT / 100,
+                entry['width'] * SVG_WIDTH / 100, entry['height'] * SVG_HEIGHT / 100,
+                summary,
+            )
+            if entry['coordinates']:
+                points.add(*entry['coordinates'], summary)
+        self.boxes, self.points = boxes, points
+
+    def near_campus(self, lat, lng):
+        """Whether a position is close enough to the mapped buildings to search around"""
+        self.ensure_current()
+        # With no coordinates there is nothing to walk, so any position is cheap
+        return not self.points.size or self.points.covers(lat, lng, MAX_RADIUS)
+
+    def nearby(self, lat, lng, k=5):
+        self.ensure_current()
+        return [
+            dict(item, distance=round(distance, 1))
+            for distance, item in self.points.nearest(lat, lng, k)
+        ]
+
+    def hit(self, x, y):
+        self.ensure_current()
+        return [dict(item) for item in self.boxes.hit(x, y)]
+
+
+spatial_index = SpatialIndex()
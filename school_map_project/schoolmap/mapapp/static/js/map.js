@@ -341,7 +341,7 @@ function initMap() {
     const buildings = window.buildingsData || [];
     
     if (buildings.length === 0) {
-        console.error('Buildings data not loaded. Make sure buildings.js is loaded before map.js');
+        console.error('Buildings data not loaded. Make sure /api/buildings.js is loaded before map.js');
         return; // Exit if no buildings data is available
     }
     
@@ -350,6 +350,8 @@ function initMap() {
     
     if (mapOverlay) {
         buildings.forEach(building => {
+            // Buildings added in the admin have no map position yet
+            if (!building.mapped) return;
             const area = document.createElement('div');
             area.className = 'map-area';
             area.setAttribute('data-building-name', building.name);
@@ -414,6 +416,19 @@ function initMap() {
                 ">
                     <i class="fas fa-info-circle"></i> View Details
                 </button>
+                <button onclick="getDirections(decodeURIComponent('${encodedName}'))" style="
+                    background: white;
+                    color: #ff6b9e;
+                    border: 1px solid #ff6b9e;
+                    padding: 8px 16px;
+                    border-radius: 6px;
+                    cursor: pointer;
+                    font-weight: 500;
+                    width: 100%;
+                    margin-top: 5px;
+                ">
+                    <i class="fas fa-directions"></i> Get Directions
+                </button>
             </div>
         `;
         
@@ -507,11 +522,102 @@ function initMap() {
             resetMapView();
         }
     });
+    
+    focusFromQuery();
+    markFreeRooms();
 }
 
 // Get directions function
-function getDirections(buildingName) {
-    console.log('Getting directions to:', buildingName);
-    alert('Directions to ' + buildingName + ' will be shown here.\n\nThis feature can be integrated with a routing system.');
-    // You can integrate with a real routing/pathfinding system here
+let routeLayer = null;
+
+function clearRoute() {
+    if (routeLayer && routeLayer.parentNode) {
+        routeLayer.remove();
+    }
+    routeLayer = null;
+}
+
+// Draw a route over the map; route points are in the campus SVG's 1440x1106 space
+function drawRoute(points) {
+    clearRoute();
+    const overlay = document.getElementById('mapOverlay');
+    if (!overlay || points.length < 2) return false;
+    
+    const svgNS = 'http://www.w3.org/2000/svg';
+    routeLayer = document.createElementNS(svgNS, 'svg');
+    routeLayer.setAttribute('viewBox', '0 0 1440 1106');
+    routeLayer.setAttribute('preserveAspectRatio', 'none');
+    routeLayer.style.cssText = 'position:absolute;left:0;top:0;width:100%;height:100%;pointer-events:none;z-index:900;';
+    
+    const line = document.createElementNS(svgNS, 'polyline');
+    line.setAttribute('points', points.map(point => point.join(',')).join(' '));
+    line.setAttribute('fill', 'none');
+    line.setAttribute('stroke', '#ff6b9e');
+    line.setAttribute('stroke-width', '6');
+    line.setAttribute('stroke-linecap', 'round');
+    line.setAttribute('stroke-linejoin', 'round');
+    line.setAttribute('stroke-dasharray', '12 8');
+    routeLayer.appendChild(line);
+    overlay.appendChild(routeLayer);
+    return true;
+}
+
+function getDirections(buildingName, fromName) {
+    const origin = fromName || prompt('Starting from which building?', window.lastRouteOrigin || '');
+    if (!origin) return;
+    window.lastRouteOrigin = origin;
+    
+    const params = new URLSearchParams({ from: origin, to: buildingName });
+    fetch(`/api/route/?${params}`)
+        .then(response => response.json())
+        .then(route => {
+            if (route.error) {
+                alert(route.error);
+                return;
+            }
+            if (!drawRoute(route.points)) {
+                alert(`Walk from ${route.from} to ${route.to} (${route.points.length - 1} segments).`);
+            }
+        })
+        .catch(error => console.error('Error getting directions:', error));
+}
+
+// Links from the schedule page open the map on a building (?building=)
+// or on wherever a section has class right now (?section=)
+function focusFromQuery() {
+    const params = new URLSearchParams(window.location.search);
+    const buildingName = params.get('building');
+    const sectionId = params.get('section');
+    
+    if (buildingName) {
+        zoomToBuilding(buildingName);
+    } else if (sectionId) {
+        fetch(`/api/timetable/sections/${encodeURIComponent(sectionId)}/`)
+            .then(response => response.json())
+            .then(found => {
+                const lesson = found.current || found.next;
+                if (lesson && lesson.building) {
+                    zoomToBuilding(lesson.building);
+                }
+            })
+            .catch(error => console.error('Error finding class:', error));
+    }
+}
+
+// Tag buildings that have a room free right now, for the map tooltips
+function markFreeRooms() {
+    fetch('/api/timetable/free-rooms/')
+        .then(response => response.json())
+        .then(found => {
+            const freeRooms = new Map((found.buildings || []).map(item => [item.building.toLowerCase(), item.rooms]));
+            document.querySelectorAll('.map-area').forEach(area => {
+                const rooms = freeRooms.get((area.getAttribute('data-building-name') || '').toLowerCase());
+                area.classList.toggle('has-free-room', Boolean(rooms));
+                area.setAttribute('data-free-rooms', rooms ? rooms.length : 0);
+                if (rooms) {
+                    area.title = `Free now: ${rooms.map(room => room.room).join(', ')}`;
+                }
+            });
+        })
+        .catch(error => console.error('Error loading free rooms:', error));
 }
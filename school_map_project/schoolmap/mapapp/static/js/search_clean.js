@@ -13,7 +13,7 @@ function performSearch(searchTerm) {
     
     if (result) {
         // Zoom and center the map on the building
-        if (window.map) {
+        if (window.map && result.coordinates) {
             map.setView(result.coordinates, 20);
             
             // Add a temporary marker
@@ -56,9 +56,43 @@ function showSuggestions(searchTerm) {
     
     if (filteredBuildings.length === 0) {
         hideSuggestions();
+        fuzzySuggestions(searchTerm, buildings);
         return;
     }
     
+    renderSuggestions(searchTerm);
+}
+
+// Ask the server for typo-tolerant matches when nothing matches locally
+let fuzzyRequest = 0;
+function fuzzySuggestions(searchTerm, buildings) {
+    const requestId = ++fuzzyRequest;
+    fetch(`/api/search/fuzzy/?q=${encodeURIComponent(searchTerm)}`)
+        .then(response => response.ok ? response.json() : { results: [] })
+        .then(data => {
+            const input = document.getElementById('locationSearch');
+            // Drop responses for anything but the latest query
+            if (requestId !== fuzzyRequest || (input && input.value !== searchTerm)) return;
+            const seen = new Set();
+            filteredBuildings = [];
+            data.results.forEach(result => {
+                const building = buildings.find(b => b.name === result.building);
+                if (building && !seen.has(building.name)) {
+                    seen.add(building.name);
+                    filteredBuildings.push(building);
+                }
+            });
+            if (filteredBuildings.length > 0) {
+                renderSuggestions(searchTerm);
+            }
+        })
+        .catch(() => {});
+}
+
+function renderSuggestions(searchTerm) {
+    const dropdown = document.getElementById('suggestionsDropdown');
+    if (!dropdown) return;
+    
     // Create suggestion items
     dropdown.innerHTML = '';
     filteredBuildings.forEach((building, index) => {
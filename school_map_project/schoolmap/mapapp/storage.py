@@ -0,0 +1,301 @@
+"""Media storage with a local, content-addressed cache in front of a remote store.
+
+An upload is written once to MEDIA_ROOT/<CACHE_DIR>/, under the SHA-256
+of its content. Identical files, such as a re-uploaded poster or the
+same default avatar, share one local copy and one remote copy. A
+MediaBlob row maps each stored name to its digest. The request returns
+once the local copy exists. A per-process thread pool then pushes the
+blob to the remote store (Cloudinary in production) and records its
+remote name.
+
+url() answers from an in-memory cache. Until the upload finishes it
+points at the local copy, and afterwards at the remote one. Files read
+back are served from the local copy, which is refilled from the remote
+store when it is missing, e.g. on a fresh dyno. Names stored before
+this layer existed have no MediaBlob row and go straight to the remote
+store.
+
+LocalRemoteStorage stands in for the remote store with no network, with
+optional latency, for development and for benchmarking the media path.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, Storage
+from django.db import connection, transaction
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+from .models import MediaBlob
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Dotted path of the remote storage class
+    'REMOTE': 'mapapp.storage.LocalRemoteStorage',
+    # Under MEDIA_ROOT: the content-addressed cache, and the stand-in remote store
+    'CACHE_DIR': 'blobs',
+    'REMOTE_DIR': 'remote',
+    # Prefix of blob names in the remote store
+    'REMOTE_PREFIX': 'media',
+    # Without the pool, uploads to the remote store happen when the save commits (tests)
+    'ASYNC': True,
+    'WORKERS': 2,
+    'URL_CACHE_SIZE': 2048,
+    # Seconds a cached URL is trusted; another process may have finished the upload since
+    'URL_CACHE_TIMEOUT': 300,
+    # Seconds the stand-in remote store waits per call
+    'LATENCY': 0.0,
+}
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+# Digests queued for upload in this process and not yet done
+_pending = set()
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'MEDIA_STORAGE', {}))
+    return config
+
+
+def blob_name(digest, name):
+    """Content-addressed name for a file's content, keeping its extension for content types"""
+    _, extension = os.path.splitext(name)
+    return f'{digest[:2]}/{digest}{extension.lower()}'
+
+
+@deconstructible
+class LocalRemoteStorage(FileSystemStorage):
+    """The remote store's interface on the local disk, under MEDIA_ROOT/<REMOTE_DIR>"""
+
+    def __init__(self, location=None, base_url=None, latency=None, **kwargs):
+        config = get_config()
+        self.latency = config['LATENCY'] if latency is None else latency
+        super().__init__(
+            location=location or os.path.join(settings.MEDIA_ROOT, config['REMOTE_DIR']),
+            base_url=base_url or f"{settings.MEDIA_URL}{config['REMOTE_DIR']}/",
+            **kwargs,
+        )
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _open(self, name, mode='rb'):
+        self._wait()
+        return super()._open(name, mode)
+
+    def _save(self, name, content):
+        self._wait()
+        return super()._save(name, content)
+
+    def delete(self, name):
+        self._wait()
+        super().delete(name)
+
+    def exists(self, name):
+        self._wait()
+        return super().exists(name)
+
+    def size(self, name):
+        self._wait()
+        return super().size(name)
+
+    def url(self, name):
+        self._wait()
+        return super().url(name)
+
+
+@deconstructible
+class CachedMediaStorage(Storage):
+    def __init__(self, remote=None, local=None):
+        self._remote = remote
+        self._local = local
+        self._urls = OrderedDict()
+        self._urls_lock = threading.Lock()
+
+    @cached_property
+    def remote(self):
+        return self._remote or import_string(get_config()['REMOTE'])()
+
+    @cached_property
+    def local(self):
+        if self._local:
+            return self._local
+        cache_dir = get_config()['CACHE_DIR']
+        return FileSystemStorage(
+            location=os.path.join(settings.MEDIA_ROOT, cache_dir), base_url=f'{settings.MEDIA_URL}{cache_dir}/',
+        )
+
+    def _row(self, name):
+        return MediaBlob.objects.filter(name=name).first()
+
+    def _save(self, name, content):
+        directory = self.local.path('')
+        os.makedirs(directory, exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as temporary:
+            for chunk in content.chunks():
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                hasher.update(chunk)
+                temporary.write(chunk)
+                size += len(chunk)
+        digest = hasher.hexdigest()
+        path = self.local.path(blob_name(digest, name))
+        if os.path.exists(path):
+            # Same content as a file already stored
+            os.remove(temporary.name)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temporary.name, path)
+
+        remote_name = (
+            MediaBlob.objects.filter(digest=digest).exclude(remote_name='')
+            .values_list('remote_name', flat=True).first()
+        ) or ''
+        MediaBlob.objects.update_or_create(
+            name=name, defaults={'digest': digest, 'size': size, 'remote_name': remote_name},
+        )
+        self.forget(name)
+        if not remote_name:
+            queue_upload(self, digest)
+        return name
+
+    def _open(self, name, mode='rb'):
+        row = self._row(name)
+        if row is None:
+            return self.remote.open(name, mode)
+        blob = blob_name(row.digest, name)
+        if not self.local.exists(blob):
+            # Not on this machine yet: refill the cache from the remote store
+            self.fetch(row, blob)
+        return self.local.open(blob, mode)
+
+    def fetch(self, row, blob):
+        path = self.local.path(blob)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.remote.open(row.remote_name, 'rb') as remote_file, \
+                tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as temporary:
+            for chunk in remote_file.chunks():
+                temporary.write(chunk)
+        os.replace(temporary.name, path)
+
+    def exists(self, name):
+        if MediaBlob.objects.filter(name=name).exists():
+            return True
+        # Files stored before this layer live only in the remote store; a new upload must not reuse their names
+        return self.remote.exists(name)
+
+    def size(self, name):
+        row = self._row(name)
+        return row.size if row else self.remote.size(name)
+
+    def delete(self, name):
+        row = self._row(name)
+        self.forget(name)
+        if row is None:
+            self.remote.delete(name)
+            return
+        row.delete()
+        if MediaBlob.objects.filter(digest=row.digest).exists():
+            # Other names still share this content
+            return
+        self.local.delete(blob_name(row.digest, name))
+        if row.remote_name:
+            self.remote.delete(row.remote_name)
+
+    def url(self, name):
+        config = get_config()
+        now = time.monotonic()
+        with self._urls_lock:
+            cached = self._urls.get(name)
+            if cached and cached[1] > now:
+                self._urls.move_to_end(name)
+                return cached[0]
+
+        row = self._row(name)
+        if row is None:
+            url = self.remote.url(name)
+        elif row.remote_name:
+            url = self.remote.url(row.remote_name)
+        else:
+            url = self.local.url(blob_name(row.digest, name))
+
+        with self._urls_lock:
+            self._urls[name] = (url, now + config['URL_CACHE_TIMEOUT'])
+            self._urls.move_to_end(name)
+            while len(self._urls) > config['URL_CACHE_SIZE']:
+                self._urls.popitem(last=False)
+        return url
+
+    def forget(self, *names):
+        """Drop cached URLs, e.g. once a file has moved to the remote store"""
+        with self._urls_lock:
+            for name in names:
+                self._urls.pop(name, None)
+
+    def upload(self, digest):
+        """Copy one blob to the remote store and record its remote name on every file sharing it"""
+        rows = MediaBlob.objects.filter(digest=digest)
+        names = list(rows.values_list('name', flat=True))
+        if not names:
+            return None
+        remote_name = rows.exclude(remote_name='').values_list('remote_name', flat=True).first()
+        if not remote_name:
+            blob = blob_name(digest, names[0])
+            with self.local.open(blob, 'rb') as file:
+                remote_name = self.remote.save(f"{get_config()['REMOTE_PREFIX']}/{blob}", file)
+            rows.update(remote_name=remote_name)
+        self.forget(*names)
+        return remote_name
+
+
+def _executor():
+    global _pool, _pool_pid
+    with _lock:
+        # A forked worker can't use its parent's threads
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(max_workers=get_config()['WORKERS'], thread_name_prefix='media-upload')
+            _pool_pid = os.getpid()
+            _pending.clear()
+        return _pool
+
+
+def _run(storage, digest):
+    try:
+        storage.upload(digest)
+    except Exception:
+        logger.exception('Failed to upload media blob %s', digest)
+    finally:
+        with _lock:
+            _pending.discard(digest)
+        # This thread is never inside a request, so nothing else closes its connection
+        connection.close()
+
+
+def queue_upload(storage, digest):
+    """Upload the blob once the current transaction commits, in the background unless ASYNC is off"""
+    def submit():
+        if not get_config()['ASYNC']:
+            storage.upload(digest)
+            return
+        pool = _executor()
+        with _lock:
+            if digest in _pending:
+                return
+            _pending.add(digest)
+        pool.submit(_run, storage, digest)
+    transaction.on_commit(submit)
@@ -0,0 +1,41 @@
+from django import template
+from django.core.cache import cache
+
+from mapapp.page_cache import cache_stats, fragment_key, get_timeout, preference_vary_on
+
+register = template.Library()
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        vary_on = preference_vary_on(context.get('user_preferences'))
+        vary_on += [var.resolve(context) for var in self.vary_on]
+        key = fragment_key(self.name, vary_on)
+        content = cache.get(key)
+        if content is None:
+            cache_stats.record('fragment', 'miss')
+            content = self.nodelist.render(context)
+            cache.set(key, content, get_timeout())
+        else:
+            cache_stats.record('fragment', 'hit')
+        return content
+
+@register.tag
+def cached_fragment(parser, token):
+    """
+    Cache a template fragment until the page cache is purged.
+    The key always varies by the user's theme, accent colour and font size.
+    Usage: {% cached_fragment "name" [extra_var ...] %} ... {% endcached_fragment %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires a fragment name")
+    nodelist = parser.parse(('endcached_fragment',))
+    parser.delete_first_token()
+    name = bits[1].strip('"\'')
+    vary_on = [parser.compile_filter(bit) for bit in bits[2:]]
+    return CachedFragmentNode(nodelist, name, vary_on)
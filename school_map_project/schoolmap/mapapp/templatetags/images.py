@@ -0,0 +1,46 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from mapapp.images import CONTENT_TYPES, variants_for
+
+register = template.Library()
+
+def srcset_value(storage, variants):
+    return ', '.join(f'{storage.url(name)} {width}w' for width, name in variants)
+
+@register.simple_tag
+def srcset(image, sizes='100vw', format='jpeg'):
+    """
+    srcset and sizes attributes for an <img> showing an uploaded image, or nothing
+    until its derivatives exist.
+    Usage: <img src="{{ building.image.url }}" {% srcset building.image "50vw" %}>
+    """
+    variants = variants_for(image.name if image else '').get(format)
+    if not variants:
+        return ''
+    return format_html('srcset="{}" sizes="{}"', srcset_value(image.storage, variants), sizes)
+
+@register.simple_tag
+def responsive_image(image, sizes='100vw', **attrs):
+    """
+    A <picture> with WebP and JPEG derivatives of an uploaded image, falling back to the original.
+    Extra keyword arguments become attributes of the <img>.
+    Usage: {% responsive_image building.image sizes="50vw" alt=building.name class="building-image" %}
+    """
+    if not image:
+        return ''
+    variants = variants_for(image.name)
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (CONTENT_TYPES[image_format], srcset_value(image.storage, variants[image_format]), sizes)
+            for image_format in ('webp', 'jpeg') if image_format in variants
+        ),
+    )
+    img = format_html(
+        '<img src="{}"{}>', image.url,
+        format_html_join('', ' {}="{}"', ((name.replace('_', '-'), value) for name, value in attrs.items())),
+    )
+    if not sources:
+        return img
+    return format_html('<picture>{}{}</picture>', sources, img)
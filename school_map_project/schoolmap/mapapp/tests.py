@@ -1,3 +1,1452 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, IntegrityError, OperationalError, connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .activity_buffer import ActivityBuffer, write_activities
+from .active_content import get_active_home_content, get_active_poster
+from .admin import FindUsPosterAdmin
+from .catalogue import accepted_encodings, building_catalogue
+from . import feeds
+from .feeds import clamp_wait, notification_feed, notify, record_schedule_change
+from .fuzzy import TrigramIndex, edit_distance, fuzzy_search
+from .forms import EnrollmentForm, ScheduleForm, SectionForm
+from .images import variants_for
+from .imports import BuildingImporter, ScheduleImporter, UserImporter
+from .models import (
+    ActivityLog, ActivityDailyStat, BuildingInfo, ImageDerivative, MediaBlob, FindUsPoster, HomePageContent, Notification, Room, Schedule, ScheduleChange, Section,
+    StudentEnrollment, Subject, UserPreferences, WalkwayEdge, WalkwayNode,
+)
+from .page_cache import cache_stats, fragment_key, page_key, static_build
+from .search import SearchIndex, building_search
+from .storage import CachedMediaStorage, LocalRemoteStorage, blob_name
+from .preferences import get_user_preferences, invalidate_preferences
+from .provisioning import hash_passwords, invite_path, provision_users
+from .retention import archive_path, get_policy
+from .routing import WalkwayGraph, campus_router
+from .spatial import PointGrid, haversine, spatial_index
+from .conflicts import find_conflicts, validate_timetable
+from .timetable import Timeline, current_academic_year, get_version, timetable
+
+
+@override_settings(ACTIVITY_LOG_BUFFER={'ENABLED': True, 'MAX_SIZE': 100, 'FLUSH_INTERVAL': 60})
+class ActivityBufferTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buffer_user', password='pass')
+        self.buffer = ActivityBuffer()
+        # Flush by hand instead of from the background thread
+        patcher = mock.patch.object(ActivityBuffer, '_ensure_thread')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_entry(self, action='user_login', **kwargs):
+        return ActivityLog(user=self.user, action=action, description=action, timestamp=timezone.now(), **kwargs)
+
+    def test_entries_wait_for_flush(self):
+        for _ in range(3):
+            self.buffer.add(self.make_entry())
+        self.assertEqual(self.buffer.stats()['queue_depth'], 3)
+        self.assertFalse(ActivityLog.objects.filter(user=self.user).exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.buffer.flush(), 3)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "mapapp_activitylog"')]
+        self.assertEqual(len(inserts), 1)
+
+        self.assertEqual(ActivityLog.objects.filter(user=self.user).count(), 3)
+        stat = ActivityDailyStat.objects.get(date=timezone.localdate(), action='user_login')
+        self.assertEqual(stat.count, 3)
+        stats = self.buffer.stats()
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['flushed_total'], 3)
+        self.assertEqual(stats['flush_count'], 1)
+
+    def test_flush_keeps_event_timestamp(self):
+        earlier = timezone.now() - timedelta(minutes=5)
+        entry = self.make_entry()
+        entry.timestamp = earlier
+        self.buffer.add(entry)
+        self.buffer.flush()
+        self.assertEqual(ActivityLog.objects.get(user=self.user).timestamp, earlier)
+
+    def test_size_threshold_wakes_flusher(self):
+        with override_settings(ACTIVITY_LOG_BUFFER={'MAX_SIZE': 2}):
+            self.buffer.add(self.make_entry())
+            self.assertFalse(self.buffer._wakeup.is_set())
+            self.buffer.add(self.make_entry())
+            self.assertTrue(self.buffer._wakeup.is_set())
+
+    def test_pending_limit_drops_oldest(self):
+        with override_settings(ACTIVITY_LOG_BUFFER={'MAX_PENDING': 2}):
+            for action in ['user_login', 'user_logout', 'profile_updated']:
+                self.buffer.add(self.make_entry(action))
+        self.assertEqual(self.buffer.stats()['dropped_total'], 1)
+        self.assertEqual([entry.action for entry in self.buffer._pending], ['user_logout', 'profile_updated'])
+
+    def test_failed_flush_requeues_batch(self):
+        self.buffer.add(self.make_entry())
+        with mock.patch('mapapp.activity_buffer.write_activities', side_effect=OperationalError):
+            with self.assertRaises(OperationalError):
+                self.buffer.flush()
+        self.assertEqual(self.buffer.stats()['queue_depth'], 1)
+
+    def test_rejected_entry_is_dropped_and_the_rest_written(self):
+        for action in ['user_login', 'bad', 'user_logout']:
+            self.buffer.add(self.make_entry(action))
+
+        def write(entries):
+            if any(entry.action == 'bad' for entry in entries):
+                raise IntegrityError('FOREIGN KEY constraint failed')
+            write_activities(entries)
+
+        with mock.patch('mapapp.activity_buffer.write_activities', side_effect=write), \
+                self.assertLogs('mapapp.activity_buffer', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(
+            sorted(ActivityLog.objects.filter(user=self.user).values_list('action', flat=True)), ['user_login', 'user_logout'],
+        )
+        stats = self.buffer.stats()
+        self.assertEqual((stats['queue_depth'], stats['dropped_total']), (0, 1))
+
+
+class ActivityRetentionTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        self.user = User.objects.create_user('retention_user', password='pass')
+        now = timezone.now()
+        self.old_times = [now - timedelta(days=400 + n) for n in range(5)]
+        for when in self.old_times + [now]:
+            ActivityLog.objects.create(user=self.user, action='user_login', description='login', timestamp=when)
+
+    def test_prunes_old_rows_into_monthly_archives(self):
+        with self.settings(MEDIA_ROOT=self.media_root.name):
+            call_command('prune_activity_log', days=365, batch_size=2, stdout=StringIO())
+
+            self.assertEqual(ActivityLog.objects.filter(user=self.user).count(), 1)
+            archived = []
+            months = {(timezone.localtime(t).year, timezone.localtime(t).month) for t in self.old_times}
+            for month in months:
+                with gzip.open(archive_path(month, get_policy()), 'rt') as archive:
+                    archived.extend(json.loads(line) for line in archive)
+        self.assertEqual(len(archived), 5)
+        self.assertEqual({row['action'] for row in archived}, {'user_login'})
+
+    def test_failed_batch_is_not_archived_twice(self):
+        with self.settings(MEDIA_ROOT=self.media_root.name):
+            with mock.patch('django.db.models.query.QuerySet.delete', side_effect=DatabaseError('locked')):
+                with self.assertRaises(DatabaseError):
+                    call_command('prune_activity_log', days=365, stdout=StringIO())
+            call_command('prune_activity_log', days=365, stdout=StringIO())
+
+            archived = []
+            directory = os.path.join(self.media_root.name, get_policy()['ARCHIVE_DIR'])
+            for name in os.listdir(directory):
+                self.assertTrue(name.endswith('.jsonl.gz'), name)
+                with gzip.open(os.path.join(directory, name), 'rt') as archive:
+                    archived.extend(json.loads(line)['id'] for line in archive)
+        self.assertEqual(len(archived), 5)
+        self.assertEqual(len(set(archived)), 5)
+
+    def test_windows_below_one_day_are_rejected(self):
+        for days in [0, -5]:
+            with self.assertRaises(CommandError):
+                call_command('prune_activity_log', days=days, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('prune_activity_log', '--days', '0', stdout=StringIO())
+        self.assertEqual(ActivityLog.objects.filter(user=self.user).count(), 6)
+
+    def test_dry_run_keeps_rows(self):
+        out = StringIO()
+        with self.settings(MEDIA_ROOT=self.media_root.name):
+            call_command('prune_activity_log', days=365, dry_run=True, stdout=out)
+        self.assertIn('5 rows', out.getvalue())
+        self.assertEqual(ActivityLog.objects.filter(user=self.user).count(), 6)
+
+
+class UserPreferencesCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('prefs_user', password='pass')
+
+    def test_warm_cache_needs_no_queries(self):
+        with self.assertNumQueries(0):
+            preferences = get_user_preferences(self.user)
+        self.assertEqual(preferences.user_id, self.user.pk)
+        self.assertEqual(preferences.theme, 'light')
+
+    def test_miss_loads_from_database(self):
+        invalidate_preferences(self.user.pk)
+        with self.assertNumQueries(1):
+            get_user_preferences(self.user)
+        with self.assertNumQueries(0):
+            get_user_preferences(self.user)
+
+    def test_save_refreshes_cache(self):
+        preferences = UserPreferences.objects.get(user=self.user)
+        preferences.theme = 'dark'
+        preferences.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_preferences(self.user).theme, 'dark')
+
+    def test_delete_invalidates_cache(self):
+        UserPreferences.objects.filter(user=self.user).delete()
+        # Queryset delete() still sends post_delete per object
+        preferences = get_user_preferences(self.user)
+        self.assertTrue(UserPreferences.objects.filter(pk=preferences.pk).exists())
+
+    def test_settings_page_does_no_preference_queries(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('settings'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if 'mapapp_userpreferences' in q['sql']])
+
+    def test_settings_form_saves_through_cached_instance(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('settings'), {
+            'theme': 'sunset',
+            'accent_color': '#123456',
+            'font_size': 'large',
+            'dashboard_layout': 'list',
+        })
+        self.assertEqual(UserPreferences.objects.get(user=self.user).theme, 'sunset')
+        self.assertEqual(get_user_preferences(self.user).font_size, 'large')
+
+
+class ActiveContentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('content_user', password='pass')
+
+    def test_home_content_is_cached(self):
+        content = HomePageContent.objects.create(welcome_title='Cached title')
+        self.assertEqual(get_active_home_content().pk, content.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_active_home_content().welcome_title, 'Cached title')
+
+    def test_missing_home_content_is_not_created(self):
+        HomePageContent.objects.all().delete()
+        content = get_active_home_content()
+        self.assertIsNone(content.pk)
+        self.assertFalse(HomePageContent.objects.exists())
+        with self.assertNumQueries(0):
+            get_active_home_content()
+
+    def test_save_invalidates_home_content(self):
+        HomePageContent.objects.create(welcome_title='Old')
+        get_active_home_content()
+        HomePageContent.objects.create(welcome_title='New')
+        self.assertEqual(get_active_home_content().welcome_title, 'New')
+
+    def test_about_page_does_not_write(self):
+        FindUsPoster.objects.all().delete()
+        poster = FindUsPoster.objects.create(title='Inactive', youtube_url='https://youtu.be/abc', is_active=False)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('about'))
+        self.assertEqual(response.context['active_poster'].pk, poster.pk)
+        self.assertFalse([q for q in queries if q['sql'].startswith(('UPDATE', 'INSERT'))])
+        poster.refresh_from_db()
+        self.assertFalse(poster.is_active)
+        with self.assertNumQueries(0):
+            self.client.get(reverse('about'))
+
+    def test_admin_actions_invalidate_poster(self):
+        first = FindUsPoster.objects.create(title='First', youtube_url='https://youtu.be/a')
+        second = FindUsPoster.objects.create(title='Second', youtube_url='https://youtu.be/b')
+        self.assertEqual(get_active_poster().pk, second.pk)
+
+        admin = FindUsPosterAdmin(FindUsPoster, site)
+        with mock.patch.object(admin, 'message_user'):
+            admin.make_active(None, FindUsPoster.objects.filter(pk=first.pk))
+        self.assertEqual(get_active_poster().pk, first.pk)
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('page_user', password='pass')
+
+    def test_anonymous_page_is_cached(self):
+        first = self.client.get(reverse('landing'))
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('landing'))
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(first.content, second.content)
+
+    def test_logged_in_users_bypass_page_cache(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('landing'))
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_building_change_purges_pages(self):
+        BuildingInfo.objects.create(name='Library', description='Old description')
+        url = reverse('building_info') + '?name=Library'
+        self.assertContains(self.client.get(url), 'Old description')
+        BuildingInfo.objects.filter(name='Library').get().delete()
+        BuildingInfo.objects.create(name='Library', description='New description')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'New description')
+
+    def test_home_fragments_vary_by_preferences(self):
+        self.client.force_login(self.user)
+        before = cache_stats.snapshot()['fragment']
+        self.client.get(reverse('home'))
+        self.client.get(reverse('home'))
+        after = cache_stats.snapshot()['fragment']
+        self.assertEqual(after['misses'] - before['misses'], 2)
+        self.assertEqual(after['hits'] - before['hits'], 2)
+
+        preferences = UserPreferences.objects.get(user=self.user)
+        preferences.accent_color = '#123456'
+        preferences.save()
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, '--accent-color: #123456')
+
+    def test_help_fragments_leave_the_support_form_uncached(self):
+        self.client.force_login(self.user)
+        first = self.client.get(reverse('help_support'))
+        before = cache_stats.snapshot()['fragment']
+        second = self.client.get(reverse('help_support'))
+        after = cache_stats.snapshot()['fragment']
+        self.assertEqual(after['hits'] - before['hits'], 3)
+        self.assertEqual(after['misses'] - before['misses'], 0)
+        self.assertContains(second, 'Quick Help / FAQs')
+        token = str(second.context['csrf_token'])
+        self.assertNotEqual(str(first.context['csrf_token']), token)
+        self.assertContains(second, f'value="{token}"')
+
+
+class BuildingSearchTests(TestCase):
+    def setUp(self):
+        building_search.invalidate()
+        BuildingInfo.objects.all().delete()
+        for name, description in [
+            ('Library', 'Main library with study areas and computer lab'),
+            ('Science Laboratory', 'Chemistry and physics labs'),
+            ('Canteen 1', 'Main cafeteria serving meals and snacks'),
+        ]:
+            BuildingInfo.objects.create(name=name, description=description)
+
+    def names(self, query):
+        return [result['name'] for result in building_search.search(query)]
+
+    def test_name_matches_rank_first(self):
+        # A name prefix outranks an exact description match
+        self.assertEqual(self.names('lab'), ['Science Laboratory', 'Library'])
+        self.assertEqual(self.names('library')[0], 'Library')
+
+    def test_prefix_and_multi_token_matching(self):
+        self.assertEqual(self.names('lib'), ['Library'])
+        self.assertEqual(self.names('main caf'), ['Canteen 1'])
+        self.assertEqual(self.names('nothing here'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.names('lib')
+        with self.captureOnCommitCallbacks(execute=True):
+            building = BuildingInfo.objects.create(name='Clinic', description='School health clinic')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names('clinic'), ['Clinic'])
+        with self.captureOnCommitCallbacks(execute=True):
+            building.delete()
+        self.assertEqual(self.names('clinic'), [])
+
+    def test_search_api(self):
+        response = self.client.get(reverse('search_api'), {'q': 'canteen'})
+        data = response.json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['name'], 'Canteen 1')
+
+    def test_index_remove_cleans_vocabulary(self):
+        index = SearchIndex()
+        index.add(1, {'name': 'Gym'}, {'name': 'Gym'})
+        index.remove(1)
+        self.assertEqual(index.vocabulary, [])
+        self.assertEqual(index.postings, {})
+
+
+class FuzzySearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        fuzzy_search.invalidate()
+        BuildingInfo.objects.all().delete()
+        for name in ['Library', 'Science Laboratory', 'Canteen 1']:
+            BuildingInfo.objects.create(name=name)
+
+    def labels(self, query):
+        return [result['label'] for result in fuzzy_search.search(query)]
+
+    def test_typos_and_abbreviations(self):
+        self.assertEqual(self.labels('libary')[0], 'Library')
+        self.assertEqual(self.labels('scince labortory')[0], 'Science Laboratory')
+        self.assertEqual(self.labels('sci lab')[0], 'Science Laboratory')
+        self.assertEqual(self.labels('xyzzy'), [])
+
+    def test_sections_point_to_their_building(self):
+        result = fuzzy_search.search('registar')[0]
+        self.assertEqual(result['kind'], 'section')
+        self.assertEqual(result['building'], 'Admin Office')
+
+    def test_index_follows_building_changes(self):
+        self.labels('clinic')
+        with self.captureOnCommitCallbacks(execute=True):
+            BuildingInfo.objects.create(name='Gymnasium')
+        self.assertEqual(self.labels('gymnasim')[0], 'Gymnasium')
+
+    def test_edit_distance_counts_transpositions_once(self):
+        self.assertEqual(edit_distance('clinic', 'clinci', 2), 1)
+        self.assertEqual(edit_distance('canteen', 'library', 2), 3)
+
+    def test_candidates_are_bounded(self):
+        index = TrigramIndex()
+        for number in range(500):
+            index.add(f'Room {number}', {'label': number})
+        self.assertLessEqual(len(index._candidates({'  r', ' ro', 'roo', 'oom', 'om '})), 64)
+
+    def test_fuzzy_search_api(self):
+        response = self.client.get(reverse('fuzzy_search_api'), {'q': 'canten', 'limit': 'x'})
+        data = response.json()
+        self.assertEqual(data['results'][0]['building'], 'Canteen 1')
+
+
+class BuildingCatalogueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        building_catalogue.invalidate()
+        BuildingInfo.objects.all().delete()
+        BuildingInfo.objects.create(name='Library', description='Main library', operating_hours='8-5')
+        BuildingInfo.objects.create(name='Gymnasium')
+
+    def get(self, **headers):
+        return self.client.get(reverse('building_catalogue'), headers=headers)
+
+    def test_catalogue_merges_map_data_and_building_info(self):
+        buildings = {building['name']: building for building in self.get().json()}
+        library = buildings['Library']
+        self.assertEqual(library['description'], 'Main library')
+        self.assertEqual(library['operatingHours'], '8-5')
+        self.assertEqual(library['details']['sections'], ['Research Nook', 'Quiet Study'])
+        self.assertTrue(library['mapped'])
+        self.assertFalse(buildings['Gymnasium']['mapped'])
+        self.assertIsNone(buildings['Canteen 2']['id'])
+
+    def test_matching_etag_gets_304_without_queries(self):
+        response = self.get()
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+        with self.assertNumQueries(0):
+            revalidated = self.get(if_none_match=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.content, b'')
+
+    def test_gzip_body(self):
+        response = self.get(accept_encoding='deflate, gzip;q=0.8')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))[0]['name'], 'Library')
+        # The identity ETag still revalidates the gzip representation
+        plain = self.get()
+        self.assertNotEqual(plain['ETag'], response['ETag'])
+        self.assertEqual(self.get(accept_encoding='gzip', if_none_match=plain['ETag']).status_code, 304)
+        self.assertEqual(accepted_encodings('gzip;q=0, br'), {'br'})
+
+    def test_edits_change_the_etag(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            BuildingInfo.objects.filter(name='Library').get().save()
+        self.assertEqual(self.get(if_none_match=etag).status_code, 304)
+        building = BuildingInfo.objects.get(name='Library')
+        building.description = 'Renovated library'
+        with self.captureOnCommitCallbacks(execute=True):
+            building.save()
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['description'], 'Renovated library')
+
+    def test_script_sets_window_buildings(self):
+        response = self.client.get(reverse('building_catalogue_script'))
+        self.assertTrue(response.content.startswith(b'window.buildings = window.buildingsData = ['))
+
+
+class RoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        campus_router.invalidate()
+        # Library -> junction -> Clinic is shorter than the detour through the gym
+        self.library = WalkwayNode.objects.create(x=0, y=0, building='Library')
+        junction = WalkwayNode.objects.create(x=50, y=0)
+        self.clinic = WalkwayNode.objects.create(x=100, y=0, building='Clinic')
+        gym = WalkwayNode.objects.create(x=50, y=80, building='Gym')
+        for start, end in [(self.library, junction), (junction, self.clinic), (self.library, gym), (gym, self.clinic)]:
+            WalkwayEdge.objects.create(start=start, end=end)
+
+    def route(self, headers=None, **params):
+        return self.client.get(reverse('route_api'), params, headers=headers)
+
+    def test_route_between_buildings(self):
+        data = self.route(**{'from': 'library', 'to': 'Clinic'}).json()
+        self.assertEqual(data['to'], 'Clinic')
+        self.assertEqual(data['distance'], 100.0)
+        self.assertEqual(data['points'], [[0.0, 0.0], [50.0, 0.0], [100.0, 0.0]])
+
+    def test_precomputed_routes_need_no_queries_and_revalidate(self):
+        etag = self.route(**{'from': 'Library', 'to': 'Gym'})['ETag']
+        with self.assertNumQueries(0):
+            response = self.route(**{'from': 'Library', 'to': 'Gym'})
+            revalidated = self.route(headers={'if_none_match': etag}, **{'from': 'Library', 'to': 'Gym'})
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_route_from_point_uses_astar(self):
+        data = self.route(x=45, y=75, to='Clinic').json()
+        self.assertEqual(data['points'][0], [50.0, 80.0])
+        self.assertEqual(data['points'][-1], [100.0, 0.0])
+
+    def test_graph_edits_are_picked_up(self):
+        self.route(**{'from': 'Library', 'to': 'Clinic'})
+        WalkwayEdge.objects.create(start=self.library, end=self.clinic, length=10)
+        self.assertEqual(self.route(**{'from': 'Library', 'to': 'Clinic'}).json()['distance'], 10.0)
+
+    def test_missing_and_unreachable_routes(self):
+        WalkwayNode.objects.create(x=500, y=500, building='Annex')
+        self.assertEqual(self.route(**{'from': 'Library', 'to': 'Annex'}).status_code, 404)
+        self.assertEqual(self.route(to='Clinic').status_code, 400)
+        self.assertEqual(self.route().status_code, 400)
+
+    def test_astar_matches_dijkstra(self):
+        graph = WalkwayGraph()
+        for node_id in range(25):
+            graph.add_node(node_id, (node_id % 5) * 10, (node_id // 5) * 10)
+        for node_id in range(25):
+            if node_id % 5 < 4:
+                graph.add_edge(node_id, node_id + 1, 10 if node_id < 5 else 30)
+            if node_id < 20:
+                graph.add_edge(node_id, node_id + 5)
+        costs, _ = graph.shortest_paths(20)
+        cost, path = graph.astar(20, [24])
+        self.assertEqual(cost, costs[24])
+        self.assertEqual((path[0], path[-1]), (20, 24))
+
+    def test_astar_stays_optimal_with_edges_shorter_than_their_straight_line(self):
+        graph = WalkwayGraph()
+        graph.add_node('start', 0, 0)
+        graph.add_node('goal', 100, 0)
+        graph.add_node('detour', 0, 100)
+        graph.add_edge('start', 'goal')
+        graph.add_edge('start', 'detour', 10)
+        graph.add_edge('detour', 'goal', 10)
+        self.assertEqual(graph.astar('start', ['goal']), (20, ['start', 'detour', 'goal']))
+
+    def test_negative_lengths_are_rejected(self):
+        graph = WalkwayGraph()
+        graph.add_node('start', 0, 0)
+        graph.add_node('goal', 10, 0)
+        with self.assertRaises(ValueError):
+            graph.add_edge('start', 'goal', -1)
+        self.assertEqual(graph.heuristic_scale, 1.0)
+
+        edge = WalkwayEdge(start=self.library, end=self.clinic, length=-1)
+        with self.assertRaises(ValidationError):
+            edge.full_clean()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            edge.save()
+
+    def test_seed_walkways(self):
+        with self.assertRaises(CommandError):
+            call_command('seed_walkways', stdout=StringIO())
+        call_command('seed_walkways', '--replace', stdout=StringIO())
+        self.assertEqual(WalkwayNode.objects.exclude(building='').count(), 7)
+        data = self.route(**{'from': 'Library', 'to': 'Canteen 2'}).json()
+        self.assertEqual(data['to'], 'Canteen 2')
+
+
+class SpatialIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        spatial_index.invalidate()
+        BuildingInfo.objects.all().delete()
+
+    def test_nearby_buildings(self):
+        # Standing at the Library's coordinates
+        data = self.client.get(reverse('nearby_api'), {'lat': 11.551417, 'lng': 124.416917, 'k': 2}).json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['results'][0]['name'], 'Library')
+        self.assertEqual(data['results'][0]['distance'], 0.0)
+        self.assertEqual(data['results'][1]['name'], 'Caregiving')
+
+    def test_point_grid_matches_brute_force(self):
+        grid = PointGrid(cell=10)
+        points = [(11.55 + i * 0.0001, 124.41 + (i * 7 % 13) * 0.0001) for i in range(60)]
+        for index, (lat, lng) in enumerate(points):
+            grid.add(lat, lng, index)
+        expected = sorted(range(60), key=lambda i: haversine(11.553, 124.411, *points[i]))[:5]
+        self.assertEqual([item for _, item in grid.nearest(11.553, 124.411, 5)], expected)
+
+    def test_hit_test(self):
+        # Inside the Library's box (722, 577, 86, 34)
+        data = self.client.get(reverse('hit_api'), {'x': 760, 'y': 590}).json()
+        self.assertEqual([result['name'] for result in data['results']], ['Library'])
+        self.assertEqual(self.client.get(reverse('hit_api'), {'x': 5, 'y': 5}).json()['count'], 0)
+        self.assertEqual(self.client.get(reverse('hit_api'), {'x': 'left'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('hit_api'), {'x': 'nan', 'y': 5}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('hit_api'), {'x': 5, 'y': 1e9}).status_code, 400)
+
+    def test_nearby_rejects_positions_far_from_campus(self):
+        for lat, lng in (('nan', 124.4), (11.55, 'inf'), (0, 0), (91, 124.4), (11.7, 124.4)):
+            response = self.client.get(reverse('nearby_api'), {'lat': lat, 'lng': lng})
+            self.assertEqual(response.status_code, 400, (lat, lng))
+
+    def test_point_grid_search_radius_is_capped(self):
+        grid = PointGrid(cell=10)
+        grid.add(11.55, 124.41, 'near')
+        grid.add(11.60, 124.41, 'far')
+        # The far point is about 5.5 km north, beyond the search radius
+        self.assertEqual([item for _, item in grid.nearest(11.55, 124.41, 2, radius=1000)], ['near'])
+        self.assertTrue(grid.covers(11.56, 124.41))
+        self.assertFalse(grid.covers(11.70, 124.41, padding=1000))
+
+    def test_index_follows_catalogue_changes(self):
+        self.assertIsNone(spatial_index.hit(760, 590)[0]['id'])
+        with self.captureOnCommitCallbacks(execute=True):
+            building = BuildingInfo.objects.create(name='Library', description='Main library')
+        self.assertEqual(spatial_index.hit(760, 590)[0]['id'], building.id)
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.all().delete()
+        self.student = User.objects.create_user('student', password='pass')
+        self.client.force_login(self.student)
+        self.url = reverse('notifications_api', args=[self.student.id])
+
+    def test_notifications_feed_with_cursor(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = notify(self.student, 'Room changed', 'Math moved to Room 2')
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['cursor'], first.id)
+        self.assertEqual(data['notifications'][0]['title'], 'Room changed')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second = notify(self.student, 'Class cancelled')
+        data = self.client.get(self.url, {'since': first.id}).json()
+        self.assertEqual([item['id'] for item in data['notifications']], [second.id])
+
+    def test_backlog_is_delivered_oldest_first_a_page_at_a_time(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ids = [notify(self.student, f'Update {number}').id for number in range(feeds.PAGE_SIZE + 5)]
+        data = self.client.get(self.url, {'since': 0}).json()
+        self.assertEqual([item['id'] for item in data['notifications']], ids[:feeds.PAGE_SIZE])
+        self.assertEqual((data['cursor'], data['has_more']), (ids[feeds.PAGE_SIZE - 1], True))
+        data = self.client.get(self.url, {'since': data['cursor']}).json()
+        self.assertEqual([item['id'] for item in data['notifications']], ids[feeds.PAGE_SIZE:])
+        self.assertEqual((data['cursor'], data['has_more']), (ids[-1], False))
+
+    def test_unchanged_feed_gets_304_from_the_cache(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['cursor'], 0)
+        # Session and user per request; the cursor comes from the cache
+        with self.assertNumQueries(4):
+            self.assertEqual(self.client.get(self.url, {'since': 0}).status_code, 304)
+            revalidated = self.client.get(self.url, headers={'if_none_match': response['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+    @override_settings(CHANGE_FEEDS={'MAX_WAIT': 0.3, 'CHECK_INTERVAL': 0.05})
+    def test_long_poll_times_out_or_returns_new_cursor(self):
+        self.assertEqual(notification_feed.wait(self.student.id, 0, timeout=5), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = notify(self.student, 'Hello')
+        self.assertEqual(notification_feed.wait(self.student.id, 0, timeout=5), notification.id)
+        response = self.client.get(self.url, {'since': notification.id, 'wait': 5})
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(CHANGE_FEEDS={'MAX_WAIT': 0.3}, WEB_THREADS=8)
+    def test_wait_is_clamped_and_waiters_stay_below_the_thread_count(self):
+        for value, expected in (('nan', 0), ('inf', 0), ('-3', 0), ('soon', 0), ('0.1', 0.1), ('60', 0.3)):
+            self.assertEqual(clamp_wait(value), expected, value)
+        self.assertEqual(feeds.get_config()['MAX_WAITERS'], 2)
+
+    def test_other_users_notifications_are_private(self):
+        other = User.objects.create_user('other', password='pass')
+        response = self.client.get(reverse('notifications_api', args=[other.id]))
+        self.assertEqual(response.status_code, 403)
+
+    def test_schedule_updates_feed(self):
+        section = Section.objects.create(name='10-Newton', grade_level=10, academic_year=current_academic_year())
+        url = reverse('schedule_updates_api', args=[section.id])
+        self.assertIsNone(self.client.get(url).json()['schedules_last_updated'])
+        with self.captureOnCommitCallbacks(execute=True):
+            change = record_schedule_change(section.id, 'updated', 'Science moved to 2 PM')
+        data = self.client.get(url, {'since': 0}).json()
+        self.assertEqual(data['cursor'], change.id)
+        self.assertEqual(data['changes'][0]['description'], 'Science moved to 2 PM')
+        self.assertIsNotNone(data['schedules_last_updated'])
+
+
+class TimetableTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        timetable.invalidate()
+        User.objects.all().delete()
+        self.year = current_academic_year()
+        self.teacher = User.objects.create_user('teacher', password='pass', is_staff=True)
+        self.student = User.objects.create_user('student', password='pass')
+        self.math = Subject.objects.create(code='MATH101', name='Mathematics')
+        self.science = Subject.objects.create(code='SCI101', name='Science')
+        self.newton = Section.objects.create(name='10-Newton', grade_level=10, academic_year=self.year)
+        self.einstein = Section.objects.create(name='11-Einstein', grade_level=11, academic_year=self.year)
+        self.room101 = Room.objects.create(building='Library', room_number='101')
+        self.room102 = Room.objects.create(building='Library', room_number='102')
+        self.lab = Room.objects.create(building='Caregiving', room_number='Lab 1')
+
+    def add(self, subject, section, room, day='monday', time_slot='07:30-08:30', **fields):
+        fields.setdefault('academic_year', self.year)
+        return Schedule.objects.create(
+            subject=subject, teacher=self.teacher, section=section, room=room, day=day, time_slot=time_slot, **fields,
+        )
+
+    def test_timeline_lookups(self):
+        timeline = Timeline([(540, 600, 'b'), (450, 510, 'a'), (540, 600, 'c')])
+        self.assertEqual(timeline.at(449), [])
+        self.assertEqual(timeline.at(450), ['a'])
+        self.assertEqual(timeline.at(510), [])
+        # A double booking keeps both occupants
+        self.assertEqual(timeline.at(599), ['b', 'c'])
+        self.assertEqual(timeline.upcoming(520), ['b', 'c'])
+        self.assertEqual(timeline.free_until(520), 540)
+
+    def test_section_and_room_lookups(self):
+        self.add(self.math, self.newton, self.room101)
+        self.add(self.science, self.newton, self.lab, time_slot='08:30-09:30')
+        self.add(self.science, self.einstein, self.room101, time_slot='08:30-09:30', academic_year='2000-2001')
+        index = timetable.ensure_current()
+
+        found = index.section_at(self.newton.id, 'monday', 8 * 60)
+        self.assertEqual(found['current']['room'], '101')
+        self.assertEqual(found['current']['building'], 'Library')
+        self.assertEqual(found['next']['subject'], 'Science')
+        self.assertEqual(index.section_at(self.newton.id, 'tuesday', 8 * 60), {'current': None, 'next': None})
+
+        occupied = index.room_at(self.room101.id, 'monday', 7 * 60 + 45)
+        self.assertEqual([entry['section'] for entry in occupied['occupants']], ['10-Newton'])
+        # Schedules from another academic year are not indexed
+        self.assertEqual(index.room_at(self.room101.id, 'monday', 9 * 60)['occupants'], [])
+        self.assertIsNone(index.room_at(0, 'monday', 0))
+
+    def test_free_rooms_in_a_building(self):
+        self.add(self.math, self.newton, self.room101)
+        self.add(self.science, self.einstein, self.room102)
+        self.add(self.science, self.einstein, self.room102, time_slot='08:30-09:30')
+        index = timetable.ensure_current()
+
+        found = index.free_rooms('library', 'monday', 7 * 60)
+        self.assertEqual(found['available_at'], '07:00')
+        self.assertEqual([room['room'] for room in found['rooms']], ['101', '102'])
+        self.assertEqual(found['rooms'][0]['free_until'], '07:30')
+
+        # Both rooms busy: 101 is the first to free up
+        found = index.free_rooms('Library', 'monday', 8 * 60)
+        self.assertEqual(found['available_at'], '08:30')
+        self.assertEqual([room['room'] for room in found['rooms']], ['101'])
+        self.assertIsNone(found['rooms'][0]['free_until'])
+        self.assertIsNone(index.free_rooms('Nowhere', 'monday', 8 * 60))
+
+    def test_schedule_changes_reach_the_index_and_the_feed(self):
+        self.assertEqual(timetable.ensure_current().section_at(self.newton.id, 'monday', 8 * 60)['current'], None)
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule = self.add(self.math, self.newton, self.room101)
+        self.assertEqual(timetable.ensure_current().section_at(self.newton.id, 'monday', 8 * 60)['current']['id'], schedule.id)
+        change = ScheduleChange.objects.get(section_id=self.newton.id)
+        self.assertEqual(change.kind, 'added')
+        self.newton.refresh_from_db()
+        self.assertIsNotNone(self.newton.schedules_last_updated)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule.delete()
+        self.assertEqual(ScheduleChange.objects.filter(section_id=self.newton.id).first().kind, 'deleted')
+
+    def test_enrolled_students_are_notified_of_schedule_changes(self):
+        StudentEnrollment.objects.create(student=self.student, section=self.newton, academic_year=self.year)
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule = self.add(self.math, self.newton, self.room101)
+            schedule.room = self.room102
+            schedule.save()
+            # Another section's classes are not theirs
+            self.add(self.science, self.einstein, self.lab)
+        notifications = list(Notification.objects.filter(recipient=self.student).order_by('id'))
+        self.assertEqual([notification.kind for notification in notifications], ['schedule_added', 'schedule_updated'])
+        self.assertEqual(notifications[0].title, 'Class added: Mathematics')
+        self.assertEqual(notifications[0].metadata, {'schedule_id': schedule.id, 'section_id': self.newton.id})
+        self.assertEqual(notification_feed.cursor(self.student.id), notifications[-1].id)
+
+    def test_non_numeric_ids_are_bad_requests(self):
+        self.client.force_login(self.teacher)
+        for data in [
+            {'form_type': 'section', 'delete_section_id': 'abc'},
+            {'form_type': 'schedule', 'delete_schedule_id': '1 OR 1=1'},
+            {'form_type': 'schedule', 'schedule_id': 'x'},
+        ]:
+            self.assertEqual(self.client.post(reverse('schedule'), data).status_code, 400)
+
+    def test_subject_and_teacher_renames_reach_the_index(self):
+        self.add(self.math, self.newton, self.room101)
+        timetable.ensure_current()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.math.name = 'Algebra'
+            self.math.save()
+            self.teacher.first_name, self.teacher.last_name = 'Ada', 'Lovelace'
+            self.teacher.save()
+        current = timetable.ensure_current().section_at(self.newton.id, 'monday', 8 * 60)['current']
+        self.assertEqual((current['subject'], current['teacher']), ('Algebra', 'Ada Lovelace'))
+
+        # Logging in saves last_login alone and leaves the index be
+        version = get_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_login(self.teacher)
+        self.assertEqual(get_version(), version)
+
+    def test_deleting_a_section_leaves_no_changes_behind(self):
+        self.add(self.math, self.newton, self.room101)
+        self.newton.delete()
+        self.assertFalse(ScheduleChange.objects.exists())
+        self.assertIsNone(timetable.ensure_current().section_at(self.newton.id, 'monday', 8 * 60)['current'])
+
+    def test_timetable_api(self):
+        self.add(self.math, self.newton, self.room101)
+        self.client.force_login(self.student)
+        data = self.client.get(
+            reverse('section_timetable_api', args=[self.newton.id]), {'day': 'monday', 'at': '7:45'},
+        ).json()
+        self.assertEqual(data['current']['room_id'], self.room101.id)
+        self.assertEqual(data['time'], '07:45')
+
+        data = self.client.get(reverse('room_timetable_api', args=[self.room101.id]), {'day': 'monday', 'at': '8:00'}).json()
+        self.assertEqual(data['occupants'][0]['subject'], 'Mathematics')
+        self.assertEqual(self.client.get(reverse('room_timetable_api', args=[0])).status_code, 404)
+
+        url = reverse('free_rooms_api')
+        data = self.client.get(url, {'building': 'Library', 'day': 'monday', 'at': '08:00'}).json()
+        self.assertEqual([room['room'] for room in data['rooms']], ['102'])
+        self.assertEqual(self.client.get(url, {'building': 'Library', 'at': 'noon'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'building': 'Library', 'day': 'someday'}).status_code, 400)
+
+    def test_schedule_page(self):
+        self.add(self.math, self.newton, self.room101)
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('schedule'))
+        self.assertIsNone(response.context['section'])
+
+        response = self.client.post(reverse('schedule'), {
+            'form_type': 'student_section', 'section': self.newton.id, 'academic_year': self.year,
+        })
+        self.assertRedirects(response, reverse('schedule'))
+        response = self.client.get(reverse('schedule'))
+        self.assertEqual(response.context['section'], self.newton)
+        monday = dict(response.context['schedule_days'])['monday']
+        self.assertEqual([entry.subject.name for entry in monday], ['Mathematics'])
+        self.assertContains(response, '?building=Library')
+
+    def test_teacher_adds_a_schedule(self):
+        self.client.force_login(self.teacher)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('schedule'), {
+                'form_type': 'schedule', 'subject': self.science.id, 'section': self.einstein.id,
+                'room': self.lab.id, 'day': 'friday', 'time_slot': '13:30-14:30', 'academic_year': self.year,
+            })
+        self.assertRedirects(response, reverse('schedule'))
+        schedule = Schedule.objects.get(section=self.einstein)
+        self.assertEqual(schedule.teacher, self.teacher)
+        self.assertEqual(timetable.ensure_current().room_at(self.lab.id, 'friday', 14 * 60)['occupants'][0]['id'], schedule.id)
+
+        # The same section cannot be booked twice in one slot
+        response = self.client.post(reverse('schedule'), {
+            'form_type': 'schedule', 'subject': self.math.id, 'section': self.einstein.id,
+            'day': 'friday', 'time_slot': '13:30-14:30', 'academic_year': self.year,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors)
+
+    def test_free_rooms_across_campus_for_the_map(self):
+        self.add(self.math, self.newton, self.room101)
+        self.add(self.science, self.einstein, self.lab)
+        self.client.force_login(self.student)
+        data = self.client.get(reverse('free_rooms_api'), {'day': 'monday', 'at': '08:00'}).json()
+        self.assertEqual(data['buildings'], [
+            {'building': 'Library', 'rooms': [timetable.ensure_current().rooms[self.room102.id]]},
+        ])
+
+    def test_sweep_reports_each_double_booking(self):
+        self.add(self.math, self.newton, self.room101)
+        # Same room and same teacher as the class above
+        self.add(self.science, self.einstein, self.room101)
+        self.add(self.science, self.einstein, self.lab, time_slot='08:30-09:30')
+        conflicts = find_conflicts(list(timetable.ensure_current().intervals))
+        self.assertEqual([(found['kind'], found['resource']) for found in conflicts], [
+            ('room', 'Library 101'), ('teacher', 'teacher'),
+        ])
+        self.assertEqual(conflicts[0]['start'], '07:30')
+        self.assertEqual({booking['section'] for booking in conflicts[0]['bookings']}, {'10-Newton', '11-Einstein'})
+
+        out = StringIO()
+        call_command('check_timetable', stdout=out)
+        self.assertIn('2 conflicts', out.getvalue())
+
+    def test_edits_that_double_book_a_room_are_rejected(self):
+        other = User.objects.create_user('other', password='pass', is_staff=True)
+        self.add(self.math, self.newton, self.room101)
+        clash = Schedule(subject=self.science, teacher=other, section=self.einstein, room=self.room101,
+                         day='monday', time_slot='07:30-08:30', academic_year=self.year)
+        with self.assertRaisesMessage(ValidationError, 'Room Library 101 is already booked on Monday 07:30-08:30'):
+            clash.full_clean()
+        clash.room = self.room102
+        clash.full_clean()
+
+        # Saving a schedule again does not clash with itself
+        existing = Schedule.objects.get(section=self.newton)
+        existing.full_clean()
+
+    def test_validate_a_term_timetable_in_one_pass(self):
+        self.add(self.math, self.newton, self.room101)
+        upload = [
+            Schedule(subject=self.science, teacher=self.teacher, section=self.einstein, room=self.lab,
+                     day='monday', time_slot='08:30-09:30', academic_year=self.year),
+            Schedule(subject=self.math, teacher=self.teacher, section=self.einstein, room=self.room102,
+                     day='monday', time_slot='07:30-08:30', academic_year=self.year),
+        ]
+        conflicts = validate_timetable(upload, self.year)
+        self.assertEqual([found['kind'] for found in conflicts], ['teacher'])
+        self.assertCountEqual([booking.get('row') for booking in conflicts[0]['bookings']], [None, 2])
+        # As a replacement for the whole term, the stored class no longer counts
+        self.assertEqual(validate_timetable(upload, self.year, replace=True), [])
+
+    def test_conflict_report_is_for_staff(self):
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(reverse('timetable_conflicts_api')).status_code, 403)
+        self.client.force_login(self.teacher)
+        data = self.client.get(reverse('timetable_conflicts_api')).json()
+        self.assertEqual((data['academic_year'], data['count']), (self.year, 0))
+        for academic_year in ['anything', '2024-2026', '2024/2025']:
+            response = self.client.get(reverse('timetable_conflicts_api'), {'academic_year': academic_year})
+            self.assertEqual(response.status_code, 400)
+
+    def test_only_the_current_and_next_year_are_kept(self):
+        start = int(self.year[:4])
+        for academic_year in [f'{start - 1}-{start}', self.year, f'{start + 1}-{start + 2}', f'{start - 5}-{start - 4}']:
+            timetable.ensure_current(academic_year)
+        self.assertEqual(set(timetable._indexes), {self.year, f'{start + 1}-{start + 2}'})
+
+    def test_schedule_form_checks_the_academic_year(self):
+        data = {
+            'subject': self.math.id, 'section': self.newton.id, 'room': self.room101.id,
+            'day': 'monday', 'time_slot': '07:30-08:30',
+        }
+        self.assertIn('academic_year', ScheduleForm(dict(data, academic_year='next year')).errors)
+        self.assertNotIn('academic_year', ScheduleForm(dict(data, academic_year=self.year)).errors)
+
+    def test_section_and_enrollment_forms_check_the_academic_year(self):
+        cases = [
+            (SectionForm, {'name': '12-Curie', 'grade_level': 12, 'is_active': True}),
+            (EnrollmentForm, {'section': self.newton.id}),
+        ]
+        for form_class, data in cases:
+            with self.subTest(form=form_class.__name__):
+                self.assertIn('academic_year', form_class(dict(data, academic_year='2024')).errors)
+                self.assertNotIn('academic_year', form_class(dict(data, academic_year=self.year)).errors)
+
+
+def csv_file(text):
+    return StringIO(text.strip() + '\n')
+
+
+class BulkImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        timetable.invalidate()
+        User.objects.all().delete()
+        self.year = current_academic_year()
+        self.teacher = User.objects.create_user('teacher', password='pass', is_staff=True)
+        self.math = Subject.objects.create(code='MATH101', name='Mathematics')
+        self.science = Subject.objects.create(code='SCI101', name='Science')
+        self.newton = Section.objects.create(name='10-Newton', grade_level=10, academic_year=self.year)
+        self.room101 = Room.objects.create(building='Library', room_number='101')
+
+    def test_buildings_are_looked_up_once_per_chunk(self):
+        BuildingInfo.objects.create(name='Library', description='Old')
+        file = csv_file("""
+name,description
+Library,Books and study rooms
+Clinic,First aid
+,Nameless
+Clinic,Again
+Canteen,Food
+""")
+        with CaptureQueriesContext(connection) as queries:
+            summary = BuildingImporter(CHUNK_SIZE=2).run(file, 'buildings.csv')
+        self.assertEqual((summary['rows'], summary['created'], summary['updated']), (5, 2, 1))
+        self.assertEqual([line for line, _ in summary['errors']], [4, 5])
+        self.assertEqual(BuildingInfo.objects.get(name='Library').description, 'Books and study rooms')
+        # One lookup per chunk, no per-row exists()
+        lookups = [query for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(len(lookups), 3)
+
+    def test_dry_run_writes_nothing(self):
+        summary = BuildingImporter(dry_run=True).run(csv_file('name\nClinic'), 'buildings.csv')
+        self.assertEqual(summary['created'], 1)
+        self.assertFalse(BuildingInfo.objects.filter(name='Clinic').exists())
+
+    def test_users_are_created_with_preferences_and_enrollments(self):
+        file = csv_file(f"""
+username,email,first_name,section,academic_year
+ana,ana@example.com,Ana,10-Newton,{self.year}
+ben,not-an-email,Ben,,
+cy,,Cy,12-Missing,
+""")
+        summary = UserImporter().run(file, 'users.csv')
+        self.assertEqual((summary['created'], summary['enrolled']), (1, 1))
+        self.assertEqual([line for line, _ in summary['errors']], [3, 4])
+        ana = User.objects.get(username='ana')
+        self.assertFalse(ana.has_usable_password())
+        self.assertTrue(UserPreferences.objects.filter(user=ana).exists())
+        self.assertEqual(StudentEnrollment.objects.get(student=ana).section, self.newton)
+
+    def test_schedules_skip_double_bookings(self):
+        Section.objects.create(name='11-Einstein', grade_level=11, academic_year=self.year)
+        file = csv_file("""
+subject,section,teacher,day,time_slot,building,room
+MATH101,10-Newton,teacher,Monday,7:30 - 8:30,Library,101
+SCI101,11-Einstein,teacher,monday,07:30-08:30,,
+SCI101,10-Newton,teacher,tuesday,08:30-09:30,library,101
+SCI101,10-Newton,nobody,friday,08:30-09:30,,
+""")
+        with self.captureOnCommitCallbacks(execute=True):
+            summary = ScheduleImporter().run(file, 'schedules.csv')
+        self.assertEqual(summary['created'], 1)
+        self.assertEqual([line for line, _ in summary['errors']], [2, 3, 5])
+        self.assertIn('double-booked', summary['errors'][0][1])
+        self.assertEqual(Schedule.objects.get().day, 'tuesday')
+        self.assertEqual(ScheduleChange.objects.filter(section_id=self.newton.id).count(), 1)
+        self.assertEqual(timetable.room_at(self.room101.id)['room']['room'], '101')
+
+    def test_command_reports_progress_and_errors(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as file:
+            file.write('name,description\nClinic,First aid\nGym,Sports\n,Nameless\n')
+        out = StringIO()
+        call_command('import_data', 'buildings', file.name, '--chunk-size', '2', stdout=out)
+        output = out.getvalue()
+        self.assertIn('2 rows read', output)
+        self.assertIn('Line 4: name is required', output)
+        self.assertEqual(BuildingInfo.objects.filter(name__in=['Clinic', 'Gym']).count(), 2)
+        with self.assertRaises(CommandError):
+            call_command('import_data', 'buildings', file.name.replace('.csv', '.txt'), stdout=StringIO())
+
+
+class UserProvisioningTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.all().delete()
+
+    def test_passwords_are_hashed_in_a_pool(self):
+        hashed = hash_passwords(['first', 'second', 'third'], WORKERS=2, MIN_POOL_SIZE=2)
+        self.assertTrue(User(password=hashed[1]).check_password('second'))
+        self.assertEqual(len(set(hashed)), 3)
+
+    def test_users_and_preferences_are_bulk_inserted(self):
+        User.objects.create_user('taken')
+        rows = [{'username': f'student{number}', 'first_name': 'Student'} for number in range(30)]
+        rows += [{'username': 'taken'}, {'username': 'withpass', 'password': 'secret-pass-1'}]
+        # The taken-username check, then one transaction with two inserts; no per-row saves
+        with self.assertNumQueries(5):
+            result = provision_users(rows, invite=True, MIN_POOL_SIZE=100)
+        self.assertEqual((len(result['created']), result['skipped']), (31, ['taken']))
+        self.assertEqual(UserPreferences.objects.filter(user__username__startswith='student').count(), 30)
+        self.assertTrue(User.objects.get(username='withpass').check_password('secret-pass-1'))
+        self.assertEqual(len(result['invites']), 30)
+
+    def test_invite_link_sets_the_password_once(self):
+        user = provision_users([{'username': 'ana'}], invite=True)['created'][0]
+        path = invite_path(user)
+        self.assertEqual(self.client.get(path).status_code, 200)
+        data = {'new_password1': 'Campus-map-2026', 'new_password2': 'Campus-map-2026'}
+        self.assertRedirects(self.client.post(path, data), reverse('home'), fetch_redirect_response=False)
+        self.assertTrue(User.objects.get(username='ana').check_password('Campus-map-2026'))
+        self.client.logout()
+        self.assertRedirects(self.client.get(path), reverse('login'), fetch_redirect_response=False)
+
+
+def png_upload(name, width, height):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGBA', (width, height), (255, 0, 0, 128)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = self.settings(MEDIA_ROOT=media_root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_upload_gets_webp_and_jpeg_widths_without_upscaling(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            building = BuildingInfo.objects.create(name='Gym', description='Sports', image=png_upload('gym.png', 700, 350))
+        variants = variants_for(building.image.name)
+        self.assertEqual([width for width, _ in variants['webp']], [320, 640, 700])
+        self.assertEqual([width for width, _ in variants['jpeg']], [320, 640, 700])
+        self.assertTrue(variants['jpeg'][0][1].endswith('gym__w320.jpg'))
+        self.assertTrue(building.image.storage.exists(variants['webp'][0][1]))
+
+        # Saving again without a new upload doesn't remake them
+        with mock.patch('mapapp.images.generate_derivatives') as generate:
+            with self.captureOnCommitCallbacks(execute=True):
+                building.save()
+        generate.assert_not_called()
+
+    def test_tags_emit_srcset_once_derivatives_exist(self):
+        template = Template(
+            '{% load images %}{% srcset building.image "50vw" %}|'
+            '{% responsive_image building.image sizes="50vw" alt=building.name %}'
+        )
+        building = BuildingInfo.objects.create(name='Gym', description='Sports', image=png_upload('gym.png', 400, 200))
+        # Not made yet: the plain original
+        self.assertEqual(template.render(Context({'building': building})), f'|<img src="{building.image.url}" alt="Gym">')
+
+        call_command('make_image_derivatives', stdout=StringIO())
+        self.assertEqual(ImageDerivative.objects.filter(source=building.image.name).count(), 4)
+        template.render(Context({'building': building}))
+        # Later renders read the cached lookup
+        with self.assertNumQueries(0):
+            html = template.render(Context({'building': building}))
+        self.assertIn('gym__w320.jpg 320w, ', html)
+        self.assertIn('sizes="50vw"', html)
+        self.assertIn('<source type="image/webp" srcset="/media/building_images/gym__w320.webp 320w', html)
+
+    def test_replacing_or_deleting_an_image_drops_its_derivatives(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            building = BuildingInfo.objects.create(name='Gym', description='Sports', image=png_upload('gym.png', 400, 200))
+        old_name = building.image.name
+        old_files = [name for _, name in variants_for(old_name)['webp']]
+
+        building = BuildingInfo.objects.get(pk=building.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            building.image = png_upload('pool.png', 400, 200)
+            building.save()
+        self.assertFalse(ImageDerivative.objects.filter(source=old_name).exists())
+        self.assertFalse(any(building.image.storage.exists(name) for name in old_files))
+        self.assertEqual(ImageDerivative.objects.filter(source=building.image.name).count(), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            building.delete()
+        self.assertFalse(ImageDerivative.objects.exists())
+
+    def test_failed_image_is_not_retried_on_every_save(self):
+        with mock.patch('mapapp.images.generate_derivatives', side_effect=OSError('truncated')) as generate, \
+                self.assertLogs('mapapp.images', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                building = BuildingInfo.objects.create(
+                    name='Gym', description='Sports', image=png_upload('gym.png', 400, 200),
+                )
+            with self.captureOnCommitCallbacks(execute=True):
+                building.save()
+        self.assertEqual(generate.call_count, 1)
+
+        # A new upload is tried again
+        with mock.patch('mapapp.images.generate_derivatives') as generate:
+            with self.captureOnCommitCallbacks(execute=True):
+                building.image = png_upload('gym.png', 400, 200)
+                building.save()
+        generate.assert_called_once()
+
+
+class CachedMediaStorageTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        self.remote = LocalRemoteStorage(location=f'{self.root}/remote', base_url='/media/remote/')
+        self.storage = self.make_storage()
+
+    def make_storage(self):
+        return CachedMediaStorage(
+            remote=self.remote, local=LocalRemoteStorage(location=f'{self.root}/blobs', base_url='/media/blobs/'),
+        )
+
+    def test_same_content_is_stored_and_uploaded_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.storage.save('posters/a.png', ContentFile(b'poster'))
+            second = self.storage.save('posters/b.png', ContentFile(b'poster'))
+        digest = MediaBlob.objects.get(name=first).digest
+        self.assertEqual(MediaBlob.objects.get(name=second).digest, digest)
+        self.assertEqual(len(os.listdir(f'{self.root}/remote/media/{digest[:2]}')), 1)
+        self.assertEqual(self.storage.url(first), f'/media/remote/media/{blob_name(digest, first)}')
+
+        # Deleting one name keeps the content the other still uses
+        self.storage.delete(first)
+        self.assertFalse(self.storage.exists(first))
+        with self.storage.open(second) as file:
+            self.assertEqual(file.read(), b'poster')
+
+    def test_url_points_at_the_local_copy_until_uploaded_and_is_cached(self):
+        name = self.storage.save('avatars/me.jpg', ContentFile(b'me'))
+        digest = MediaBlob.objects.get(name=name).digest
+        self.assertEqual(self.storage.url(name), f'/media/blobs/{blob_name(digest, name)}')
+        with self.assertNumQueries(0):
+            self.storage.url(name)
+        self.storage.upload(digest)
+        self.assertTrue(self.storage.url(name).startswith('/media/remote/media/'))
+
+    def test_missing_local_copy_is_refetched_from_the_remote_store(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            name = self.storage.save('buildings/gym.jpg', ContentFile(b'gym'))
+        # A fresh machine with an empty cache
+        for directory, _, files in os.walk(f'{self.root}/blobs'):
+            for filename in files:
+                os.remove(os.path.join(directory, filename))
+        with self.make_storage().open(name) as file:
+            self.assertEqual(file.read(), b'gym')
+
+    def test_new_upload_does_not_take_a_remote_only_name(self):
+        self.remote.save('profile_pictures/avatar.jpg', ContentFile(b'legacy'))
+        self.assertTrue(self.storage.exists('profile_pictures/avatar.jpg'))
+        name = self.storage.save('profile_pictures/avatar.jpg', ContentFile(b'new'))
+        self.assertNotEqual(name, 'profile_pictures/avatar.jpg')
+        with self.storage.open('profile_pictures/avatar.jpg') as file:
+            self.assertEqual(file.read(), b'legacy')
+
+    def test_benchmark_runs_without_network(self):
+        out = StringIO()
+        call_command('benchmark_media', files=5, size=128, latency=0, stdout=out)
+        self.assertIn('local cache', out.getvalue())
+        self.assertFalse(MediaBlob.objects.exists())
+
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        override = override_settings(MEDIA_ROOT=root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.body = bytes(range(256)) * 4
+        os.makedirs(os.path.join(root.name, 'poster_videos'))
+        with open(os.path.join(root.name, 'poster_videos', 'tour.mp4'), 'wb') as file:
+            file.write(self.body)
+        os.makedirs(os.path.join(root.name, 'activity_archive'))
+        with open(os.path.join(root.name, 'activity_archive', 'activity-2024-01.jsonl.gz'), 'wb') as file:
+            file.write(b'private')
+        self.url = '/media/poster_videos/tour.mp4'
+
+    def test_whole_file_advertises_ranges(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Length'], str(len(self.body)))
+        self.assertIn('max-age', response['Cache-Control'])
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.body[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.body)}')
+        self.assertEqual(response['Content-Length'], '10')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-6')
+        self.assertEqual(b''.join(response.streaming_content), self.body[-6:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.body)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.body)}')
+
+    @override_settings(MEDIA_SERVING={'MAX_RANGE': 100})
+    def test_open_ended_range_is_capped(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-')
+        self.assertEqual(b''.join(response.streaming_content), self.body[1000:])
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-')
+        self.assertEqual(response['Content-Range'], f'bytes 0-99/{len(self.body)}')
+        self.assertEqual(b''.join(response.streaming_content), self.body[:100])
+
+    def test_if_range_and_conditional_requests(self):
+        etag = self.client.head(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        # A changed file sends the whole new content instead of a range of it
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_private_and_missing_files_are_not_served(self):
+        for path in ('activity_archive/activity-2024-01.jsonl.gz', 'poster_videos/missing.mp4',
+                     'poster_videos', '../settings.py'):
+            self.assertEqual(self.client.get(f'/media/{path}').status_code, 404, path)
+
+    @override_settings(MEDIA_SERVING={'SENDFILE': 'x-accel-redirect', 'ACCEL_PREFIX': '/protected-media/'})
+    def test_hands_off_to_nginx(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/poster_videos/tour.mp4')
+        self.assertEqual(response.content, b'')
+
+
+def fake_ffmpeg(command, config):
+    """Stands in for ffprobe/ffmpeg: a 1280x720 probe, and placeholder output files"""
+    if 'ffprobe' in command[0]:
+        return json.dumps({'streams': [{'width': 1280, 'height': 720}], 'format': {'duration': '12.5'}}).encode()
+    for previous, argument in zip(command, command[1:]):
+        if argument.endswith(('.mp4', '.jpg')) and previous != '-i':
+            with open(argument, 'wb') as file:
+                file.write(os.path.basename(argument).encode())
+    return b''
+
+
+@mock.patch('mapapp.videos.binaries', lambda config: ('/usr/bin/ffmpeg', '/usr/bin/ffprobe'))
+class VideoTranscodingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = self.settings(MEDIA_ROOT=media_root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def upload(self, poster=None, name='tour.mp4'):
+        video = SimpleUploadedFile(name, b'raw phone video', content_type='video/mp4')
+        with self.captureOnCommitCallbacks(execute=True):
+            if poster is None:
+                return FindUsPoster.objects.create(title='Tour', video_file=video)
+            poster.video_file = video
+            poster.save()
+            return poster
+
+    def test_upload_is_replaced_by_renditions_without_upscaling(self):
+        with mock.patch('mapapp.videos.run', side_effect=fake_ffmpeg) as run:
+            poster = self.upload()
+        poster.refresh_from_db()
+        self.assertEqual(poster.video_status, 'ready')
+        self.assertEqual(poster.original_video.name, 'find_us_videos/tour.mp4')
+        self.assertEqual(poster.video_file.name, 'find_us_videos/tour__720p.mp4')
+        self.assertEqual(poster.video_poster.name, 'find_us_videos/tour__poster.jpg')
+        self.assertEqual([(r['width'], r['height']) for r in poster.video_renditions], [(640, 360), (1280, 720)])
+        # One ffmpeg run encodes every rendition
+        encode = run.call_args_list[1].args[0]
+        self.assertEqual(encode.count('-movflags'), 2)
+        self.assertTrue(poster.video_file.storage.exists('find_us_videos/tour__360p.mp4'))
+
+        html = self.client.get(reverse('about')).content.decode()
+        self.assertIn('poster="/media/find_us_videos/tour__poster.jpg"', html)
+        self.assertIn('<source src="/media/find_us_videos/tour__360p.mp4" type="video/mp4" media="(max-width: 640px)">', html)
+        self.assertIn('<source src="/media/find_us_videos/tour__720p.mp4" type="video/mp4">', html)
+
+    def test_failed_job_keeps_serving_the_upload(self):
+        with mock.patch('mapapp.videos.run', side_effect=RuntimeError('Invalid data found')), \
+                self.assertLogs('mapapp.videos', 'ERROR'):
+            poster = self.upload()
+        poster.refresh_from_db()
+        self.assertEqual(poster.video_status, 'failed')
+        self.assertEqual(poster.video_error, 'Invalid data found')
+        self.assertEqual(poster.video_file.name, 'find_us_videos/tour.mp4')
+        self.assertIn('<source src="/media/find_us_videos/tour.mp4"', self.client.get(reverse('about')).content.decode())
+
+        with mock.patch('mapapp.videos.run', side_effect=fake_ffmpeg):
+            call_command('transcode_videos', stdout=StringIO())
+        poster.refresh_from_db()
+        self.assertEqual(poster.video_status, 'ready')
+
+    def test_new_upload_resets_the_job_and_drops_old_renditions(self):
+        with mock.patch('mapapp.videos.run', side_effect=fake_ffmpeg):
+            poster = self.upload()
+            storage = poster.video_file.storage
+            self.assertTrue(storage.exists('find_us_videos/tour__360p.mp4'))
+            with mock.patch('mapapp.videos.queue_transcode') as queue:
+                poster = self.upload(FindUsPoster.objects.get(pk=poster.pk), name='campus.mp4')
+        queue.assert_called_once_with(poster.pk)
+        poster.refresh_from_db()
+        self.assertEqual(poster.video_status, 'pending')
+        self.assertEqual(poster.video_renditions, [])
+        self.assertFalse(storage.exists('find_us_videos/tour__360p.mp4'))
+        self.assertFalse(storage.exists('find_us_videos/tour__poster.jpg'))
+
+        # Saving without a new upload queues nothing
+        with mock.patch('mapapp.videos.queue_transcode') as queue:
+            with self.captureOnCommitCallbacks(execute=True):
+                poster.save()
+        queue.assert_not_called()
+
+
+class StaticAssetTests(TestCase):
+    def setUp(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        self.static_root = static_root.name
+        settings = self.settings(STATIC_ROOT=static_root.name, STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_hashed_files_are_served_precompressed_and_immutable(self):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+        url = staticfiles_storage.url('js/app.js')
+        self.assertRegex(url, r'^/static/js/app\.[0-9a-f]{12}\.js$')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_cache_keys_change_with_the_static_build(self):
+        static_build.cache_clear()
+        self.addCleanup(static_build.cache_clear)
+        request = RequestFactory().get('/about/')
+        key = page_key(request)
+        self.assertRegex(static_build(), r'^[0-9a-f]{12}$')
+        self.assertIn(static_build(), fragment_key('scripts', ['light']))
+
+        # A build with different files writes a different manifest
+        with open(os.path.join(self.static_root, 'staticfiles.json'), 'a') as manifest:
+            manifest.write(' ')
+        static_build.cache_clear()
+        self.assertNotEqual(page_key(request), key)
+
+    def test_check_fails_on_unhashed_references(self):
+        out = StringIO()
+        call_command('check_static_assets', stdout=out)
+        self.assertIn('all resolve to hashed files', out.getvalue())
+
+        templates = tempfile.TemporaryDirectory()
+        self.addCleanup(templates.cleanup)
+        with open(os.path.join(templates.name, 'page.html'), 'w') as file:
+            file.write("{% load static %}\n<script src=\"/static/js/app.js\"></script>\n<img src=\"{% static 'img/missing.png' %}\">\n")
+        out = StringIO()
+        with self.settings(TEMPLATES=[{'BACKEND': 'django.template.backends.django.DjangoTemplates', 'DIRS': [templates.name]}]):
+            with self.assertRaises(CommandError):
+                call_command('check_static_assets', stdout=out)
+        self.assertIn('page.html:2: hard-coded /static/js/app.js', out.getvalue())
+        self.assertIn('page.html:3: img/missing.png is not a collected static file', out.getvalue())
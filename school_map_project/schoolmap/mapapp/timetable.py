@@ -0,0 +1,334 @@
+"""Timetable lookups for the schedule page, the map and /api/timetable/.
+
+Each worker indexes an academic year's active schedules once per
+timetable version, the first time that year is asked about. Only the
+current and the next academic year are kept; any other year is indexed
+for the one lookup and dropped. For every
+day, each section's, room's and teacher's classes are kept as intervals
+sorted by start time, so "where is section X at T" and "who is in room R
+now" are one binary search. For each building the free rooms between
+consecutive class boundaries are worked out up front, along with where
+the next free room opens up, so "next free room in building B" is a
+binary search too. Schedule, Section and Room changes bump the shared
+version (see signals.py).
+"""
+import re
+import threading
+from bisect import bisect_left, bisect_right
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import DAY_CHOICES, Room, Schedule
+
+VERSION_KEY = 'timetable:version'
+DAYS = [day for day, _ in DAY_CHOICES]
+DAY_END = 24 * 60
+# The school year starts in June
+YEAR_START_MONTH = 6
+ACADEMIC_YEAR_RE = re.compile(r'^(\d{4})-(\d{4})$')
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def invalidate_timetable():
+    """Bump the version so every worker re-indexes the timetable"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, get_version() + 1, None)
+
+
+def current_academic_year(today=None):
+    today = today or timezone.localdate()
+    start = today.year if today.month >= YEAR_START_MONTH else today.year - 1
+    return f'{start}-{start + 1}'
+
+
+def is_academic_year(value):
+    """Whether value names an academic year, as in '2024-2025'"""
+    match = ACADEMIC_YEAR_RE.match(value or '')
+    return bool(match) and int(match.group(2)) == int(match.group(1)) + 1
+
+
+def kept_years(today=None):
+    """The academic years whose indexes each worker keeps: the current one and the next"""
+    current = current_academic_year(today)
+    start = int(current[:4]) + 1
+    return {current, f'{start}-{start + 1}'}
+
+
+def day_and_minute(moment=None):
+    """Weekday name and minutes since local midnight"""
+    moment = timezone.localtime(moment)
+    return DAYS[moment.weekday()], moment.hour * 60 + moment.minute
+
+
+def clock(minute):
+    return f'{minute // 60:02d}:{minute % 60:02d}'
+
+
+def parse_clock(value):
+    hours, minutes = value.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+class Timeline:
+    """One day's intervals for a section, room or teacher, sorted by start.
+
+    Time slots never partly overlap, so a double booking shows up as two
+    entries for the same interval and both are kept.
+    """
+
+    def __init__(self, intervals):
+        self.starts, self.ends, self.entries = [], [], []
+        for start, end, entry in sorted(intervals, key=lambda interval: interval[:2]):
+            if self.starts and self.starts[-1] == start and self.ends[-1] == end:
+                self.entries[-1].append(entry)
+                continue
+            self.starts.append(start)
+            self.ends.append(end)
+            self.entries.append([entry])
+
+    def at(self, minute):
+        """Entries whose interval contains the minute"""
+        index = bisect_right(self.starts, minute) - 1
+        if index >= 0 and minute < self.ends[index]:
+            return self.entries[index]
+        return []
+
+    def upcoming(self, minute):
+        """Entries of the first interval starting after the minute"""
+        index = bisect_right(self.starts, minute)
+        return self.entries[index] if index < len(self.starts) else []
+
+    def overlapping(self, start, end):
+        """Entries whose interval overlaps [start, end)"""
+        found = []
+        # Intervals don't partly overlap, so ends are sorted too and the scan stops early
+        index = bisect_left(self.starts, end) - 1
+        while index >= 0 and self.ends[index] > start:
+            found = self.entries[index] + found
+            index -= 1
+        return found
+
+    def free_until(self, minute):
+        index = bisect_right(self.starts, minute)
+        return self.starts[index] if index < len(self.starts) else DAY_END
+
+
+class BuildingDay:
+    """Free rooms of one building between each pair of class boundaries on one day"""
+
+    def __init__(self, room_ids, timelines):
+        boundaries = {0}
+        for room_id in room_ids:
+            timeline = timelines.get(room_id)
+            if timeline:
+                boundaries.update(timeline.starts)
+                boundaries.update(timeline.ends)
+        self.bounds = sorted(boundary for boundary in boundaries if boundary < DAY_END)
+        self.free = [
+            tuple(
+                room_id for room_id in room_ids
+                if room_id not in timelines or not timelines[room_id].at(bound)
+            )
+            for bound in self.bounds
+        ]
+        # Index of the first segment at or after each one with a free room
+        self.next_free = [None] * len(self.bounds)
+        following = None
+        for index in range(len(self.bounds) - 1, -1, -1):
+            if self.free[index]:
+                following = index
+            self.next_free[index] = following
+
+    def free_at(self, minute):
+        return self.free[bisect_right(self.bounds, minute) - 1]
+
+    def free_rooms(self, minute):
+        """(minute the rooms are free from, room ids), or None if nothing frees up today"""
+        index = self.next_free[bisect_right(self.bounds, minute) - 1]
+        if index is None:
+            return None
+        return max(minute, self.bounds[index]), self.free[index]
+
+
+def schedule_entry(schedule):
+    start, end = schedule.minutes
+    room = schedule.room
+    return {
+        'id': schedule.id,
+        'subject': schedule.subject.name,
+        'section': schedule.section.name,
+        'section_id': schedule.section_id,
+        'teacher': schedule.teacher.get_full_name() or schedule.teacher.username,
+        'teacher_id': schedule.teacher_id,
+        'room': room.room_number if room else None,
+        'room_id': schedule.room_id,
+        'building': room.building if room else None,
+        'day': schedule.day,
+        'start': clock(start),
+        'end': clock(end),
+    }
+
+
+def room_entry(room):
+    return {
+        'id': room.id,
+        'room': room.room_number,
+        'building': room.building,
+        'floor': room.floor,
+        'room_type': room.room_type,
+        'capacity': room.capacity,
+    }
+
+
+def load_schedules(academic_year):
+    return (
+        Schedule.objects.filter(academic_year=academic_year, is_active=True, section__is_active=True)
+        .select_related('subject', 'section', 'teacher', 'room')
+    )
+
+
+class TimetableIndex:
+    def __init__(self, schedules=(), rooms=()):
+        self.rooms = {room.id: room_entry(room) for room in rooms}
+        # lower-cased building name -> room ids in room number order
+        self.building_rooms = {}
+        for room in sorted(self.rooms.values(), key=lambda room: room['room']):
+            self.building_rooms.setdefault(room['building'].lower(), []).append(room['id'])
+
+        # Every (start, end, entry), for whole-timetable conflict checks
+        self.intervals = []
+        by_section, by_room, by_teacher = {}, {}, {}
+        for schedule in schedules:
+            start, end = schedule.minutes
+            interval = (start, end, schedule_entry(schedule))
+            self.intervals.append(interval)
+            by_section.setdefault((schedule.day, schedule.section_id), []).append(interval)
+            by_teacher.setdefault((schedule.day, schedule.teacher_id), []).append(interval)
+            if schedule.room_id is not None:
+                by_room.setdefault((schedule.day, schedule.room_id), []).append(interval)
+        self.sections = {key: Timeline(intervals) for key, intervals in by_section.items()}
+        self.room_timelines = {key: Timeline(intervals) for key, intervals in by_room.items()}
+        self.teacher_timelines = {key: Timeline(intervals) for key, intervals in by_teacher.items()}
+
+        self.buildings = {}
+        for day in DAYS:
+            timelines = {
+                room_id: timeline for (room_day, room_id), timeline in self.room_timelines.items()
+                if room_day == day
+            }
+            for building, room_ids in self.building_rooms.items():
+                self.buildings[(day, building)] = BuildingDay(room_ids, timelines)
+
+    def timeline(self, kind, day, key):
+        """The day's Timeline for a 'section', 'room' or 'teacher' id, or None"""
+        timelines = {
+            'section': self.sections,
+            'room': self.room_timelines,
+            'teacher': self.teacher_timelines,
+        }[kind]
+        return timelines.get((day, key))
+
+    def section_at(self, section_id, day, minute):
+        timeline = self.sections.get((day, section_id))
+        if timeline is None:
+            return {'current': None, 'next': None}
+        current = timeline.at(minute)
+        upcoming = timeline.upcoming(minute)
+        return {
+            'current': current[0] if current else None,
+            'next': upcoming[0] if upcoming else None,
+        }
+
+    def room_at(self, room_id, day, minute):
+        if room_id not in self.rooms:
+            return None
+        timeline = self.room_timelines.get((day, room_id))
+        return {
+            'room': self.rooms[room_id],
+            'occupants': list(timeline.at(minute)) if timeline else [],
+            'next': (timeline.upcoming(minute) or [None])[0] if timeline else None,
+        }
+
+    def free_rooms(self, building, day, minute):
+        """Rooms in the building that are free now, or the first ones to free up later today"""
+        building_day = self.buildings.get((day, building.lower()))
+        if building_day is None:
+            return None
+        found = building_day.free_rooms(minute)
+        if found is None:
+            return None
+        available_at, room_ids = found
+        rooms = []
+        for room_id in room_ids:
+            timeline = self.room_timelines.get((day, room_id))
+            free_until = timeline.free_until(available_at) if timeline else DAY_END
+            rooms.append(dict(self.rooms[room_id], free_until=clock(free_until) if free_until < DAY_END else None))
+        return {'available_at': clock(available_at), 'rooms': rooms}
+
+    def free_rooms_at(self, day, minute):
+        """Every building with a room free at the minute, and those rooms"""
+        found = []
+        for building, room_ids in self.building_rooms.items():
+            free = self.buildings[(day, building)].free_at(minute)
+            if free:
+                rooms = [self.rooms[room_id] for room_id in free]
+                found.append({'building': rooms[0]['building'], 'rooms': rooms})
+        found.sort(key=lambda item: item['building'])
+        return found
+
+
+class Timetable:
+    """Per-process indexes of the timetable, for the current and the next academic year"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._indexes = {}
+
+    def invalidate(self):
+        self._version = None
+
+    def ensure_current(self, academic_year=None):
+        academic_year = academic_year or current_academic_year()
+        version = get_version()
+        index = self._indexes.get(academic_year)
+        if self._version == version and index is not None:
+            return index
+        with self._lock:
+            if self._version != version:
+                self._indexes = {}
+                self._version = version
+            index = self._indexes.get(academic_year)
+            if index is None:
+                index = TimetableIndex(load_schedules(academic_year), Room.objects.all())
+                kept = kept_years()
+                if academic_year in kept:
+                    # Last year's index is dropped once the year rolls over
+                    self._indexes = {year: kept_index for year, kept_index in self._indexes.items() if year in kept}
+                    self._indexes[academic_year] = index
+            return index
+
+    def section_at(self, section_id, moment=None):
+        day, minute = day_and_minute(moment)
+        return self.ensure_current().section_at(section_id, day, minute)
+
+    def room_at(self, room_id, moment=None):
+        day, minute = day_and_minute(moment)
+        return self.ensure_current().room_at(room_id, day, minute)
+
+    def free_rooms(self, building, moment=None):
+        day, minute = day_and_minute(moment)
+        return self.ensure_current().free_rooms(building, day, minute)
+
+
+timetable = Timetable()
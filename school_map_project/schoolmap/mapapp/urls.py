@@ -14,4 +14,18 @@ urlpatterns = [
     path('register/', views.register, name='register'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
+    path('invite/<uidb64>/<token>/', views.accept_invite, name='accept_invite'),
+    path('api/search/', views.search_api, name='search_api'),
+    path('api/buildings/', views.building_catalogue_api, name='building_catalogue'),
+    path('api/buildings.js', views.building_catalogue_script, name='building_catalogue_script'),
+    path('api/search/fuzzy/', views.fuzzy_search_api, name='fuzzy_search_api'),
+    path('api/route/', views.route_api, name='route_api'),
+    path('api/nearby/', views.nearby_api, name='nearby_api'),
+    path('api/hit/', views.hit_api, name='hit_api'),
+    path('api/user/<int:user_id>/notifications/', views.notifications_api, name='notifications_api'),
+    path('api/sections/<int:section_id>/schedule-updates/', views.schedule_updates_api, name='schedule_updates_api'),
+    path('api/timetable/sections/<int:section_id>/', views.section_timetable_api, name='section_timetable_api'),
+    path('api/timetable/rooms/<int:room_id>/', views.room_timetable_api, name='room_timetable_api'),
+    path('api/timetable/free-rooms/', views.free_rooms_api, name='free_rooms_api'),
+    path('api/timetable/conflicts/', views.timetable_conflicts_api, name='timetable_conflicts_api'),
 ]
\ No newline at end of file
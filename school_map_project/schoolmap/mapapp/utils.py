@@ -1,3 +1,6 @@
+from django.utils import timezone
+
+from .activity_buffer import activity_buffer, get_config, write_activities
 from .models import ActivityLog
 
 def log_activity(user, action, description, request=None):
@@ -6,9 +9,16 @@ def log_activity(user, action, description, request=None):
     if request:
         ip_address = request.META.get('REMOTE_ADDR')
     
-    ActivityLog.objects.create(
+    activity = ActivityLog(
         user=user,
         action=action,
         description=description,
-        ip_address=ip_address
-    )
\ No newline at end of file
+        ip_address=ip_address,
+        timestamp=timezone.now()
+    )
+    # Buffered entries are written by a background thread in batches
+    if get_config()['ENABLED']:
+        activity_buffer.add(activity)
+    else:
+        write_activities([activity])
+    return activity
@@ -0,0 +1,293 @@
+"""Web-friendly renditions and a poster frame for uploaded FindUsPoster videos.
+
+Admins upload phone videos as they are, often hundreds of MB. Once a new
+video_file is saved, a job is queued on a small per-process thread pool.
+Each worker thread waits on ffmpeg, so WORKERS is how many videos are
+transcoded at once. The job decodes the upload once and encodes an H.264/AAC
+MP4 per rung of LADDER (short side in px, video kbps), with the moov atom
+up front so playback starts before the download ends. Videos are never
+upscaled. A short side below a rung gets one rendition at its own size
+instead. The job also grabs a JPEG poster frame.
+
+Job state is kept on the poster (video_status, video_error). When the job
+finishes, the upload moves to original_video and video_file points at the
+largest rendition, so existing links keep working. about.html lists every
+rendition as a <source> with a media query, and the poster frame as the
+<video> poster. Until then, or if the job fails, the upload is served as
+it is.
+"""
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .active_content import invalidate_active_content
+from .models import FindUsPoster
+from .page_cache import purge_page_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Without the pool, videos are transcoded inline when the save commits (tests)
+    'ASYNC': True,
+    'WORKERS': 1,
+    'FFMPEG': 'ffmpeg',
+    'FFPROBE': 'ffprobe',
+    # (short side in px, video kbps), smallest first
+    'LADDER': ((360, 800), (720, 2500), (1080, 5000)),
+    'AUDIO_BITRATE': '128k',
+    'PRESET': 'veryfast',
+    # Threads per ffmpeg process; 0 lets ffmpeg decide
+    'THREADS': 0,
+    # Seconds into the video for the poster frame, at most half its length
+    'POSTER_AT': 1.0,
+    # Seconds one ffmpeg run may take
+    'TIMEOUT': 3600,
+}
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+# Poster ids queued in this process and not yet done
+_pending = set()
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'VIDEO_TRANSCODING', {}))
+    return config
+
+
+def rendition_name(source, short_side):
+    root, _ = os.path.splitext(source)
+    return f'{root}__{short_side}p.mp4'
+
+
+def poster_name(source):
+    root, _ = os.path.splitext(source)
+    return f'{root}__poster.jpg'
+
+
+def binaries(config):
+    ffmpeg, ffprobe = shutil.which(config['FFMPEG']), shutil.which(config['FFPROBE'])
+    if not ffmpeg or not ffprobe:
+        raise RuntimeError('ffmpeg and ffprobe are required to transcode videos')
+    return ffmpeg, ffprobe
+
+
+def run(command, config):
+    result = subprocess.run(command, capture_output=True, timeout=config['TIMEOUT'])
+    if result.returncode != 0:
+        # The end of ffmpeg's log says what went wrong
+        raise RuntimeError(result.stderr.decode(errors='replace').strip()[-500:] or f'{command[0]} failed')
+    return result.stdout
+
+
+def probe(ffprobe, path, config):
+    """(width, height, duration in seconds) of a video as displayed, after any rotation"""
+    output = run([
+        ffprobe, '-v', 'error', '-select_streams', 'v:0', '-print_format', 'json',
+        '-show_entries', 'stream=width,height:stream_tags=rotate:stream_side_data=rotation:format=duration',
+        path,
+    ], config)
+    info = json.loads(output or b'{}')
+    streams = info.get('streams') or []
+    if not streams:
+        raise RuntimeError('The upload has no video stream')
+    stream = streams[0]
+    width, height = int(stream['width']), int(stream['height'])
+    rotation = stream.get('tags', {}).get('rotate') or next(
+        (side_data['rotation'] for side_data in stream.get('side_data_list', []) if 'rotation' in side_data), 0,
+    )
+    # Phones record portrait video as rotated landscape; ffmpeg applies the rotation
+    if abs(int(float(rotation))) % 180 == 90:
+        width, height = height, width
+    return width, height, float(info.get('format', {}).get('duration') or 0)
+
+
+def ladder(width, height, config):
+    """[(width, height, kbps)] to encode, smallest first, never larger than the source"""
+    short = min(width, height)
+    rungs = {}
+    for short_side, bitrate in config['LADDER']:
+        rungs.setdefault(min(short_side, short), bitrate)
+    sizes = []
+    for short_side, bitrate in sorted(rungs.items()):
+        # Even dimensions, as H.264 with 4:2:0 chroma needs
+        scaled = (round(width * short_side / short / 2) * 2, round(height * short_side / short / 2) * 2)
+        sizes.append((*scaled, bitrate))
+    return sizes
+
+
+def encode_command(ffmpeg, source, outputs, config):
+    """One ffmpeg run that decodes the source once and writes every rendition"""
+    command = [ffmpeg, '-y', '-v', 'error', '-i', source]
+    for path, (width, height, bitrate) in outputs:
+        command += [
+            '-map', '0:v:0', '-map', '0:a:0?',
+            '-vf', f'scale={width}:{height}', '-c:v', 'libx264', '-preset', config['PRESET'],
+            '-b:v', f'{bitrate}k', '-maxrate', f'{bitrate * 3 // 2}k', '-bufsize', f'{bitrate * 2}k',
+            '-pix_fmt', 'yuv420p', '-c:a', 'aac', '-b:a', config['AUDIO_BITRATE'],
+            '-threads', str(config['THREADS']), '-movflags', '+faststart', path,
+        ]
+    return command
+
+
+def save(storage, name, path):
+    # A re-run writes the same names; replace rather than get a suffixed copy
+    if storage.exists(name):
+        storage.delete(name)
+    with open(path, 'rb') as file:
+        return storage.save(name, File(file))
+
+
+def transcode(source, storage):
+    """Make the renditions and poster frame of one stored video; returns (renditions, poster frame name)"""
+    config = get_config()
+    ffmpeg, ffprobe = binaries(config)
+    with tempfile.TemporaryDirectory() as workdir:
+        # ffmpeg needs a local file, and the upload may live in a remote store
+        local = os.path.join(workdir, 'source' + os.path.splitext(source)[1].lower())
+        with storage.open(source) as file, open(local, 'wb') as copy:
+            for chunk in file.chunks():
+                copy.write(chunk)
+
+        width, height, duration = probe(ffprobe, local, config)
+        outputs = [
+            (os.path.join(workdir, f'{min(size[:2])}p.mp4'), size) for size in ladder(width, height, config)
+        ]
+        run(encode_command(ffmpeg, local, outputs, config), config)
+        frame = os.path.join(workdir, 'poster.jpg')
+        run([
+            ffmpeg, '-y', '-v', 'error', '-ss', str(min(config['POSTER_AT'], duration / 2)), '-i', local,
+            '-frames:v', '1', '-q:v', '3', frame,
+        ], config)
+
+        renditions = []
+        for path, (rendition_width, rendition_height, bitrate) in outputs:
+            name = save(storage, rendition_name(source, min(rendition_width, rendition_height)), path)
+            renditions.append({
+                'name': name, 'width': rendition_width, 'height': rendition_height, 'bitrate': bitrate,
+            })
+        return renditions, save(storage, poster_name(source), frame)
+
+
+def derived_files(poster):
+    """Names of files made from the poster's video, besides the upload itself"""
+    names = [rendition['name'] for rendition in poster.video_renditions or []]
+    return names + [name for name in (poster.video_poster.name, poster.original_video.name) if name]
+
+
+def delete_files(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.exception('Failed to delete %s', name)
+
+
+def transcode_poster(poster_id):
+    """Transcode one poster's video and point it at the renditions; returns them, or None"""
+    poster = FindUsPoster.objects.filter(pk=poster_id).first()
+    if poster is None or not poster.video_file:
+        return None
+    storage = poster.video_file.storage
+    source = poster.original_video.name or poster.video_file.name
+    # Only touch the row while it still has this video; an admin may upload another meanwhile
+    posters = FindUsPoster.objects.filter(pk=poster_id, video_file=poster.video_file.name)
+    posters.update(video_status='processing', video_error='')
+    try:
+        renditions, frame = transcode(source, storage)
+    except Exception as exc:
+        posters.update(video_status='failed', video_error=str(exc))
+        raise
+
+    names = [rendition['name'] for rendition in renditions] + [frame]
+    # update() sends no signals, so the upload isn't queued again
+    updated = posters.update(
+        original_video=source, video_file=renditions[-1]['name'], video_poster=frame,
+        video_renditions=renditions, video_status='ready', video_error='', video_processed_at=timezone.now(),
+    )
+    if not updated:
+        delete_files(storage, names)
+        return None
+    delete_files(storage, set(derived_files(poster)) - set(names) - {source})
+    invalidate_active_content()
+    purge_page_cache()
+    return renditions
+
+
+def _executor():
+    global _pool, _pool_pid
+    with _lock:
+        # A forked worker can't use its parent's threads
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(max_workers=get_config()['WORKERS'], thread_name_prefix='video-transcode')
+            _pool_pid = os.getpid()
+            _pending.clear()
+        return _pool
+
+
+def _run(poster_id):
+    try:
+        transcode_poster(poster_id)
+    except Exception:
+        logger.exception('Failed to transcode the video of poster %s', poster_id)
+    finally:
+        with _lock:
+            _pending.discard(poster_id)
+        # This thread is never inside a request, so nothing else closes its connection
+        connection.close()
+
+
+def queue_transcode(poster_id):
+    """Transcode the poster's video once the current transaction commits, in the background unless ASYNC is off"""
+    def submit():
+        if not get_config()['ASYNC']:
+            try:
+                transcode_poster(poster_id)
+            except Exception:
+                logger.exception('Failed to transcode the video of poster %s', poster_id)
+            return
+        pool = _executor()
+        with _lock:
+            if poster_id in _pending:
+                return
+            _pending.add(poster_id)
+        pool.submit(_run, poster_id)
+    transaction.on_commit(submit)
+
+
+def note_video_upload(instance):
+    """Before a save: reset the job state for a new upload, or for a removed video"""
+    video = instance.video_file
+    if video and video._committed:
+        return
+    # Files made from the previous video, deleted once this save commits
+    instance._stale_video_files = derived_files(instance)
+    instance._video_upload = bool(video)
+    instance.original_video = None
+    instance.video_poster = None
+    instance.video_renditions = []
+    instance.video_status = 'pending' if video else ''
+    instance.video_error = ''
+    instance.video_processed_at = None
+
+
+def queue_for_poster(instance):
+    """After a save: drop the previous video's renditions and queue the new upload"""
+    stale = instance.__dict__.pop('_stale_video_files', [])
+    if stale:
+        storage = instance.video_file.storage
+        transaction.on_commit(lambda: delete_files(storage, stale))
+    if instance.__dict__.pop('_video_upload', False):
+        queue_transcode(instance.pk)
@@ -1,30 +1,40 @@
+import math
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
-from django.db import models
-from .models import BuildingInfo, UserPreferences, FindUsPoster, HomePageContent
-from .forms import FindUsPosterForm, UserPreferencesForm
-from django.http import JsonResponse
+from .models import (
+    BuildingInfo, UserPreferences, FindUsPoster, HomePageContent, Schedule, Section, StudentEnrollment,
+)
+from .forms import EnrollmentForm, FindUsPosterForm, ScheduleForm, SectionForm, UserPreferencesForm
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_http_methods
 from .utils import log_activity
+from .active_content import get_active_home_content, get_active_poster
+from .page_cache import cache_anonymous_page
+from .search import building_search
+from .fuzzy import fuzzy_search
+from .catalogue import (
+    CACHE_CONTROL, CONTENT_TYPES, building_catalogue, choose_encoding, etag_matches, representation_etag,
+)
+from .routing import campus_router
+from .campus import SVG_HEIGHT, SVG_WIDTH
+from .spatial import spatial_index
+from .feeds import clamp_wait, notification_feed, schedule_feed
+from .timetable import DAYS, clock, current_academic_year, day_and_minute, is_academic_year, timetable
+from .conflicts import timetable_conflicts
+from .provisioning import invite_tokens
+from . import media
 
 @login_required
 def home(request):
     # Get user preferences
-    preferences, created = UserPreferences.objects.get_or_create(user=request.user)
-    
-    # Get active home page content
-    home_content = HomePageContent.objects.filter(is_active=True).first()
+    preferences = request.user_preferences
     
-    # Create default content if none exists
-    if not home_content:
-        home_content = HomePageContent.objects.create(
-            site_title="FINDIT - School Map",
-            welcome_title="School Campus Map",
-            welcome_subtitle="Welcome back, {username}!",
-            welcome_description="Navigate your campus with ease - Find buildings, rooms, and more. Use the interactive map to explore facilities and get directions.",
-            is_active=True
-        )
+    # Get active home page content (cached; defaults if none exists)
+    home_content = get_active_home_content()
     
     # Process welcome subtitle to replace {username} placeholder
     welcome_subtitle = home_content.welcome_subtitle
@@ -42,6 +52,7 @@ def home(request):
     }
     return render(request, 'home.html', context)
 
+@cache_anonymous_page
 def building_info(request):
     building_name = request.GET.get('name')
     if not building_name:
@@ -53,7 +64,7 @@ def building_info(request):
 @login_required
 def profile(request):
     user = request.user
-    preferences, created = UserPreferences.objects.get_or_create(user=user)
+    preferences = request.user_preferences
     
     if request.method == 'POST':
         # Handle AJAX profile picture upload
@@ -80,14 +91,115 @@ def profile(request):
     }
     return render(request, 'profile.html', context)
 
+def _group_by_day(schedules):
+    """(day, schedules) pairs for the tabs: Monday to Friday, plus weekend days in use"""
+    by_day = {day: [] for day in DAYS}
+    for entry in schedules:
+        by_day[entry.day].append(entry)
+    return [(day, entries) for day, entries in by_day.items() if entries or day in DAYS[:5]]
+
+def _posted_id(request, name):
+    """A posted id as an int, or None when blank; ValueError when it isn't a number"""
+    value = request.POST.get(name, '').strip()
+    return int(value) if value else None
+
 @login_required
 def schedule(request):
-    return render(request, 'schedule.html')
+    user = request.user
+    # Teachers have staff accounts (see setup_initial_data)
+    is_teacher = user.is_staff
+    current_year = current_academic_year()
+    section = None
+    if not is_teacher:
+        enrollment = (
+            StudentEnrollment.objects.select_related('section__adviser')
+            .filter(student=user, academic_year=current_year, is_active=True).first()
+        )
+        section = enrollment.section if enrollment else None
+    
+    section_form = SectionForm(initial={'academic_year': current_year})
+    form = ScheduleForm(initial={'academic_year': current_year})
+    enrollment_form = EnrollmentForm(initial={'academic_year': current_year})
+    editing_section_id = editing_schedule_id = ''
+    
+    if request.method == 'POST':
+        form_type = request.POST.get('form_type')
+        try:
+            ids = {
+                name: _posted_id(request, name)
+                for name in ('delete_section_id', 'section_id', 'delete_schedule_id', 'schedule_id')
+            }
+        except ValueError:
+            return HttpResponseBadRequest('Invalid section or schedule id')
+        if is_teacher and form_type == 'section':
+            if ids['delete_section_id']:
+                Section.objects.filter(pk=ids['delete_section_id'], adviser=user).delete()
+                messages.success(request, 'Section deleted.')
+                return redirect('schedule')
+            editing_section_id = ids['section_id'] or ''
+            instance = get_object_or_404(Section, pk=editing_section_id, adviser=user) if editing_section_id else None
+            section_form = SectionForm(request.POST, instance=instance)
+            if section_form.is_valid():
+                saved = section_form.save(commit=False)
+                saved.adviser = user
+                saved.save()
+                messages.success(request, 'Section saved.')
+                return redirect('schedule')
+        elif is_teacher and form_type == 'schedule':
+            if ids['delete_schedule_id']:
+                Schedule.objects.filter(pk=ids['delete_schedule_id'], teacher=user).delete()
+                messages.success(request, 'Schedule deleted.')
+                return redirect('schedule')
+            editing_schedule_id = ids['schedule_id'] or ''
+            if editing_schedule_id:
+                instance = get_object_or_404(Schedule, pk=editing_schedule_id, teacher=user)
+            else:
+                # The teacher is set up front so the double-booking check covers them
+                instance = Schedule(teacher=user)
+            form = ScheduleForm(request.POST, instance=instance)
+            if form.is_valid():
+                form.save()
+                messages.success(request, 'Schedule saved.')
+                return redirect('schedule')
+        elif not is_teacher and form_type == 'student_section':
+            enrollment_form = EnrollmentForm(request.POST)
+            if enrollment_form.is_valid():
+                StudentEnrollment.objects.update_or_create(
+                    student=user,
+                    academic_year=enrollment_form.cleaned_data['academic_year'],
+                    defaults={'section': enrollment_form.cleaned_data['section'], 'is_active': True},
+                )
+                messages.success(request, 'You are now enrolled.')
+                return redirect('schedule')
+    
+    schedules = Schedule.objects.none()
+    if is_teacher:
+        schedules = Schedule.objects.filter(teacher=user, academic_year=current_year)
+    elif section:
+        schedules = Schedule.objects.filter(section=section, is_active=True)
+    schedules = schedules.select_related('subject', 'section', 'room', 'teacher').order_by('time_slot')
+    
+    context = {
+        'is_teacher': is_teacher,
+        'current_year': current_year,
+        'section': section,
+        'class_now': timetable.section_at(section.id) if section else None,
+        'schedules_last_updated': section.schedules_last_updated.isoformat()
+            if section and section.schedules_last_updated else None,
+        'teacher_sections': Section.objects.filter(adviser=user) if is_teacher else [],
+        'schedule_days': _group_by_day(schedules),
+        'section_form': section_form,
+        'form': form,
+        'enrollment_form': enrollment_form,
+        'editing_section_id': editing_section_id,
+        'editing_schedule_id': editing_schedule_id,
+    }
+    return render(request, 'schedule.html', context)
 
 @login_required
 def settings(request):
     user = request.user
-    preferences, created = UserPreferences.objects.get_or_create(user=user)
+    preferences = request.user_preferences
     
     if request.method == 'POST':
         form = UserPreferencesForm(request.POST, instance=preferences)
@@ -130,27 +242,283 @@ def settings(request):
 def help_support(request):
     return render(request, 'help_support.html')
 
+def search_api(request):
+    """Ranked prefix/token search over BuildingInfo"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 10)), 50))
+    except ValueError:
+        limit = 10
+    
+    results = building_search.search(query, limit)
+    return JsonResponse({
+        'query': query,
+        'count': len(results),
+        'results': results
+    })
+
+def fuzzy_search_api(request):
+    """Typo-tolerant search over buildings, sections and grade levels"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 10)), 50))
+    except ValueError:
+        limit = 10
+    
+    results = fuzzy_search.search(query, limit)
+    return JsonResponse({
+        'query': query,
+        'count': len(results),
+        'results': results
+    })
+
+def _serve_catalogue(request, fmt):
+    catalogue = building_catalogue.get(fmt)
+    encodings = catalogue['encodings']
+    coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), encodings)
+    etag = representation_etag(catalogue['etag'], coding)
+    
+    # Any encoding of the same catalogue is still current for the client
+    current = {representation_etag(catalogue['etag'], name) for name in encodings}
+    if etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), current):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(encodings[coding], content_type=CONTENT_TYPES[fmt])
+        if coding != 'identity':
+            response['Content-Encoding'] = coding
+    response['ETag'] = etag
+    response['Cache-Control'] = CACHE_CONTROL
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+@require_http_methods(['GET', 'HEAD'])
+def building_catalogue_api(request):
+    """Every building with map geometry, details and BuildingInfo content"""
+    return _serve_catalogue(request, 'json')
+
+@require_http_methods(['GET', 'HEAD'])
+def building_catalogue_script(request):
+    """The catalogue as a script that sets window.buildings, for pages that need it on load"""
+    return _serve_catalogue(request, 'js')
+
+@require_http_methods(['GET', 'HEAD'])
+def route_api(request):
+    """Walking route to a building, from another building or from an SVG point (x, y)"""
+    target = request.GET.get('to', '').strip()
+    origin = request.GET.get('from', '').strip()
+    if not target:
+        return JsonResponse({'success': False, 'error': 'Choose a destination building'}, status=400)
+    
+    if origin:
+        rendered = campus_router.between(origin, target)
+    else:
+        point = _finite_params(request, 'x', 'y')
+        if point is None:
+            return JsonResponse({'success': False, 'error': 'Give a starting building or x and y'}, status=400)
+        rendered = campus_router.from_point(*point, target)
+    
+    if rendered is None:
+        return JsonResponse({'success': False, 'error': 'No walking route found'}, status=404)
+    
+    body, etag = rendered
+    if etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), {etag}):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = CACHE_CONTROL
+    return response
+
+def _finite_params(request, *names):
+    """The named query parameters as finite floats, or None if any is missing or not a number"""
+    try:
+        values = tuple(float(request.GET[name]) for name in names)
+    except (KeyError, ValueError):
+        return None
+    # float() accepts "nan" and "inf", which no grid cell or route can use
+    return values if all(math.isfinite(value) for value in values) else None
+
+def nearby_api(request):
+    """The k buildings nearest to a GPS position, with distances in metres"""
+    position = _finite_params(request, 'lat', 'lng')
+    if position is None:
+        return JsonResponse({'success': False, 'error': 'lat and lng are required'}, status=400)
+    lat, lng = position
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or not spatial_index.near_campus(lat, lng):
+        return JsonResponse({'success': False, 'error': 'That position is too far from campus'}, status=400)
+    try:
+        k = max(1, min(int(request.GET.get('k', 5)), 50))
+    except ValueError:
+        k = 5
+    
+    results = spatial_index.nearby(lat, lng, k)
+    return JsonResponse({
+        'lat': lat,
+        'lng': lng,
+        'count': len(results),
+        'results': results
+    })
+
+def hit_api(request):
+    """Buildings whose map box contains a point in campus SVG units, innermost first"""
+    point = _finite_params(request, 'x', 'y')
+    if point is None:
+        return JsonResponse({'success': False, 'error': 'x and y are required'}, status=400)
+    x, y = point
+    if not (0 <= x <= SVG_WIDTH and 0 <= y <= SVG_HEIGHT):
+        return JsonResponse({'success': False, 'error': 'x and y must be inside the campus map'}, status=400)
+    
+    results = spatial_index.hit(x, y)
+    return JsonResponse({
+        'x': x,
+        'y': y,
+        'count': len(results),
+        'results': results
+    })
+
+def _feed_response(request, feed, owner_id, render):
+    """Shared cursor / ETag / long-poll handling for the change feeds"""
+    try:
+        since = int(request.GET['since'])
+    except (KeyError, ValueError):
+        since = None
+    wait = clamp_wait(request.GET.get('wait', 0))
+    
+    cursor = feed.cursor(owner_id)
+    seen = since
+    if seen is None and etag_matches(request.headers.get('If-None-Match'), {f'"{feed.name}-{owner_id}-{cursor}"'}):
+        seen = cursor
+    if seen is not None:
+        cursor = feed.wait(owner_id, seen, wait)
+    
+    if seen is not None and cursor <= seen:
+        response = HttpResponse(status=304)
+    else:
+        rows, has_more = feed.rows(owner_id, since=seen)
+        if has_more:
+            # The client catches up a page at a time, from the last row it was sent
+            cursor = rows[-1].id
+        response = JsonResponse(dict(render(rows), cursor=cursor, has_more=has_more))
+    response['ETag'] = f'"{feed.name}-{owner_id}-{cursor}"'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _serialize_notification(notification):
+    return {
+        'id': notification.id,
+        'kind': notification.kind,
+        'title': notification.title,
+        'body': notification.body,
+        'metadata': notification.metadata,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat(),
+    }
+
+def _timetable_time(request):
+    """Day and minute to look up: now, unless ?day= and/or ?at=HH:MM ask about another time"""
+    day, minute = day_and_minute()
+    day = request.GET.get('day', day).lower()
+    if day not in DAYS:
+        raise ValueError(f'Unknown day: {day}')
+    if 'at' in request.GET:
+        hours, _, minutes = request.GET['at'].partition(':')
+        try:
+            minute = int(hours) * 60 + int(minutes or 0)
+        except ValueError:
+            raise ValueError('at must look like HH:MM') from None
+        if not 0 <= minute < 24 * 60:
+            raise ValueError('at must be a time of day')
+    return day, minute
+
+@login_required
+def section_timetable_api(request, section_id):
+    """The class a section is in at a time (now by default) and the one after it"""
+    try:
+        day, minute = _timetable_time(request)
+    except ValueError as exc:
+        return JsonResponse({'success': False, 'error': str(exc)}, status=400)
+    found = timetable.ensure_current().section_at(section_id, day, minute)
+    return JsonResponse(dict(found, section_id=section_id, day=day, time=clock(minute)))
+
+@login_required
+def room_timetable_api(request, room_id):
+    """Who is in a room at a time (now by default) and who is in it next"""
+    try:
+        day, minute = _timetable_time(request)
+    except ValueError as exc:
+        return JsonResponse({'success': False, 'error': str(exc)}, status=400)
+    found = timetable.ensure_current().room_at(room_id, day, minute)
+    if found is None:
+        return JsonResponse({'success': False, 'error': 'Room not found'}, status=404)
+    return JsonResponse(dict(found, day=day, time=clock(minute)))
+
+@login_required
+def free_rooms_api(request):
+    """Rooms free at a time, per building for the map, or in one building (?building=).
+
+    For one building with nothing free, the rooms that free up first later that day.
+    """
+    building = request.GET.get('building', '').strip()
+    try:
+        day, minute = _timetable_time(request)
+    except ValueError as exc:
+        return JsonResponse({'success': False, 'error': str(exc)}, status=400)
+    if not building:
+        return JsonResponse({
+            'day': day,
+            'time': clock(minute),
+            'buildings': timetable.ensure_current().free_rooms_at(day, minute),
+        })
+    found = timetable.ensure_current().free_rooms(building, day, minute)
+    return JsonResponse({
+        'building': building,
+        'day': day,
+        'time': clock(minute),
+        'available_at': found['available_at'] if found else None,
+        'rooms': found['rooms'] if found else [],
+    })
+
+@login_required
+def timetable_conflicts_api(request):
+    """Every double booking in an academic year's timetable (staff only)"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Not allowed'}, status=403)
+    academic_year = request.GET.get('academic_year') or current_academic_year()
+    if not is_academic_year(academic_year):
+        return JsonResponse({'success': False, 'error': 'academic_year must look like 2024-2025'}, status=400)
+    conflicts = timetable_conflicts(academic_year)
+    return JsonResponse({
+        'academic_year': academic_year,
+        'count': len(conflicts),
+        'conflicts': conflicts,
+    })
+
+@login_required
+def notifications_api(request, user_id):
+    """A user's notifications as a change feed (?since=<cursor>&wait=<seconds>)"""
+    if request.user.id != user_id and not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Not allowed'}, status=403)
+    return _feed_response(request, notification_feed, user_id, lambda rows: {
+        'notifications': [_serialize_notification(notification) for notification in rows],
+    })
+
+@login_required
+def schedule_updates_api(request, section_id):
+    """Timetable changes for a section as a change feed (?since=<cursor>&wait=<seconds>)"""
+    return _feed_response(request, schedule_feed, section_id, lambda rows: {
+        'section_id': section_id,
+        'schedules_last_updated': rows[0].created_at.isoformat() if rows else None,
+        'changes': [
+            {'id': change.id, 'kind': change.kind, 'description': change.description,
+             'created_at': change.created_at.isoformat()}
+            for change in rows
+        ],
+    })
+
+@cache_anonymous_page
 def about(request):
     # Get the active poster, or the most recent one with content
-    active_poster = FindUsPoster.objects.filter(is_active=True).first()
-    
-    # If no active poster, get the most recent one with either image or video
-    if not active_poster:
-        active_poster = FindUsPoster.objects.filter(
-            models.Q(poster_image__isnull=False) | 
-            models.Q(video_file__isnull=False) | 
-            models.Q(youtube_url__isnull=False)
-        ).exclude(
-            models.Q(poster_image='') & 
-            models.Q(video_file='') & 
-            models.Q(youtube_url='')
-        ).order_by('-created_at').first()
-        
-        # Make it active if found
-        if active_poster:
-            FindUsPoster.objects.filter(is_active=True).update(is_active=False)
-            active_poster.is_active = True
-            active_poster.save()
+    active_poster = get_active_poster()
     
     # Handle poster upload (only for staff/admin)
     poster_form = None
@@ -176,6 +544,7 @@ def about(request):
     }
     return render(request, 'about.html', context)
 
+@cache_anonymous_page
 def landing(request):
     return render(request, 'landing.html')
 
@@ -189,9 +558,8 @@ def register(request):
         if 'student_submit' in request.POST:
             form = StudentRegistrationForm(request.POST)
             if form.is_valid():
+                # The post_save signal creates the user's preferences
                 user = form.save()
-                # Create user preferences
-                UserPreferences.objects.get_or_create(user=user)
                 # Log activity
                 log_activity(user, 'user_registered', f'New student {user.username} registered', request)
                 # Login user automatically
@@ -214,9 +582,8 @@ def register(request):
         elif 'teacher_submit' in request.POST:
             form = TeacherRegistrationForm(request.POST)
             if form.is_valid():
+                # The post_save signal creates the user's preferences
                 user = form.save()
-                # Create user preferences
-                UserPreferences.objects.get_or_create(user=user)
                 # Log activity
                 log_activity(user, 'user_registered', f'New teacher {user.username} registered', request)
                 # Login user automatically
@@ -268,4 +635,87 @@ def logout_view(request):
         log_activity(request.user, 'user_logout', f'User {request.user.username} logged out', request)
     logout(request)
     messages.success(request, 'You have been logged out successfully.')
-    return redirect('landing')
\ No newline at end of file
+    return redirect('landing')
+
+def accept_invite(request, uidb64, token):
+    """Set the first password of a provisioned account from its one-time invite link"""
+    from django.contrib.auth.forms import SetPasswordForm
+    from django.contrib.auth.models import User
+    from django.utils.encoding import force_str
+    from django.utils.http import urlsafe_base64_decode
+
+    try:
+        user = User.objects.get(pk=force_str(urlsafe_base64_decode(uidb64)), is_active=True)
+    except (TypeError, ValueError, OverflowError, User.DoesNotExist):
+        user = None
+    if user is None or not invite_tokens.check_token(user, token):
+        messages.error(request, 'This invite link is invalid or has already been used.')
+        return redirect('login')
+
+    form = SetPasswordForm(user, request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        user = form.save()
+        login(request, user)
+        log_activity(user, 'user_login', f'User {user.username} set a password from an invite and logged in', request)
+        messages.success(request, 'Your password is set. Welcome to FINDIT.')
+        return redirect('home')
+    return render(request, 'registration/accept_invite.html', {'form': form, 'invited_user': user})
+
+
+@require_http_methods(['GET', 'HEAD'])
+def serve_media(request, path):
+    """An uploaded file from MEDIA_ROOT, with byte ranges so videos can start at once and seek"""
+    config = media.get_config()
+    found = media.resolve(path, config)
+    if found is None:
+        raise Http404('No such media file')
+    full_path, stat_result = found
+    etag, last_modified, last_modified_header = media.validators(stat_result)
+    headers = {
+        'Content-Type': media.content_type(full_path),
+        'Cache-Control': media.cache_control(path, config),
+        'ETag': etag,
+        'Last-Modified': last_modified_header,
+        'Accept-Ranges': 'bytes',
+    }
+
+    sendfile = media.sendfile_headers(full_path, config)
+    if sendfile:
+        # The front end does ranges and conditional requests itself
+        return HttpResponse(headers={**headers, **sendfile})
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        for header in ('Cache-Control', 'ETag', 'Last-Modified'):
+            conditional[header] = headers[header]
+        return conditional
+
+    size = stat_result.st_size
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (not if_range or media.if_range_matches(if_range, etag, last_modified)):
+        byte_range = media.parse_range(range_header, size, config['MAX_RANGE'])
+    if byte_range == 'unsatisfiable':
+        return HttpResponse(status=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+
+    if byte_range is None:
+        status, start, length = 200, 0, size
+    else:
+        start, end = byte_range
+        status, length = 206, end - start + 1
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    headers['Content-Length'] = length
+    if request.method == 'HEAD':
+        return HttpResponse(status=status, headers=headers)
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, status=status)
+    else:
+        file.seek(start)
+        response = FileResponse(media.RangeFile(file, length), status=status)
+    response.block_size = config['BLOCK_SIZE']
+    for header, value in headers.items():
+        response[header] = value
+    return response
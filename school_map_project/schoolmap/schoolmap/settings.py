@@ -43,6 +43,8 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    # runserver leaves static files to WhiteNoise too, as in production
+    'whitenoise.runserver_nostatic',
     'django.contrib.staticfiles',
     'cloudinary_storage',
     'cloudinary',
@@ -52,10 +54,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'mapapp.preferences.UserPreferencesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -92,6 +96,35 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared by every gunicorn worker so that invalidation in one worker is
+# seen by the others. Set REDIS_URL to use Redis instead of the filesystem.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / '.cache'),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# gunicorn threads per worker (see Procfile). Long-polls and dashboard
+# streams each hold one, so both are capped well below this.
+WEB_THREADS = int(os.environ.get('WEB_THREADS', 8))
+
+# Seconds that anonymous pages and template fragments stay cached; edits to
+# buildings, home page content and posters purge them earlier
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 600))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -142,32 +175,110 @@ STATICFILES_FINDERS = [
 
 
 
-# Cloudinary Configuration
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
-
-cloudinary.config(
-    cloud_name=os.environ.get('CLOUDINARY_CLOUD_NAME', 'your-cloud-name'),
-    api_key=os.environ.get('CLOUDINARY_API_KEY', 'your-api-key'),
-    api_secret=os.environ.get('CLOUDINARY_API_SECRET', 'your-api-secret')
-)
-
 # Media files (User uploaded files)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-# Use Cloudinary for production, local storage for development
-if DEBUG:
-    DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
-else:
-    DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
-    # Ensure media files work in production
-    CLOUDINARY_STORAGE = {
-        'CLOUD_NAME': os.environ.get('CLOUDINARY_CLOUD_NAME', 'demo'),
-        'API_KEY': os.environ.get('CLOUDINARY_API_KEY', ''),
-        'API_SECRET': os.environ.get('CLOUDINARY_API_SECRET', ''),
-    }
+# Read by django-cloudinary-storage when the remote store is first used
+CLOUDINARY_STORAGE = {
+    'CLOUD_NAME': os.environ.get('CLOUDINARY_CLOUD_NAME', 'demo'),
+    'API_KEY': os.environ.get('CLOUDINARY_API_KEY', ''),
+    'API_SECRET': os.environ.get('CLOUDINARY_API_SECRET', ''),
+}
+
+# Uploads go to a content-addressed cache under MEDIA_ROOT and are copied to
+# the remote store in the background (mapapp/storage.py). Without Cloudinary
+# credentials the remote store is a local stand-in under MEDIA_ROOT/remote;
+# MEDIA_REMOTE_LATENCY adds a delay per call to it, for benchmarking.
+MEDIA_STORAGE = {
+    'REMOTE': os.environ.get(
+        'MEDIA_REMOTE_STORAGE',
+        'cloudinary_storage.storage.MediaCloudinaryStorage' if os.environ.get('CLOUDINARY_API_KEY')
+        else 'mapapp.storage.LocalRemoteStorage',
+    ),
+    'ASYNC': True,
+    'WORKERS': int(os.environ.get('MEDIA_UPLOAD_WORKERS', 2)),
+    'LATENCY': float(os.environ.get('MEDIA_REMOTE_LATENCY', 0)),
+}
+
+# Plain local files for development. In production collectstatic
+# writes content-hashed copies with gzip and brotli versions next to them,
+# and WhiteNoise serves the hashed names with immutable, year-long caching.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage' if DEBUG
+        else 'mapapp.storage.CachedMediaStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# check_static_assets (run by build.sh) fails the build on template links to
+# unhashed static files; these templates are not rendered by any view.
+STATIC_ASSET_CHECK = {
+    'IGNORE_TEMPLATES': ['home_corrupted_backup.html', 'home_fixed.html', 'mapapp/coordinate_helper.html'],
+}
+
+# MEDIA_URL is served by mapapp.views.serve_media with byte ranges
+# (mapapp/media.py). Behind nginx set MEDIA_SENDFILE=x-accel-redirect and an
+# internal location at MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT; behind
+# Apache with mod_xsendfile, MEDIA_SENDFILE=x-sendfile.
+MEDIA_SERVING = {
+    'SENDFILE': os.environ.get('MEDIA_SENDFILE') or None,
+    'ACCEL_PREFIX': os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/'),
+    'MAX_AGE': int(os.environ.get('MEDIA_MAX_AGE', 3600)),
+}
+
+# Activity logging
+# log_activity() queues entries and a background thread writes them in
+# batches; under tests they are written synchronously instead.
+ACTIVITY_LOG_BUFFER = {
+    'ENABLED': os.environ.get('ACTIVITY_LOG_BUFFERED', 'True') == 'True',
+    'MAX_SIZE': int(os.environ.get('ACTIVITY_LOG_BUFFER_SIZE', 100)),
+    'FLUSH_INTERVAL': float(os.environ.get('ACTIVITY_LOG_FLUSH_INTERVAL', 2.0)),
+}
+
+# Live dashboard stream (admin_dashboard/live.py). One producer thread per
+# worker polls for new activity; streams close after MAX_DURATION seconds
+# and browsers reconnect, so run gunicorn with threads (see Procfile).
+DASHBOARD_STREAM = {
+    'ENABLED': True,
+    'POLL_INTERVAL': float(os.environ.get('DASHBOARD_STREAM_POLL_INTERVAL', 2.0)),
+    'MAX_DURATION': float(os.environ.get('DASHBOARD_STREAM_MAX_DURATION', 300)),
+}
+
+# Raw ActivityLog rows older than DAYS are archived to monthly gzip JSONL
+# files under MEDIA_ROOT/ARCHIVE_DIR by the prune_activity_log command.
+ACTIVITY_LOG_RETENTION = {
+    'DAYS': int(os.environ.get('ACTIVITY_LOG_RETENTION_DAYS', 180)),
+    'ARCHIVE': True,
+    'ARCHIVE_DIR': 'activity_archive',
+    'BATCH_SIZE': 1000,
+}
+
+# Resized WebP/JPEG copies of uploaded images (mapapp/images.py), made on a
+# per-process thread pool after the upload is saved; inline under tests.
+IMAGE_DERIVATIVES = {
+    'ASYNC': True,
+    'WORKERS': int(os.environ.get('IMAGE_DERIVATIVE_WORKERS', 2)),
+    'QUALITY': int(os.environ.get('IMAGE_DERIVATIVE_QUALITY', 80)),
+}
+
+# MP4 renditions and a poster frame for uploaded FindUsPoster videos
+# (mapapp/videos.py), made by ffmpeg from a per-process thread pool; inline
+# under tests. Each worker runs one ffmpeg at a time.
+VIDEO_TRANSCODING = {
+    'ASYNC': True,
+    'WORKERS': int(os.environ.get('VIDEO_TRANSCODE_WORKERS', 1)),
+    'FFMPEG': os.environ.get('FFMPEG_BINARY', 'ffmpeg'),
+    'FFPROBE': os.environ.get('FFPROBE_BINARY', 'ffprobe'),
+}
+
+# The pools and threads above run inline under tests, and caches and files
+# stay local (schoolmap/test_settings.py)
+TEST_RUNNER = 'schoolmap.test_runner.TestRunner'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -0,0 +1,17 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Runs the tests with schoolmap.test_settings applied, whatever DJANGO_SETTINGS_MODULE is"""
+
+    def setup_test_environment(self, **kwargs):
+        from . import test_settings
+
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(**test_settings.OVERRIDES)
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
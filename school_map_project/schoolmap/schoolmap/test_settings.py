@@ -0,0 +1,30 @@
+"""
+Settings for the test suite.
+
+`manage.py test` applies OVERRIDES on top of settings.py through
+TEST_RUNNER; other runners can use this module as DJANGO_SETTINGS_MODULE.
+The background pools and threads run inline, so uploads, image derivatives,
+transcodes and activity log entries are done by the time a request returns,
+and caches and files stay local to the test process.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import ACTIVITY_LOG_BUFFER, DASHBOARD_STREAM, IMAGE_DERIVATIVES, MEDIA_STORAGE, VIDEO_TRANSCODING
+
+OVERRIDES = {
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    },
+    'STORAGES': {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+    'MEDIA_STORAGE': {**MEDIA_STORAGE, 'ASYNC': False},
+    'ACTIVITY_LOG_BUFFER': {**ACTIVITY_LOG_BUFFER, 'ENABLED': False},
+    'DASHBOARD_STREAM': {**DASHBOARD_STREAM, 'ENABLED': False},
+    'IMAGE_DERIVATIVES': {**IMAGE_DERIVATIVES, 'ASYNC': False},
+    'VIDEO_TRANSCODING': {**VIDEO_TRANSCODING, 'ASYNC': False},
+}
+
+globals().update(OVERRIDES)
@@ -14,11 +14,14 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
 from django.contrib.auth import views as auth_views
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from mapapp.views import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -26,11 +29,8 @@ urlpatterns = [
     # Include Django's auth URLs but point them to our custom login view
     path('accounts/login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
     path('accounts/logout/', auth_views.LogoutView.as_view(next_page='landing'), name='logout'),
+    # Uploads, with byte ranges for video; behind nginx/Apache this hands off via MEDIA_SERVING['SENDFILE']
+    re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.+)$', serve_media, name='media'),
     path('', include('mapapp.urls')),
 ]
 
-# Serve media files in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    # Also add static files serving
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)